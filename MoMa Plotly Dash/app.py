@@ -1,80 +1,127 @@
 import dash
 from dash import dcc, html
 from dash.dependencies import Input, Output
-from data_processing import reviews_df
+from flask import jsonify, request
+from jobs import job_manager
+from loader import dataset
+from metrics import callback_metrics
 
-import pages.overview as overview_page
-import pages.word_analysis as word_page
-import pages.sentiment_analysis as sentiment_page
-import pages.emotion_analysis as emotion_page
-import pages.negative_analysis as negative_page
+import pages_overview as overview_page
+import pages_word_analysis as word_page
+import pages_sentiment_analysis as sentiment_page
+import pages_emotion_analysis as emotion_page
+import pages_negative_analysis as negative_page
+import pages_topics as topic_page
 
-# Initialize the Dash app
-app = dash.Dash(__name__, suppress_callback_exceptions=True)
+# Initialize the Dash app; background callbacks run as jobs forked from the server worker
+app = dash.Dash(__name__, suppress_callback_exceptions=True, background_callback_manager=job_manager)
 server = app.server
+# Time every callback registered below and serve the histograms at /metrics
+callback_metrics.instrument(app)
 
-# Extract unique values for filters
-years = sorted(reviews_df['Year'].unique())
 tourist_types = ['Foreign', 'Domestic', 'Local', 'Not Specified']
 sentiments = ['Positive', 'Neutral', 'Negative']
-ratings = sorted(reviews_df['Rating'].unique())
-
-# App layout with sidebar filters and page content
-app.layout = html.Div([
-    dcc.Location(id='url', refresh=False),
-    # Navigation links at top
-    html.Div([
-        dcc.Link('Overview', href='/', style={'marginRight': '15px'}),
-        dcc.Link('Word Analysis', href='/word-analysis', style={'marginRight': '15px'}),
-        dcc.Link('Sentiment', href='/sentiment', style={'marginRight': '15px'}),
-        dcc.Link('Emotion', href='/emotion', style={'marginRight': '15px'}),
-        dcc.Link('Negative Reviews', href='/negative', style={'marginRight': '15px'})
-    ], style={'padding': '10px', 'backgroundColor': '#f0f0f0'}),
-    html.Div([
-        # Sidebar for global filters
+# The keyword only reaches the callbacks once typing pauses for this long
+KEYWORD_DEBOUNCE_SECONDS = 0.5
+
+def filter_values(data):
+    # Unique values for the year and rating filters
+    years = sorted(int(y) for y in data.reviews_df['Year'].unique())
+    ratings = sorted(int(r) for r in data.reviews_df['Rating'].unique())
+    return years, ratings
+
+@dataset.on_ready
+def warm_filter_cache(data):
+    # Pre-warm the shared filter cache with the default "everything selected" state
+    years, ratings = filter_values(data)
+    data.filter_index.warm(years, tourist_types, sentiments, ratings)
+
+def serve_layout():
+    # Evaluated on every page load: the dashboard once the data is in, a placeholder before
+    if dataset.ready:
+        return dashboard_layout()
+    return loading_layout()
+
+def loading_layout():
+    # Polls the loader and reloads the page once it reports ready
+    return html.Div([
+        html.H3("Loading reviews..."),
+        html.P(dataset.status, id='loading-status'),
+        dcc.Store(id='loading-ready', data=False),
+        dcc.Interval(id='loading-poll', interval=2000),
+        html.Div(id='loading-reload', hidden=True),
+    ], style={'padding': '20px'})
+
+def dashboard_layout():
+    years, ratings = filter_values(dataset)
+    # App layout with sidebar filters and page content
+    return html.Div([
+        dcc.Location(id='url', refresh=False),
+        # Navigation links at top
         html.Div([
-            html.H4("Filters"),
-            html.Label("Year:"),
-            dcc.Dropdown(
-                id='year-filter',
-                options=[{'label': str(y), 'value': y} for y in years],
-                value=years, multi=True
-            ),
-            html.Br(),
-            html.Label("Tourist Type:"),
-            dcc.Dropdown(
-                id='tourist-filter',
-                options=[{'label': t, 'value': t} for t in tourist_types],
-                value=tourist_types, multi=True
-            ),
-            html.Br(),
-            html.Label("Sentiment:"),
-            dcc.Dropdown(
-                id='sentiment-filter',
-                options=[{'label': s, 'value': s} for s in sentiments],
-                value=sentiments, multi=True
-            ),
-            html.Br(),
-            html.Label("Rating:"),
-            dcc.Dropdown(
-                id='rating-filter',
-                options=[{'label': str(r), 'value': r} for r in ratings],
-                value=ratings, multi=True
-            ),
-            html.Br(),
-            html.Label("Keyword:"),
-            dcc.Input(
-                id='keyword-filter',
-                type='text',
-                placeholder='Search reviews...',
-                style={'width': '100%'}
-            ),
-        ], style={'width': '20%', 'display': 'inline-block', 'verticalAlign': 'top', 
-                  'padding': '10px', 'backgroundColor': '#f9f9f9'}),
-        # Main page content area
-        html.Div(id='page-content', style={'width': '75%', 'display': 'inline-block', 'padding': '10px'})
-    ], style={'display': 'flex'})
-])
+            dcc.Link('Overview', href='/', style={'marginRight': '15px'}),
+            dcc.Link('Word Analysis', href='/word-analysis', style={'marginRight': '15px'}),
+            dcc.Link('Sentiment', href='/sentiment', style={'marginRight': '15px'}),
+            dcc.Link('Emotion', href='/emotion', style={'marginRight': '15px'}),
+            dcc.Link('Negative Reviews', href='/negative', style={'marginRight': '15px'}),
+            dcc.Link('Topics', href='/topics', style={'marginRight': '15px'})
+        ], style={'padding': '10px', 'backgroundColor': '#f0f0f0'}),
+        html.Div([
+            # Sidebar for global filters
+            html.Div([
+                html.H4("Filters"),
+                html.Label("Year:"),
+                dcc.Dropdown(
+                    id='year-filter',
+                    options=[{'label': str(y), 'value': y} for y in years],
+                    value=years, multi=True
+                ),
+                html.Br(),
+                html.Label("Tourist Type:"),
+                dcc.Dropdown(
+                    id='tourist-filter',
+                    options=[{'label': t, 'value': t} for t in tourist_types],
+                    value=tourist_types, multi=True
+                ),
+                html.Br(),
+                html.Label("Sentiment:"),
+                dcc.Dropdown(
+                    id='sentiment-filter',
+                    options=[{'label': s, 'value': s} for s in sentiments],
+                    value=sentiments, multi=True
+                ),
+                html.Br(),
+                html.Label("Rating:"),
+                dcc.Dropdown(
+                    id='rating-filter',
+                    options=[{'label': str(r), 'value': r} for r in ratings],
+                    value=ratings, multi=True
+                ),
+                html.Br(),
+                html.Label("Keyword:"),
+                dcc.Input(
+                    id='keyword-filter',
+                    type='text',
+                    placeholder='word, prefix* or "a phrase"',
+                    debounce=KEYWORD_DEBOUNCE_SECONDS,
+                    style={'width': '100%'}
+                ),
+                html.Br(),
+                # Passed on like the other filters: checked, the selection is [False] (only
+                # reviews that are not near-duplicates, see dedup.py); unchecked, [] keeps all
+                dcc.Checklist(
+                    id='duplicate-filter',
+                    options=[{'label': ' Hide duplicate reviews', 'value': False}],
+                    value=[]
+                ),
+            ], style={'width': '20%', 'display': 'inline-block', 'verticalAlign': 'top', 
+                      'padding': '10px', 'backgroundColor': '#f9f9f9'}),
+            # Main page content area
+            html.Div(id='page-content', style={'width': '75%', 'display': 'inline-block', 'padding': '10px'})
+        ], style={'display': 'flex'})
+    ])
+
+app.layout = serve_layout
 
 # Register callbacks for each page
 overview_page.register_callbacks(app)
@@ -82,6 +129,58 @@ word_page.register_callbacks(app)
 sentiment_page.register_callbacks(app)
 emotion_page.register_callbacks(app)
 negative_page.register_callbacks(app)
+topic_page.register_callbacks(app)
+
+@app.callback(
+    [Output('loading-status', 'children'),
+     Output('loading-ready', 'data'),
+     Output('loading-poll', 'disabled')],
+    [Input('loading-poll', 'n_intervals')]
+)
+def poll_loading(n_intervals):
+    if dataset.state == 'failed':
+        return f"Loading failed: {dataset.error}", False, True
+    return dataset.status, dataset.ready, dataset.ready
+
+app.clientside_callback(
+    """
+    function(ready) {
+        if (ready) {
+            window.location.reload();
+        }
+        return window.dash_clientside.no_update;
+    }
+    """,
+    Output('loading-reload', 'children'),
+    Input('loading-ready', 'data')
+)
+
+@server.before_request
+def reject_callbacks_while_loading():
+    # Page callbacks from a tab opened before a restart have no data to work on yet
+    if dataset.ready or not request.path.endswith('/_dash-update-component'):
+        return None
+    payload = request.get_json(silent=True) or {}
+    # The placeholder's own poll is the one callback that runs before the data is in
+    if any(i.get('id') == 'loading-poll' for i in payload.get('inputs', []) if isinstance(i, dict)):
+        return None
+    return jsonify(dataset.describe()), 503
+
+@server.before_request
+def follow_shared_segment():
+    # Picks up a dataset republished by another worker or by `shared_data.py publish`
+    dataset.check_for_update()
+
+@server.route('/healthz')
+def healthz():
+    # Liveness: the process is up and serving, whatever the loader is doing
+    return jsonify({'status': 'ok'})
+
+@server.route('/readyz')
+def readyz():
+    # Readiness: 200 once the dataset is loaded, 503 while loading or after a failed load
+    info = dataset.describe()
+    return jsonify(info), 200 if dataset.ready else 503
 
 # Page routing callback
 @app.callback(
@@ -97,9 +196,14 @@ def display_page(pathname):
         return emotion_page.layout
     elif pathname == '/negative':
         return negative_page.layout
+    elif pathname == '/topics':
+        return topic_page.layout()
     else:
         # Default: Overview page
         return overview_page.layout
 
+# Scoring and indexing run in the background; the server answers from the first request
+dataset.start()
+
 if __name__ == '__main__':
     app.run_server(debug=True)
@@ -0,0 +1,60 @@
+# Hometown resolution: the former per-row apply versus hometown.resolve_hometowns on a
+# synthetic Hometown column (1M rows by default). Checks that both produce the same
+# City / Country / TouristType before reporting timings.
+#   python "MoMa Plotly Dash/benchmarks/bench_hometown.py" [rows]
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hometown import US_STATES, resolve_hometowns
+from synthetic_reviews import synthetic_hometowns
+
+
+def legacy_resolve(hometowns):
+    df = pd.DataFrame({'Hometown': hometowns})
+    df['City'] = df['Hometown'].str.split(',').str[0].str.strip()
+    df['Country'] = df['Hometown'].str.split(',').str[-1].str.strip()
+    df['City'] = df['City'].fillna('Unknown')
+    df['Country'] = df['Country'].fillna('Unknown')
+    df['Country'] = df['Country'].apply(lambda x: 'USA' if x in US_STATES else x)
+
+    def classify_tourist(city, country):
+        if city == 'Unknown' or country == 'Unknown' or pd.isna(city) or pd.isna(country):
+            return 'Not Specified'
+        local_keywords = ['New York', 'NYC', 'Brooklyn', 'Manhattan', 'Queens', 'Bronx']
+        if country == 'USA':
+            for kw in local_keywords:
+                if kw.lower() in str(city).lower():
+                    return 'Local'
+            return 'Domestic'
+        else:
+            return 'Foreign'
+    df['TouristType'] = df.apply(lambda row: classify_tourist(row['City'], row['Country']), axis=1)
+    return df[['City', 'Country', 'TouristType']]
+
+
+def main(n=1_000_000):
+    hometowns = synthetic_hometowns(n)
+    print(f"{n} rows, {hometowns.nunique()} distinct hometowns")
+
+    start = time.perf_counter()
+    before = legacy_resolve(hometowns)
+    legacy_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    after = resolve_hometowns(hometowns)
+    resolver_s = time.perf_counter() - start
+
+    for col in ['City', 'Country', 'TouristType']:
+        if not (before[col].astype(object) == after[col].astype(object)).all():
+            raise SystemExit(f"mismatch in {col}")
+    print(f"per-row apply:       {legacy_s:8.2f} s")
+    print(f"per-unique resolver: {resolver_s:8.2f} s  ({legacy_s / resolver_s:.0f}x faster, outputs identical)")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,75 @@
+# Overview page: eight per-chart callbacks (each copying and filtering reviews_df, as the
+# page used to) versus the single-pass compute_overview. Run from the directory holding
+# reviews-1.csv:  python "MoMa Plotly Dash/benchmarks/bench_overview.py"
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_processing import reviews_df, filter_index
+from pages_overview import compute_overview
+
+
+def legacy_filter_df(years, tourist_types, sentiments, ratings, keyword):
+    df = reviews_df.copy()
+    if years:
+        df = df[df['Year'].isin(years)]
+    if tourist_types:
+        df = df[df['TouristType'].isin(tourist_types)]
+    if sentiments:
+        df = df[df['Sentiment'].isin(sentiments)]
+    if ratings:
+        df = df[df['Rating'].isin(ratings)]
+    if keyword:
+        df = df[df['ReviewText'].str.contains(keyword, case=False, na=False)]
+    return df
+
+
+# One aggregation per former callback, each preceded by its own filter pass
+LEGACY_AGGREGATIONS = [
+    lambda dff: (dff.shape[0], dff['Rating'].mean(), dff['Rating'].median()),
+    lambda dff: dff['Rating'].value_counts().sort_index(),
+    lambda dff: dff['TouristType'].value_counts(),
+    lambda dff: dff.groupby('Year').size(),
+    lambda dff: dff.groupby('Month').size().sort_index(),
+    lambda dff: dff['City'].value_counts().nlargest(10),
+    lambda dff: dff['Country'].value_counts().nlargest(10),
+    lambda dff: dff.groupby('Month')['Rating'].mean().reindex(range(1, 13)).fillna(0),
+]
+
+
+def legacy_overview(*state):
+    return [aggregate(legacy_filter_df(*state)) for aggregate in LEGACY_AGGREGATIONS]
+
+
+def timed(fn, state, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        filter_index.cache.clear()
+        start = time.perf_counter()
+        fn(*state)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main(repeat=5):
+    years = sorted(int(y) for y in reviews_df['Year'].unique())
+    ratings = sorted(int(r) for r in reviews_df['Rating'].unique())
+    states = {
+        'all selected': (years, ['Foreign', 'Domestic', 'Local', 'Not Specified'],
+                         ['Positive', 'Neutral', 'Negative'], ratings, None),
+        'single year': ([years[-1]], None, None, None, None),
+        'keyword': (years, None, None, None, 'art'),
+    }
+    print(f"{len(reviews_df)} reviews, best of {repeat} runs (filter cache cleared before each)")
+    print(f"{'state':<14}{'8 callbacks (ms)':>18}{'1 pass (ms)':>14}{'speedup':>10}")
+    for name, state in states.items():
+        before = timed(legacy_overview, state, repeat)
+        after = timed(compute_overview, state, repeat)
+        print(f"{name:<14}{before:>18.2f}{after:>14.2f}{before / after:>9.1f}x")
+    print(f"requests per filter change: {len(LEGACY_AGGREGATIONS)} -> 1")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# Conformance check for vader_batch.BatchVader: every compound score must match nltk's
+# SentimentIntensityAnalyzer.polarity_scores(str(text))['compound'] within 1e-9 on the
+# review corpus, plus a set of texts that exercise the caps, booster, negation, idiom,
+# "least", "but" and punctuation rules. Exits non-zero on any mismatch.
+#   python "MoMa Plotly Dash/benchmarks/check_vader_conformance.py" [reviews.csv]
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from nltk.sentiment import SentimentIntensityAnalyzer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vader_batch import BatchVader
+
+TOLERANCE = 1e-9
+
+EDGE_CASES = [
+    '', ' ', 'a', '!!!', None, 12345,
+    'The museum was GREAT but the cafe was NOT good.',
+    'The museum was GREAT and the cafe was GOOD.',
+    'ALL CAPS REVIEW SO GREAT',
+    'It was kind of boring, sort of dull, but the Monet was extremely beautiful!!!',
+    'Not bad at all. Never so good. never this amazing, never so this bad',
+    'It was the shit, the bomb, a bad ass show. Yeah right. Cut the mustard? kiss of death??',
+    'The bomb the bomb the bomb, great great great, good good good!',
+    'least good, at least good, very least happy, not least awful',
+    "I don't like it, isn't great, wasn't nice, ain't terrible, nor happy",
+    'Good, good. :) :( <3 (good) good!! !!good good?? ?good',
+    'Wow???? What??? Really?? Fine?',
+    'BUT it was fine but also sad But happy',
+    'The exhibition was hand to mouth and just enough to be fine, kind of love it',
+    'The exhibits were really REALLY good and incredibly AWFUL, hardly good',
+    'Tres bien, très bon musée — magnifique! Nicht schlecht.',
+    'good\tgood\ngood  GOOD',
+]
+
+
+def main(csv_path='reviews-1.csv'):
+    texts = list(EDGE_CASES)
+    if os.path.exists(csv_path):
+        df = pd.read_csv(csv_path)
+        reviews = (df['Title'].fillna('') + ' ' + df['Text'].fillna('')).tolist()
+        texts += reviews + df['Text'].tolist() + df['Title'].tolist()
+    else:
+        print(f"{csv_path} not found, checking edge cases only")
+
+    analyzer = SentimentIntensityAnalyzer()
+    start = time.perf_counter()
+    expected = np.array([analyzer.polarity_scores(str(t))['compound'] for t in texts])
+    reference_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = BatchVader(analyzer).compound(texts)
+    batch_s = time.perf_counter() - start
+
+    diff = np.abs(actual - expected)
+    bad = np.flatnonzero(diff > TOLERANCE)
+    for i in bad[:20]:
+        print(f"mismatch {expected[i]!r} != {actual[i]!r}: {str(texts[i])[:120]!r}")
+    print(f"{len(texts)} texts, max |diff| {diff.max():.3g}, {len(bad)} mismatches")
+    print(f"polarity_scores loop: {reference_s:8.2f} s")
+    print(f"BatchVader.compound:  {batch_s:8.2f} s  ({reference_s / batch_s:.1f}x)")
+    if len(bad):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,26 @@
+# Bytes per reviews_df column before and after schema.compact: builds the frame from the
+# CSV in the current directory with the old wide dtypes (scores come from the score store,
+# so only the first run scores anything), compacts it, and prints the deep memory usage.
+#   python "MoMa Plotly Dash/benchmarks/memory_report.py" [reviews.csv]
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import schema
+from data_processing import build_reviews
+
+
+def main(csv_path='reviews-1.csv'):
+    wide = build_reviews(csv_path, incremental=True, compact=False)
+    report = schema.memory_report(wide, schema.compact(wide))
+    with pd.option_context('display.max_rows', None, 'display.max_columns', None, 'display.width', 120):
+        print(report)
+    total = report.loc['total']
+    print(f"{len(wide)} reviews: {total['bytes_before'] / 2**20:.1f} MB -> {total['bytes_after'] / 2**20:.1f} MB")
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,273 @@
+# Benchmark suite. For every size, writes a synthetic reviews-1.csv (synthetic_reviews.py),
+# then in a fresh process times each ingest stage on its own (parse, hometown, TextBlob,
+# VADER, preprocessing, NRC emotions), the full data_processing load as the app runs it (build, then from
+# the snapshot), and every page callback through the Dash HTTP endpoint under a set of
+# representative filter states. Results, with peak RSS after every stage, go to one JSON
+# file per run so runs on different commits can be compared:
+#   python "MoMa Plotly Dash/benchmarks/run_benchmarks.py" --sizes 10000,100000,1000000
+#   python "MoMa Plotly Dash/benchmarks/run_benchmarks.py" compare old.json new.json
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from importlib import metadata
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+CODE_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, CODE_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+WORK_DIR = os.path.join(BENCH_DIR, '.work')
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+PACKAGES = ['pandas', 'numpy', 'pyarrow', 'scikit-learn', 'scipy', 'dash', 'textblob', 'nltk', 'NRCLex',
+            'wordcloud']
+
+FILTER_IDS = {'years': 'year-filter', 'tourist_types': 'tourist-filter', 'sentiments': 'sentiment-filter',
+              'ratings': 'rating-filter', 'keyword': 'keyword-filter', 'duplicates': 'duplicate-filter'}
+# Inputs outside the shared sidebar, set to what a user would typically pick
+PAGE_INPUTS = {'negative-emotion-filter': 'anger', 'url': '/'}
+# Interval between polls of a background callback's job
+POLL_SECONDS = 0.005
+# The routing callback only swaps layouts
+SKIPPED_CALLBACKS = {'page-content.children',
+                     '..loading-status.children...loading-ready.data...loading-poll.disabled..',
+                     'loading-reload.children'}
+
+
+def filter_states(years, ratings):
+    everything = {'years': years, 'tourist_types': ['Foreign', 'Domestic', 'Local', 'Not Specified'],
+                  'sentiments': ['Positive', 'Neutral', 'Negative'], 'ratings': ratings, 'keyword': None}
+    return {
+        'default': everything,
+        'single year': dict(everything, years=years[-1:]),
+        'negative foreign': dict(everything, tourist_types=['Foreign'], sentiments=['Negative']),
+        'low ratings 2 years': dict(everything, years=years[-2:], ratings=ratings[:2]),
+        'keyword': dict(everything, keyword='crowded'),
+        'prefix': dict(everything, keyword='paint*'),
+        'phrase': dict(everything, keyword='"starry night"'),
+        'no duplicates': dict(everything, duplicates=[False]),
+    }
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    peak = resource.getrusage(who).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=CODE_DIR,
+                                       text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def package_versions():
+    versions = {}
+    for name in PACKAGES:
+        try:
+            versions[name] = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            versions[name] = None
+    return versions
+
+
+def run_worker(csv_path, output_path, repeat):
+    # Runs inside a fresh interpreter whose working directory holds reviews-1.csv
+    import pandas as pd
+    from textblob import TextBlob
+
+    import data_processing
+    import emotions
+    from hometown import resolve_hometowns
+    from vader_batch import BatchVader
+
+    stages = {}
+
+    def stage(name, fn):
+        start = time.perf_counter()
+        value = fn()
+        stages[name] = {'seconds': round(time.perf_counter() - start, 4), 'peak_rss_mb': peak_rss_mb()}
+        print(f"  {name:<28}{stages[name]['seconds']:>10.2f} s {stages[name]['peak_rss_mb']:>10.1f} MB", flush=True)
+        return value
+
+    def parse():
+        df = pd.read_csv(csv_path)
+        df['ReviewText'] = df['Title'].fillna('') + ' ' + df['Text'].fillna('')
+        df['Date'] = pd.to_datetime(df[['Year', 'Month', 'Day']])
+        return df
+
+    df = stage('parse', parse)
+    texts = df['ReviewText'].tolist()
+    stage('hometown', lambda: resolve_hometowns(df['Hometown']))
+    stage('textblob', lambda: [TextBlob(t).sentiment.polarity for t in texts])
+    stage('vader', lambda: BatchVader().compound(texts))
+    pre = stage('preprocess', lambda: data_processing.preprocess_reviews(df['ReviewText'], use_cache=False))
+    stage('nrc emotions', lambda: emotions.dominant_emotion(emotions.emotion_counts(pre['CleanText'])))
+    del df, texts, pre
+
+    # The app binds before any data is read; the loader thread then runs the whole pipeline
+    # (parallel scoring plus every index and matrix) and the cache warm-up
+    app_module = stage('app import', lambda: __import__('app'))
+    dataset = stage('load_data (build)', lambda: app_module.dataset.wait())
+    stage('load_data (snapshot)', lambda: data_processing.load_data())
+
+    years, ratings = app_module.filter_values(dataset)
+    callbacks = time_callbacks(app_module, dataset.filter_index, filter_states(years, ratings), repeat)
+
+    result = {
+        'rows': len(dataset.reviews_df),
+        'stages': stages,
+        'callbacks': callbacks,
+        'peak_rss_mb': peak_rss_mb(),
+        'children_peak_rss_mb': peak_rss_mb(resource.RUSAGE_CHILDREN),
+    }
+    with open(output_path, 'w') as f:
+        json.dump(result, f)
+
+
+def time_callbacks(app_module, filter_index, states, repeat):
+    # Every callback is posted to /_dash-update-component like the browser does, so the
+    # timings include request handling and JSON serialization of the figures. "cold" is
+    # the first request for a state with the filter cache emptied; "warm" the median of
+    # the repeats that follow.
+    client = app_module.server.test_client()
+    results = {}
+    for output_key, spec in list(app_module.app.callback_map.items()):
+        if output_key in SKIPPED_CALLBACKS:
+            continue
+        outputs = [{'id': part.rsplit('.', 1)[0], 'property': part.rsplit('.', 1)[1]}
+                   for part in output_key.strip('.').split('...')]
+        name = ', '.join(o['id'] for o in outputs)
+        results[name] = {}
+        for state_name, state in states.items():
+            values = dict(PAGE_INPUTS, **{FILTER_IDS[k]: v for k, v in state.items()})
+            # The word page's background callback renders the state its cache check handed over
+            values['wordcloud-request'] = [values.get(FILTER_IDS[k]) for k in FILTER_IDS]
+            inputs = [dict(i, value=values.get(i['id'])) for i in spec['inputs']]
+            payload = {'output': output_key, 'outputs': outputs if len(outputs) > 1 else outputs[0],
+                       'inputs': inputs, 'state': [dict(s, value=values.get(s['id'])) for s in spec.get('state', [])],
+                       'changedPropIds': [f"{inputs[0]['id']}.{inputs[0]['property']}"]}
+
+            def post():
+                # Background callbacks answer with a job handle; poll it like the browser
+                # does until the result arrives, so their timings cover the whole job
+                start = time.perf_counter()
+                response = client.post('/_dash-update-component', json=payload)
+                handle = response.get_json(silent=True) if response.status_code == 200 else None
+                if handle and 'cacheKey' in handle:
+                    url = f"/_dash-update-component?cacheKey={handle['cacheKey']}&job={handle['job']}"
+                    while response.status_code == 200 and b'"response"' not in response.get_data():
+                        time.sleep(POLL_SECONDS)
+                        response = client.post(url, json=payload)
+                if response.status_code not in (200, 204):
+                    raise RuntimeError(f"{name} [{state_name}]: HTTP {response.status_code}")
+                return (time.perf_counter() - start) * 1000
+
+            filter_index.cache.clear()
+            cold = post()
+            warm = statistics.median(post() for _ in range(repeat))
+            results[name][state_name] = {'cold_ms': round(cold, 3), 'warm_ms': round(warm, 3)}
+        print(f"  {name[:40]:<40}" + ' '.join(f"{r['warm_ms']:8.1f}" for r in results[name].values()), flush=True)
+    return results
+
+
+def run(sizes, output_path, repeat, seed):
+    from synthetic_reviews import write_reviews
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'packages': package_versions(),
+        'runs': [],
+    }
+    for n in sizes:
+        size_dir = os.path.join(WORK_DIR, f'{n}-{seed}')
+        csv_path = os.path.join(size_dir, 'reviews-1.csv')
+        if not os.path.exists(csv_path):
+            os.makedirs(size_dir, exist_ok=True)
+            print(f"generating {n} reviews", flush=True)
+            write_reviews(csv_path, n, seed)
+        # Fresh snapshot and image directories, so the build and cold callbacks are measured
+        snapshot_dir = os.path.join(size_dir, '.snapshots')
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+        env = dict(os.environ, MOMA_SNAPSHOT_DIR=snapshot_dir,
+                   MOMA_IMAGE_CACHE_DIR=os.path.join(snapshot_dir, 'images'))
+        worker_output = os.path.join(size_dir, 'result.json')
+        print(f"{n} reviews", flush=True)
+        subprocess.run([sys.executable, os.path.abspath(__file__), 'worker', csv_path, worker_output,
+                        '--repeat', str(repeat)], cwd=size_dir, env=env, check=True)
+        with open(worker_output) as f:
+            report['runs'].append(json.load(f))
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {output_path}")
+
+
+def compare(old_path, new_path):
+    # Side-by-side of two result files: stage seconds and median warm callback latency
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{old.get('commit')} -> {new.get('commit')}")
+    old_runs = {r['rows']: r for r in old['runs']}
+    for run in new['runs']:
+        before = old_runs.get(run['rows'])
+        if before is None:
+            continue
+        print(f"\n{run['rows']} reviews")
+        print(f"  {'stage':<34}{'old (s)':>10}{'new (s)':>10}{'ratio':>8}")
+        for name, timing in run['stages'].items():
+            if name in before['stages']:
+                a, b = before['stages'][name]['seconds'], timing['seconds']
+                print(f"  {name:<34}{a:>10.2f}{b:>10.2f}{b / a if a else float('nan'):>8.2f}")
+        print(f"  {'callback (median warm ms)':<34}{'old':>10}{'new':>10}{'ratio':>8}")
+        for name, by_state in run['callbacks'].items():
+            if name not in before['callbacks']:
+                continue
+            a = statistics.median(s['warm_ms'] for s in before['callbacks'][name].values())
+            b = statistics.median(s['warm_ms'] for s in by_state.values())
+            print(f"  {name[:34]:<34}{a:>10.1f}{b:>10.1f}{b / a if a else float('nan'):>8.2f}")
+        print(f"  {'peak RSS (MB)':<34}{before['peak_rss_mb']:>10.1f}{run['peak_rss_mb']:>10.1f}")
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ['worker']:
+        parser = argparse.ArgumentParser()
+        parser.add_argument('csv_path')
+        parser.add_argument('output_path')
+        parser.add_argument('--repeat', type=int, default=5)
+        args = parser.parse_args(argv[1:])
+        run_worker(args.csv_path, args.output_path, args.repeat)
+    elif argv[:1] == ['compare']:
+        compare(*argv[1:3])
+    else:
+        parser = argparse.ArgumentParser(description='Run the ingest and callback benchmarks.')
+        parser.add_argument('--sizes', default=','.join(str(n) for n in DEFAULT_SIZES),
+                            help='comma-separated review counts')
+        parser.add_argument('--repeat', type=int, default=5, help='warm requests per callback and state')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='result file (default: results/<commit>-<time>.json)')
+        args = parser.parse_args(argv)
+        output = args.output or os.path.join(
+            RESULTS_DIR, f"{git_commit() or 'local'}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+        run([int(n) for n in args.sizes.split(',')], output, args.repeat, args.seed)
+
+
+if __name__ == '__main__':
+    main()
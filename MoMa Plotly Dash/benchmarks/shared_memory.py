@@ -0,0 +1,67 @@
+# Memory per server worker with the shared dataset segment (shared_data.py) and with a
+# private copy per worker (MOMA_SHARED_DATA=0). Starts N workers at once, each loading the
+# dataset the way the app does, and prints what loading the data added to each worker's
+# private (unshared) memory and its proportional share (PSS) of the mapped pages. Run it
+# from the directory holding the CSV; the first shared run builds the segment.
+#   python "MoMa Plotly Dash/benchmarks/shared_memory.py" [workers] [reviews.csv]
+import os
+import subprocess
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORKER = f"""
+import sys, time
+sys.path.insert(0, {APP_DIR!r})
+import data_processing
+
+def memory():
+    fields = {{}}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            name, value = line.split()[:2]
+            if name in ('Pss:', 'Private_Dirty:'):
+                fields[name] = int(value) / 1024
+    return fields
+
+before = memory()
+from loader import dataset
+dataset.csv_path = sys.argv[1]
+dataset.wait()
+# Touch what the pages read
+dataset.filter_index.rows()
+dataset.unigram_matrix.top_terms(dataset.filter_index.rows())
+dataset.bigram_matrix.top_terms(dataset.filter_index.rows())
+sum(float(dataset.reviews_df[c].sum()) for c in dataset.reviews_df.select_dtypes('number').columns)
+after = memory()
+print(after['Private_Dirty:'] - before['Private_Dirty:'], after['Pss:'] - before['Pss:'], flush=True)
+# Stay alive until every worker has measured, so shared pages are counted once across them
+sys.stdin.read()
+"""
+
+
+def measure(workers, csv_path, shared):
+    env = dict(os.environ, MOMA_SHARED_DATA='1' if shared else '0')
+    procs = [subprocess.Popen([sys.executable, '-c', WORKER, csv_path], env=env, stdin=subprocess.PIPE,
+                              stdout=subprocess.PIPE, text=True) for _ in range(workers)]
+    results = [tuple(map(float, p.stdout.readline().split())) for p in procs]
+    for p in procs:
+        p.stdin.close()
+        p.wait()
+    return results
+
+
+def main(workers=4, csv_path='reviews-1.csv'):
+    workers = int(workers)
+    # Build the segment first so the shared run measures attaching, not building
+    measure(1, csv_path, shared=True)
+    for shared in (True, False):
+        results = measure(workers, csv_path, shared)
+        private = sum(r[0] for r in results)
+        pss = sum(r[1] for r in results)
+        print(f"{'shared' if shared else 'private':<8}{workers} workers: data adds {private:8.1f} MB private, "
+              f"{pss:8.1f} MB PSS in total ({pss / workers:.1f} MB PSS per worker)")
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,91 @@
+# Synthetic reviews shaped like reviews-1.csv (Title, Text, Year, Month, Day, Hometown,
+# Rating) for benchmarking at sizes the real dump does not reach. Ratings steer the mix
+# of positive and negative words so the sentiment, emotion and filter distributions look
+# roughly like real data; the same seed always writes the same file.
+#   python "MoMa Plotly Dash/benchmarks/synthetic_reviews.py" 100000 reviews-1.csv
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hometown import US_STATES
+
+CITIES = ['New York', 'Brooklyn', 'Queens', 'Bronx', 'Manhattan', 'NYC', 'Chicago', 'Austin',
+          'Boston', 'Seattle', 'London', 'Paris', 'Toronto', 'Berlin', 'Tokyo', 'Sydney', 'Madrid']
+REGIONS = sorted(US_STATES) + ['United Kingdom', 'France', 'Canada', 'Germany', 'Japan',
+                               'Australia', 'Spain', 'Unknown']
+
+POSITIVE = ['amazing', 'beautiful', 'great', 'wonderful', 'love', 'loved', 'inspiring', 'friendly',
+            'worth', 'fantastic', 'happy', 'enjoyed', 'stunning', 'impressive', 'excellent', 'fun']
+NEGATIVE = ['crowded', 'expensive', 'boring', 'rude', 'terrible', 'awful', 'hate', 'disappointing',
+            'long', 'noisy', 'dirty', 'confusing', 'overpriced', 'sad', 'angry', 'afraid']
+NEUTRAL = ['museum', 'gallery', 'painting', 'paintings', 'exhibit', 'exhibition', 'collection', 'art',
+           'modern', 'staff', 'lines', 'tickets', 'price', 'cafe', 'shop', 'floor', 'Monet', 'Picasso',
+           'Van', 'Gogh', 'Starry', 'Night', 'the', 'was', 'and', 'a', 'of', 'to', 'we', 'it', 'visit']
+MODIFIERS = ['very', 'really', 'extremely', 'not', 'never', 'but', 'kind of', 'so', 'too', 'quite']
+ENDINGS = ['.', '.', '.', '!', '!!', '?', '...', '']
+
+
+def synthetic_hometowns(n, seed=0):
+    # Mostly "City, Region" pairs from a few thousand distinct values, plus region-only
+    # entries, odd spacing and missing values, roughly as scraped
+    rng = np.random.default_rng(seed)
+    pool = [f'{c}, {r}' for c in CITIES for r in REGIONS]
+    pool += list(REGIONS) + [f' {c} ,{r} ' for c in CITIES[:5] for r in REGIONS[:10]]
+    pool += [f'{c} Heights, New York' for c in CITIES] + [', France', 'Unknown, Texas']
+    values = np.array(pool, dtype=object)[rng.integers(0, len(pool), n)]
+    values[rng.random(n) < 0.15] = None
+    return pd.Series(values, name='Hometown')
+
+
+def _sentences(rng, ratings, lengths):
+    # One word stream per review: neutral filler, modifiers, and sentiment words whose
+    # positive share grows with the rating
+    total = int(lengths.sum())
+    owner = np.repeat(np.arange(len(lengths)), lengths)
+    positive_share = (ratings[owner] - 0.5) / 5
+    kind = rng.random(total)
+    words = np.array(NEUTRAL, dtype=object)[rng.integers(0, len(NEUTRAL), total)]
+    modifiers = kind < 0.08
+    words[modifiers] = np.array(MODIFIERS, dtype=object)[rng.integers(0, len(MODIFIERS), modifiers.sum())]
+    sentiment = kind > 0.7
+    positive = sentiment & (rng.random(total) < positive_share)
+    negative = sentiment & ~positive
+    words[positive] = np.array(POSITIVE, dtype=object)[rng.integers(0, len(POSITIVE), positive.sum())]
+    words[negative] = np.array(NEGATIVE, dtype=object)[rng.integers(0, len(NEGATIVE), negative.sum())]
+    shout = rng.random(total) < 0.01
+    words[shout] = [w.upper() for w in words[shout]]
+    bounds = np.concatenate([[0], np.cumsum(lengths)])
+    endings = np.array(ENDINGS, dtype=object)[rng.integers(0, len(ENDINGS), len(lengths))]
+    return [' '.join(words[a:b]) + end for a, b, end in zip(bounds[:-1], bounds[1:], endings)]
+
+
+def synthetic_reviews(n, seed=0):
+    rng = np.random.default_rng(seed)
+    ratings = rng.choice([1, 2, 3, 4, 5], size=n, p=[0.06, 0.06, 0.13, 0.3, 0.45])
+    titles = _sentences(rng, ratings, rng.integers(1, 5, n))
+    texts = _sentences(rng, ratings, np.maximum(rng.lognormal(3.4, 0.7, n).astype(int), 3))
+    return pd.DataFrame({
+        'Title': [t.rstrip('.!?').title() for t in titles],
+        'Text': texts,
+        'Year': rng.integers(2012, 2025, n),
+        'Month': rng.integers(1, 13, n),
+        'Day': rng.integers(1, 29, n),
+        'Hometown': synthetic_hometowns(n, seed),
+        'Rating': ratings,
+    })
+
+
+def write_reviews(path, n, seed=0):
+    synthetic_reviews(n, seed).to_csv(path, index=False)
+    return path
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    path = sys.argv[2] if len(sys.argv) > 2 else 'reviews-1.csv'
+    write_reviews(path, n)
+    print(f"wrote {n} reviews to {path}")
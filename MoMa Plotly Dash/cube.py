@@ -0,0 +1,181 @@
+import numpy as np
+import pandas as pd
+
+from emotions import EMOTION_COLUMNS
+from topics import topic_columns
+
+# Low-cardinality dimensions of the cube, in axis order, and the score columns summed per cell
+# (a frame of reviews also has its topic weight columns summed, see topics.py)
+DIMENSIONS = ['Year', 'Month', 'TouristType', 'Sentiment', 'Rating', 'Emotion', 'Duplicate']
+MEASURES = ['Rating', 'TextBlob', 'VADER', 'Composite'] + EMOTION_COLUMNS
+
+
+class ReviewCube:
+    # Dense count and score-sum arrays over Year x Month x TouristType x Sentiment x Rating x
+    # Emotion x Duplicate, built once at load time. Charts that only group by these columns
+    # are answered by slicing and reducing the arrays, independent of the number of reviews.
+
+    def __init__(self, df, counts=None, sums=None):
+        # df has one row per review, or, with counts and sums (measure -> values), one row per
+        # already aggregated cell (see aggregate() and from_aggregates())
+        self.levels = {}
+        codes = []
+        for dim in DIMENSIONS:
+            values = df[dim] if dim in df else pd.Series(None, index=df.index, dtype=object)
+            levels = sorted(values.dropna().unique().tolist())
+            dim_codes = pd.Categorical(values, categories=levels).codes.astype(np.int64)
+            # Missing values (e.g. Emotion when NRCLex found nothing) get their own trailing level
+            if (dim_codes < 0).any():
+                dim_codes[dim_codes < 0] = len(levels)
+                levels = levels + [None]
+            self.levels[dim] = levels
+            codes.append(dim_codes)
+        self.shape = tuple(max(len(self.levels[dim]), 1) for dim in DIMENSIONS)
+        size = int(np.prod(self.shape))
+        cells = np.ravel_multi_index(codes, self.shape) if len(df) else np.empty(0, dtype=np.int64)
+        weights = None if counts is None else np.asarray(counts, dtype=float)
+        self.counts = np.bincount(cells, weights=weights, minlength=size).astype(np.int64).reshape(self.shape)
+        self.sums = {
+            m: np.bincount(cells, weights=np.asarray(df[m] if sums is None else sums[m], dtype=float),
+                           minlength=size).reshape(self.shape)
+            for m in MEASURES + (topic_columns(df.columns) if sums is None else [])
+        }
+
+    @classmethod
+    def from_aggregates(cls, aggregates):
+        # Cube from an aggregate() frame, without the reviews themselves
+        return cls(aggregates, counts=aggregates['Count'], sums={m: aggregates['Sum' + m] for m in MEASURES})
+
+    def add_sums(self, df, columns):
+        # Sum more per-review columns (the topic weights, which are only known once every
+        # review is in) into the cube; df's cube dimensions must fall within its levels
+        codes = []
+        for dim in DIMENSIONS:
+            values = df[dim] if dim in df else pd.Series(None, index=df.index, dtype=object)
+            levels = [level for level in self.levels[dim] if level is not None]
+            dim_codes = pd.Categorical(values, categories=levels).codes.astype(np.int64)
+            dim_codes[dim_codes < 0] = len(levels)
+            codes.append(dim_codes)
+        size = int(np.prod(self.shape))
+        cells = np.ravel_multi_index(codes, self.shape) if len(df) else np.empty(0, dtype=np.int64)
+        for m in columns:
+            self.sums[m] = np.bincount(cells, weights=df[m].to_numpy(dtype=float), minlength=size).reshape(self.shape)
+
+    @classmethod
+    def from_arrays(cls, levels, counts, sums):
+        # Cube over already built arrays (e.g. memory-mapped by shared_data)
+        review_cube = cls.__new__(cls)
+        review_cube.levels = levels
+        review_cube.shape = counts.shape
+        review_cube.counts = counts
+        review_cube.sums = sums
+        return review_cube
+
+    def select(self, years=None, tourist_types=None, sentiments=None, ratings=None, emotions=None, duplicates=None):
+        # Sub-cube for a filter state; an empty or None selection keeps the whole axis
+        selections = {'Year': years, 'TouristType': tourist_types, 'Sentiment': sentiments,
+                      'Rating': ratings, 'Emotion': emotions, 'Duplicate': duplicates}
+        index = {}
+        levels = {}
+        for axis, dim in enumerate(DIMENSIONS):
+            values = selections.get(dim)
+            positions = list(range(self.shape[axis]))
+            if values:
+                wanted = set(values)
+                positions = [i for i, level in enumerate(self.levels[dim]) if level in wanted]
+                # Selecting every level is the same as no selection and needs no copy
+                if len(positions) < self.shape[axis]:
+                    index[axis] = np.asarray(positions, dtype=np.intp)
+            levels[dim] = [self.levels[dim][i] for i in positions] if self.levels[dim] else []
+        return CubeSlice(self.counts, self.sums, levels, index)
+
+
+def aggregate(df):
+    # Review count and MEASURES sums (as Count, Sum<measure>) per occupied cube cell, one row
+    # per cell; frames from separate chunks of reviews are merged with combine_aggregates()
+    keys = pd.DataFrame({dim: (df[dim] if dim in df else pd.Series(None, index=df.index, dtype=object)).astype(object)
+                         for dim in DIMENSIONS})
+    values = pd.DataFrame({'Count': np.ones(len(df), dtype=np.int64)}, index=df.index)
+    for m in MEASURES:
+        values['Sum' + m] = df[m].to_numpy(dtype=float)
+    return pd.concat([keys, values], axis=1).groupby(DIMENSIONS, dropna=False, sort=True).sum().reset_index()
+
+
+def combine_aggregates(*frames):
+    frames = [f for f in frames if f is not None]
+    if len(frames) <= 1:
+        return frames[0] if frames else None
+    combined = pd.concat(frames, ignore_index=True)
+    for dim in DIMENSIONS:
+        combined[dim] = combined[dim].astype(object)
+    return combined.groupby(DIMENSIONS, dropna=False, sort=True).sum().reset_index()
+
+
+class CubeSlice:
+    # Restricted axes are cut out of the full cube one at a time, and a measure's sums
+    # only when a chart asks for that measure
+
+    def __init__(self, counts, sums, levels, index=None):
+        self.index = index or {}
+        self.counts = self._take(counts)
+        self._cube_sums = sums
+        self.sums = {}
+        self.levels = levels
+
+    def _take(self, array):
+        for axis, positions in self.index.items():
+            array = array.take(positions, axis=axis)
+        return array
+
+    def measure(self, name):
+        if name not in self.sums:
+            self.sums[name] = self._take(self._cube_sums[name])
+        return self.sums[name]
+
+    def total(self):
+        return int(self.counts.sum())
+
+    def _reduce(self, array, dims):
+        axes = tuple(i for i, dim in enumerate(DIMENSIONS) if dim not in dims)
+        return array.sum(axis=axes)
+
+    def counts_by(self, dim, sort_by_count=False, dropna=True):
+        # (levels, counts) for the levels present, like value_counts()/groupby().size()
+        counts = self._reduce(self.counts, [dim])
+        pairs = [(level, int(c)) for level, c in zip(self.levels[dim], counts)
+                 if c > 0 and not (dropna and level is None)]
+        if sort_by_count:
+            pairs.sort(key=lambda p: -p[1])
+        return [p[0] for p in pairs], [p[1] for p in pairs]
+
+    def means_by(self, dim, measure):
+        # (levels, means) of measure for the levels present, like groupby(dim)[measure].mean()
+        counts = self._reduce(self.counts, [dim])
+        sums = self._reduce(self.measure(measure), [dim])
+        present = counts > 0
+        levels = [level for level, p in zip(self.levels[dim], present) if p]
+        return levels, (sums[present] / counts[present]).tolist()
+
+    def counts_by2(self, row_dim, col_dim):
+        # Cross-tabulated counts as (row levels present, col levels, 2-D array)
+        table = self._reduce(self.counts, [row_dim, col_dim])
+        if DIMENSIONS.index(row_dim) > DIMENSIONS.index(col_dim):
+            table = table.T
+        present = table.sum(axis=1) > 0
+        rows = [level for level, p in zip(self.levels[row_dim], present) if p]
+        return rows, self.levels[col_dim], table[present]
+
+    def mean(self, measure):
+        total = self.total()
+        return float(self.measure(measure).sum() / total) if total else 0
+
+    def median(self, measure='Rating'):
+        # Median of a cube dimension from its count distribution, matching Series.median()
+        levels, counts = self.counts_by(measure, dropna=True)
+        total = sum(counts)
+        if not total:
+            return 0
+        cumulative = np.cumsum(counts)
+        lower = levels[int(np.searchsorted(cumulative, (total - 1) // 2, side='right'))]
+        upper = levels[int(np.searchsorted(cumulative, total // 2, side='right'))]
+        return (lower + upper) / 2
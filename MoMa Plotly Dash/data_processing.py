@@ -1,80 +1,210 @@
+import hashlib
+import os
+import numpy as np
 import pandas as pd
-from textblob import TextBlob
-from nltk.sentiment import SentimentIntensityAnalyzer
-try:
-    from nrclex import NRCLex
-except ImportError:
-    NRCLex = None
-
-def load_data(csv_path='reviews-1.csv'):
+from cube import ReviewCube
+import dedup
+import emotions
+from filter_index import FilterIndex
+from hometown import resolve_hometowns
+import ingest
+import nlp_resources
+import preprocessing
+from term_matrix import TermMatrix
+import schema
+import score_store
+import scoring
+import snapshot
+from text_index import TextIndex
+import topics
+
+# The dashboards' cache of preprocessing output (preprocessing.py), separate from the notebooks'
+PREPROCESS_CACHE = 'dashboard-preprocess'
+
+def load_data(csv_path='reviews-1.csv', use_snapshot=True, incremental=True, workers=None, chunk_size=None,
+              progress=None):
+    # Dumps above MOMA_STREAMING_BYTES are scored chunk by chunk into part files instead of
+    # in one pass; chunks already in the parts are not prepared again, and rows of the others
+    # found in the score store (kept by the single-pass build) are not scored again
+    if use_snapshot and ingest.use_streaming(csv_path):
+        out_dir = ingest.parts_dir(csv_path)
+        store = score_store.load_store(csv_path) if incremental else None
+        ingest.stream_reviews(csv_path, out_dir,
+                              lambda chunk: prepare_reviews(chunk, store=store, workers=workers,
+                                                            chunk_size=chunk_size),
+                              progress=progress)
+        ingest.remove_stale(csv_path, keep=out_dir)
+        return ingest.read_parts(out_dir)
+    # Serve the scored frame from the columnar snapshot when the CSV and scorers are unchanged
+    if use_snapshot:
+        df = snapshot.read_snapshot(csv_path)
+        if df is not None:
+            return df
+    # Finished scoring chunks are checkpointed under the snapshot key so a crashed build resumes
+    checkpoint_dir = None
+    if use_snapshot:
+        checkpoint_dir = os.path.splitext(snapshot.snapshot_path(csv_path))[0] + '.chunks'
+    df = build_reviews(csv_path, incremental=incremental and use_snapshot, workers=workers,
+                       chunk_size=chunk_size, progress=progress, checkpoint_dir=checkpoint_dir)
+    if use_snapshot:
+        snapshot.write_snapshot(df, csv_path)
+        scoring.clear_checkpoints(checkpoint_dir)
+    return df
+
+def build_reviews(csv_path, incremental=False, workers=None, chunk_size=None, progress=None, checkpoint_dir=None,
+                  compact=True):
     # Load CSV data
     df = pd.read_csv(csv_path)
+    store = score_store.load_store(csv_path) if incremental else None
+    df = prepare_reviews(df, store=store, workers=workers, chunk_size=chunk_size, progress=progress,
+                         checkpoint_dir=checkpoint_dir, compact=False)
+    # The store keeps full-precision scores, so it is written before compaction
+    if incremental:
+        score_store.save_store(df, csv_path)
+    # Categoricals, small ints, float32 scores and Arrow strings; Title/Text live on in ReviewText
+    if compact:
+        df = schema.compact(df)
+    return df
 
+def prepare_reviews(df, store=None, workers=None, chunk_size=None, progress=None, checkpoint_dir=None, compact=True):
+    # Every derived column for raw CSV rows; used on the whole file or on one streamed chunk (ingest.py)
     # Combine Title and Text for analysis
     df['ReviewText'] = df['Title'].fillna('') + ' ' + df['Text'].fillna('')
 
     # Create a datetime column
     df['Date'] = pd.to_datetime(df[['Year', 'Month', 'Day']])
 
-    # Extract City and Country from Hometown if possible
-    df['City'] = df['Hometown'].str.split(',').str[0].str.strip()
-    df['Country'] = df['Hometown'].str.split(',').str[-1].str.strip()
-    # Handle missing values
-    df['City'] = df['City'].fillna('Unknown')
-    df['Country'] = df['Country'].fillna('Unknown')
-    # Map US states to 'USA' in Country
-    us_states = set([
-        'Alabama', 'Alaska', 'Arizona', 'Arkansas', 'California', 'Colorado',
-        'Connecticut', 'Delaware', 'Florida', 'Georgia', 'Hawaii', 'Idaho',
-        'Illinois', 'Indiana', 'Iowa', 'Kansas', 'Kentucky', 'Louisiana',
-        'Maine', 'Maryland', 'Massachusetts', 'Michigan', 'Minnesota',
-        'Mississippi', 'Missouri', 'Montana', 'Nebraska', 'Nevada',
-        'New Hampshire', 'New Jersey', 'New Mexico', 'New York',
-        'North Carolina', 'North Dakota', 'Ohio', 'Oklahoma', 'Oregon',
-        'Pennsylvania', 'Rhode Island', 'South Carolina', 'South Dakota',
-        'Tennessee', 'Texas', 'Utah', 'Vermont', 'Virginia', 'Washington',
-        'West Virginia', 'Wisconsin', 'Wyoming'
-    ])
-    df['Country'] = df['Country'].apply(lambda x: 'USA' if x in us_states else x)
-
-    # Classify Tourist Type: Local / Domestic / Foreign / Not Specified
-    def classify_tourist(city, country):
-        if city == 'Unknown' or country == 'Unknown' or pd.isna(city) or pd.isna(country):
-            return 'Not Specified'
-        # Local if from NYC area
-        local_keywords = ['New York', 'NYC', 'Brooklyn', 'Manhattan', 'Queens', 'Bronx']
-        if country == 'USA':
-            for kw in local_keywords:
-                if kw.lower() in str(city).lower():
-                    return 'Local'
-            return 'Domestic'
-        else:
-            return 'Foreign'
-    df['TouristType'] = df.apply(lambda row: classify_tourist(row['City'], row['Country']), axis=1)
-
-    # Compute sentiment scores: TextBlob and VADER
-    df['TextBlob'] = df['ReviewText'].apply(lambda txt: TextBlob(txt).sentiment.polarity)
-    vader = SentimentIntensityAnalyzer()
-    df['VADER'] = df['ReviewText'].apply(lambda txt: vader.polarity_scores(str(txt))['compound'])
+    # Stable content key per review, used to carry results over between builds
+    row_keys = score_store.row_keys(df)
+
+    # Near-duplicate clusters (dedup.py): position of each row's canonical review
+    canonical = dedup.canonical_positions(df['ReviewText'])
+    duplicate = canonical != np.arange(len(df))
+
+    # Only rows not found in the score store (if any) are classified, scored and emotion-counted
+    known = score_store.split_known(row_keys, store)
+    stored = score_store.STORED_COLUMNS
+    parts = []
+    if known.any():
+        reused = store.loc[row_keys[known], stored]
+        reused.index = df.index[known]
+        parts.append(reused)
+    if not known.all():
+        fresh = df.loc[~known].copy()
+        add_hometown_columns(fresh)
+        add_emotion_columns(fresh, workers=workers)
+        # Reviews whose text matches up to whitespace (which neither scorer sees) are
+        # scored once; every other review, near-duplicate or not, is scored on its own text
+        same_text = fresh['ReviewText'].str.split().str.join(' ')
+        originals = fresh.loc[~same_text.duplicated()].copy()
+        if len(originals):
+            add_scores(originals, workers=workers, chunk_size=chunk_size, progress=progress,
+                       checkpoint_dir=checkpoint_dir)
+        for col in scoring.SCORE_COLUMNS:
+            fresh[col] = same_text.map(pd.Series(originals[col].to_numpy(), index=same_text[originals.index]))
+        parts.append(fresh[stored])
+    results = pd.concat(parts).reindex(df.index)
+    for col in stored:
+        df[col] = results[col]
+
     df['Composite'] = (df['TextBlob'] + df['VADER']) / 2.0
     # Composite sentiment category
     df['Sentiment'] = df['Composite'].apply(lambda c: 'Positive' if c > 0 else ('Negative' if c < 0 else 'Neutral'))
+    df['Emotion'] = emotions.dominant_emotion(df)
+    df['RowKey'] = row_keys
+    # Duplicates keep their own row, counts and scores but are tagged with their canonical
+    # review, so the dashboard can leave them out
+    df['Duplicate'] = duplicate
+    df['DuplicateOf'] = pd.Series(row_keys.to_numpy()[canonical], index=df.index).where(duplicate)
 
-    # Compute dominant emotion using NRCLex (if installed)
-    def get_emotion(txt):
-        if NRCLex is None:
-            return None
-        try:
-            emotion = NRCLex(txt)
-            top = emotion.top_emotions
-            if top:
-                return top[0][0]
-        except:
-            return None
-        return None
-    df['Emotion'] = df['ReviewText'].apply(get_emotion) if NRCLex else None
-
+    if compact:
+        df = schema.compact(df)
     return df
 
-# Global DataFrame accessible to all pages
-reviews_df = load_data()
+def add_hometown_columns(df):
+    # City, Country (US states mapped to 'USA') and Tourist Type: Local / Domestic / Foreign / Not Specified,
+    # resolved once per distinct Hometown value
+    resolved = resolve_hometowns(df['Hometown'])
+    df['City'] = resolved['City']
+    df['Country'] = resolved['Country']
+    df['TouristType'] = resolved['TouristType']
+
+def add_scores(df, workers=None, chunk_size=None, progress=None, checkpoint_dir=None):
+    # Compute sentiment scores (TextBlob and VADER)
+    scores = scoring.score_texts(df['ReviewText'], workers=workers, chunk_size=chunk_size,
+                                 progress=progress, checkpoint_dir=checkpoint_dir)
+    df['TextBlob'] = scores['TextBlob'].values
+    df['VADER'] = scores['VADER'].values
+
+def add_emotion_columns(df, workers=None):
+    # NRC word counts for all ten affect categories (compact integer columns), over the
+    # preprocessed text as in the notebooks; the dominant emotion is derived from them once
+    # stored and new rows are back together
+    counts = emotions.emotion_counts(preprocess_reviews(df['ReviewText'], workers=workers)['CleanText'])
+    for col in emotions.EMOTION_COLUMNS:
+        df[col] = counts[col]
+
+def preprocess_reviews(texts, prune=False, workers=None, use_cache=True):
+    # The notebooks' preprocessing of review texts (English only, cleaned, stopwords out,
+    # lemmatized), which the word and emotion analyses run on. build_dataset passes every
+    # loaded review with prune, so the cache only keeps current texts. Without NLTK's stopword
+    # corpus the scikit-learn English list the term matrices used before stands in.
+    try:
+        stopwords = preprocessing.default_stopwords()
+    except nlp_resources.MissingResources:
+        from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+        stopwords = ENGLISH_STOP_WORDS
+    return preprocessing.preprocess_texts(texts, stopwords=stopwords, workers=workers, use_cache=use_cache,
+                                          name=PREPROCESS_CACHE, prune=prune)
+
+def build_dataset(csv_path='reviews-1.csv', progress=None, on_status=None):
+    # The scored frame plus every index and matrix the pages read (see loader.Dataset)
+    report = on_status or (lambda status: None)
+    reviews_df = load_data(csv_path, progress=progress)
+    report('building indexes')
+    # Inverted index over ReviewText tokens for the keyword search box
+    text_index = TextIndex(reviews_df['ReviewText'])
+    # Unigram and bigram counts per review (rows aligned with reviews_df) for the word, negative
+    # and topic pages, over the preprocessed text (stopwords are already out of it)
+    clean_text = preprocess_reviews(reviews_df['ReviewText'], prune=True)['CleanText']
+    unigram_matrix = TermMatrix(clean_text, ngram_range=(1, 1), stop_words=None)
+    bigram_matrix = TermMatrix(clean_text, ngram_range=(2, 2), stop_words=None)
+    del clean_text
+    report('updating topic model')
+    # Topic weight columns go in before the cube, which sums them per cell
+    topic_model = topics.update_model(csv_path, unigram_matrix, reviews_df['RowKey'])
+    reviews_df = topics.add_topic_columns(reviews_df, topic_model.transform(unigram_matrix))
+    return {
+        'reviews_df': reviews_df,
+        # Fingerprint of the loaded reviews and the pipeline that derived them, part of every
+        # derived-artifact cache key (a report built by an older pipeline is not served)
+        'data_version': hashlib.sha1((snapshot.versions_tag() + '\n' + '\n'.join(reviews_df['RowKey']))
+                                     .encode('utf-8')).hexdigest()[:16],
+        'text_index': text_index,
+        # Shared filter engine used by every page callback
+        'filter_index': FilterIndex(reviews_df, text_index=text_index),
+        # Pre-aggregated counts and score sums for the charts that group by low-cardinality columns
+        'review_cube': build_cube(csv_path, reviews_df),
+        'unigram_matrix': unigram_matrix,
+        'bigram_matrix': bigram_matrix,
+        # Heaviest terms of each topic, in TopicId order
+        'topic_terms': topic_model.top_terms(),
+    }
+
+def build_cube(csv_path, reviews_df):
+    # A streamed dump's cube is combined from its per-part aggregates; only the topic weights,
+    # which need the whole corpus, are summed from the reviews
+    aggregates = ingest.read_aggregates(ingest.parts_dir(csv_path)) if ingest.use_streaming(csv_path) else None
+    if aggregates is None or int(aggregates['Count'].sum()) != len(reviews_df):
+        return ReviewCube(reviews_df)
+    review_cube = ReviewCube.from_aggregates(aggregates)
+    review_cube.add_sums(reviews_df, topics.topic_columns(reviews_df.columns))
+    return review_cube
+
+def __getattr__(name):
+    # `from data_processing import reviews_df` (scripts, notebooks, benchmarks) blocks until
+    # the shared dataset has loaded; the app itself reads loader.dataset without waiting
+    from loader import DATASET_FIELDS, dataset
+    if name in DATASET_FIELDS:
+        return getattr(dataset.wait(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
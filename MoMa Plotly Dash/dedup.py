@@ -0,0 +1,141 @@
+# Near-duplicate reviews (re-posts, the same title and text pushed twice, small edits) found
+# with MinHash signatures over word shingles of ReviewText and LSH banding. Reviews whose
+# signatures agree on a whole band land in the same bucket, and each is only compared with
+# the first review of its bucket, so the work grows with the number of reviews instead of
+# the number of pairs. A pair whose estimated Jaccard similarity (share of equal signature
+# values) reaches DUPLICATE_THRESHOLD joins one cluster; the earliest review of a cluster is
+# its canonical review. With 16 bands of 4 values a pair at 0.7 similarity shares a bucket
+# with probability 0.99 (0.9998 at 0.8); one word changed in a 40-word review leaves about 0.85.
+# Reviews with fewer than MIN_SHINGLES shingles ("Great museum!") are never duplicates:
+# they are too common to tell a re-post from two visitors saying the same thing. A
+# translation shares no shingles with its original and is not matched.
+# Clusters only drive the Duplicate tag and the dashboard's hide/show toggle: a near-duplicate
+# can still say the opposite ("... but honestly I hated it"), so every review keeps its own
+# sentiment and emotion scores. Only reviews with the same text up to whitespace share one
+# scoring pass (data_processing.prepare_reviews). The streamed ingest (ingest.py) clusters
+# each chunk on its own, so a re-post is only caught when it lands in its original's chunk.
+import os
+import re
+import zlib
+
+import numpy as np
+
+MINHASH_PERMUTATIONS = int(os.environ.get('MOMA_MINHASH_PERMUTATIONS', 64))
+LSH_BANDS = int(os.environ.get('MOMA_LSH_BANDS', 16))
+DUPLICATE_THRESHOLD = float(os.environ.get('MOMA_DUPLICATE_THRESHOLD', 0.7))
+SHINGLE_WORDS = 3
+MIN_SHINGLES = int(os.environ.get('MOMA_DUPLICATE_MIN_SHINGLES', 5))
+# Reviews hashed at a time; bounds the per-shingle arrays
+SIGNATURE_CHUNK_ROWS = 10_000
+
+WORD_RE = re.compile(r'[a-z0-9]+')
+# Permutations are (a * x + b) mod MERSENNE over 31-bit shingle hashes, exact in uint64
+MERSENNE = (1 << 31) - 1
+
+# Per-process memo of word -> crc32
+_word_hashes = {}
+
+
+def _permutations():
+    # Fixed seed: signatures from different runs and processes are comparable
+    rng = np.random.default_rng(20240601)
+    a = rng.integers(1, MERSENNE, MINHASH_PERMUTATIONS, dtype=np.uint64)
+    b = rng.integers(0, MERSENNE, MINHASH_PERMUTATIONS, dtype=np.uint64)
+    return a, b
+
+
+def signatures(texts):
+    # (MinHash signatures, one uint32 row per text; mask of texts with enough shingles to
+    # have a signature)
+    texts = list(texts)
+    a, b = _permutations()
+    sig = np.full((len(texts), MINHASH_PERMUTATIONS), MERSENNE, dtype=np.uint32)
+    eligible = np.zeros(len(texts), dtype=bool)
+    for start in range(0, len(texts), SIGNATURE_CHUNK_ROWS):
+        chunk = texts[start:start + SIGNATURE_CHUNK_ROWS]
+        shingles, owners = _shingles(chunk)
+        counts = np.bincount(owners, minlength=len(chunk))
+        keep = counts[owners] >= MIN_SHINGLES
+        shingles, owners = shingles[keep], owners[keep]
+        if not len(shingles):
+            continue
+        # Shingles are grouped by text, so each text's minimum is one reduceat segment
+        texts_here, starts = np.unique(owners, return_index=True)
+        for p in range(MINHASH_PERMUTATIONS):
+            values = (shingles * a[p] + b[p]) % MERSENNE
+            sig[start + texts_here, p] = np.minimum.reduceat(values, starts)
+        eligible[start + texts_here] = True
+    return sig, eligible
+
+
+def _shingles(texts):
+    # (31-bit hash of every SHINGLE_WORDS-word shingle, position of its text in texts)
+    hashes, owners = [], []
+    for i, text in enumerate(texts):
+        words = WORD_RE.findall(text.lower()) if isinstance(text, str) else []
+        for word in words:
+            h = _word_hashes.get(word)
+            if h is None:
+                h = _word_hashes[word] = zlib.crc32(word.encode('utf-8'))
+            hashes.append(h)
+        owners.extend([i] * len(words))
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    owners = np.asarray(owners, dtype=np.int64)
+    n = len(hashes) - SHINGLE_WORDS + 1
+    if n <= 0:
+        return np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int64)
+    # A shingle starting at word i hashes words i .. i + SHINGLE_WORDS - 1 of the same text
+    combined = np.zeros(n, dtype=np.uint64)
+    for k in range(SHINGLE_WORDS):
+        combined = combined * np.uint64(1000003) + hashes[k:k + n]
+    same_text = owners[:n] == owners[SHINGLE_WORDS - 1:]
+    return combined[same_text] % MERSENNE, owners[:n][same_text]
+
+
+def cluster(sig, eligible, threshold=DUPLICATE_THRESHOLD, bands=LSH_BANDS):
+    # Position of the canonical review of every review's cluster (its own position when it
+    # is not a duplicate)
+    parent = np.arange(len(sig))
+    rows = np.flatnonzero(eligible)
+    width = sig.shape[1] // bands
+    for band in range(bands):
+        if not len(rows):
+            break
+        # A band's values compared as one opaque key
+        keys = np.ascontiguousarray(sig[rows, band * width:(band + 1) * width]).view(
+            np.dtype((np.void, sig.itemsize * width))).ravel()
+        _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        # rows is ascending, so a bucket's first review is its earliest
+        leaders = rows[first[inverse.ravel()]]
+        candidates = np.flatnonzero(leaders != rows)
+        if not len(candidates):
+            continue
+        members, leaders = rows[candidates], leaders[candidates]
+        similar = (sig[members] == sig[leaders]).mean(axis=1) >= threshold
+        for i, j in zip(members[similar].tolist(), leaders[similar].tolist()):
+            _union(parent, i, j)
+    # Point every review straight at its cluster's root
+    while True:
+        grandparent = parent[parent]
+        if np.array_equal(grandparent, parent):
+            return parent
+        parent = grandparent
+
+
+def canonical_positions(texts):
+    sig, eligible = signatures(texts)
+    return cluster(sig, eligible)
+
+
+def _root(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def _union(parent, i, j):
+    # The earlier review becomes the root, so a cluster's root is its earliest review
+    i, j = _root(parent, i), _root(parent, j)
+    if i != j:
+        parent[max(i, j)] = min(i, j)
@@ -0,0 +1,101 @@
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# scipy, scikit-learn, TextBlob and NLTK are imported where they are used, so the pages can
+# import the category names below without loading them
+# NRC affect categories, in tie-breaking order for the dominant emotion
+EMOTIONS = ['fear', 'anger', 'anticipation', 'trust', 'surprise', 'positive', 'negative', 'sadness', 'disgust', 'joy']
+# Per-review word counts for each category, e.g. EmotionFear
+EMOTION_COLUMNS = ['Emotion' + e.capitalize() for e in EMOTIONS]
+
+LEXICON_FILENAME = 'nrc_en.json'
+
+
+def lexicon_path():
+    # MOMA_NRC_LEXICON, else the word -> [emotions] JSON shipped with NRCLex
+    if os.environ.get('MOMA_NRC_LEXICON'):
+        return os.environ['MOMA_NRC_LEXICON']
+    try:
+        import nrclex
+    except ImportError:
+        return None
+    package_dir = os.path.dirname(os.path.abspath(nrclex.__file__))
+    for candidate in [os.path.join(package_dir, 'data', LEXICON_FILENAME),
+                      os.path.join(package_dir, LEXICON_FILENAME),
+                      os.path.join(sys.prefix, LEXICON_FILENAME)]:
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+
+def load_lexicon(path=None):
+    path = path or lexicon_path()
+    if not path:
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def lemmatizer():
+    # NRCLex matches TextBlob noun lemmas; without the WordNet corpus terms are matched as written
+    import nlp_resources
+    from textblob import Word
+    from textblob.exceptions import MissingCorpusError
+    if not nlp_resources.available('wordnet'):
+        return None
+    try:
+        Word('reviews').lemmatize()
+    except (MissingCorpusError, LookupError):
+        return None
+    return lambda term: Word(term).lemmatize()
+
+
+def emotion_matrix(vocabulary, lexicon, lemmatize=None):
+    # Sparse term x emotion indicator matrix for a fitted vocabulary: a term counts towards
+    # every category its lemma (or, failing that, the term itself) carries in the lexicon
+    from scipy import sparse
+    column = {e: i for i, e in enumerate(EMOTIONS)}
+    rows, cols = [], []
+    for i, term in enumerate(vocabulary):
+        lemma = lemmatize(term) if lemmatize else term
+        entry = lexicon.get(lemma) or lexicon.get(term) or []
+        for emotion in entry:
+            if emotion in column:
+                rows.append(i)
+                cols.append(column[emotion])
+    data = np.ones(len(rows), dtype=np.int32)
+    return sparse.csr_matrix((data, (rows, cols)), shape=(len(vocabulary), len(EMOTIONS)))
+
+
+def emotion_counts(texts, lexicon=None):
+    # DataFrame of EMOTION_COLUMNS: how many words of each NRC category every text contains,
+    # from one document-term x term-emotion sparse product over the whole corpus
+    from sklearn.feature_extraction.text import CountVectorizer
+    texts = pd.Series(texts).fillna('')
+    lexicon = load_lexicon() if lexicon is None else lexicon
+    counts = np.zeros((len(texts), len(EMOTIONS)), dtype=np.int64)
+    if lexicon and len(texts):
+        vectorizer = CountVectorizer(dtype=np.int32)
+        try:
+            doc_terms = vectorizer.fit_transform(texts)
+        except ValueError:
+            # Only empty texts: nothing to count
+            doc_terms = None
+        if doc_terms is not None:
+            terms = emotion_matrix(vectorizer.get_feature_names_out(), lexicon, lemmatizer())
+            counts = (doc_terms @ terms).toarray()
+    counts = np.minimum(counts, np.iinfo(np.uint16).max).astype(np.uint16)
+    return pd.DataFrame(counts, columns=EMOTION_COLUMNS, index=texts.index)
+
+
+def dominant_emotion(counts):
+    # Category with the most words per review; ties go to the earliest in EMOTIONS, and
+    # reviews without any lexicon word get None instead of a made-up winner
+    values = counts[EMOTION_COLUMNS].to_numpy()
+    labels = np.array(EMOTIONS, dtype=object)[values.argmax(axis=1)] if len(values) else np.empty(0, dtype=object)
+    labels[values.sum(axis=1) == 0] = None
+    return pd.Series(labels, index=counts.index, dtype=object)
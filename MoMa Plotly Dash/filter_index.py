@@ -0,0 +1,187 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from metrics import timed_phase
+
+# Filter argument -> reviews_df column, for the categorical filters shared by every page
+INDEXED_COLUMNS = {
+    'years': 'Year',
+    'tourist_types': 'TouristType',
+    'sentiments': 'Sentiment',
+    'ratings': 'Rating',
+    'emotions': 'Emotion',
+    # [False] leaves out near-duplicate reviews (see dedup.py)
+    'duplicates': 'Duplicate',
+}
+
+# Bounds for the process-wide filter result cache
+CACHE_MAX_ENTRIES = int(os.environ.get('MOMA_FILTER_CACHE_SIZE', 256))
+CACHE_MAX_BYTES = int(os.environ.get('MOMA_FILTER_CACHE_BYTES', 256 * 1024 * 1024))
+
+
+def normalize_state(years=None, tourist_types=None, sentiments=None, ratings=None, keyword=None, emotions=None,
+                    duplicates=None):
+    # Canonical, hashable form of a filter request: selections sorted, empty selections
+    # and blank keywords collapsed to None, keyword lower-cased (matching is case-insensitive)
+    def values(selection):
+        return tuple(sorted(set(selection), key=repr)) if selection else None
+    keyword = keyword.lower() if keyword and keyword.strip() else None
+    return (values(years), values(tourist_types), values(sentiments), values(ratings), keyword, values(emotions),
+            values(duplicates))
+
+
+class FilterCache:
+    # Bounded LRU of normalized filter state -> row positions, shared by every callback
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Background jobs are forked from a threaded server; a child must not inherit a held lock
+        os.register_at_fork(after_in_child=self._reset_lock)
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _reset_lock(self):
+        self._lock = threading.Lock()
+
+    def get(self, key, compute):
+        with self._lock:
+            rows = self._entries.get(key)
+            if rows is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return rows
+            self.misses += 1
+        # Computed outside the lock so a slow keyword scan does not block other lookups
+        rows = compute()
+        rows.flags.writeable = False
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = rows
+                self.nbytes += rows.nbytes
+                self._evict()
+        return rows
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self.nbytes > self.max_bytes):
+            _, rows = self._entries.popitem(last=False)
+            self.nbytes -= rows.nbytes
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self.nbytes, 'hits': self.hits,
+                    'misses': self.misses, 'evictions': self.evictions}
+
+
+class FilterIndex:
+    # Packed per-value bitmaps over reviews_df, built once at load time. A filter request is
+    # answered by OR-ing the bitmaps of the selected values within a column, AND-ing across
+    # columns and returning row positions; the frame itself is never copied.
+
+    def __init__(self, df, text_index=None, cache=None, bitmaps=None):
+        self.df = df
+        self.text_index = text_index
+        self.n_rows = len(df)
+        self.cache = cache if cache is not None else FilterCache()
+        # Row positions are stored as int32 whenever they fit, halving cache memory
+        self.row_dtype = np.int32 if self.n_rows < 2 ** 31 else np.int64
+        # bitmaps ({column: {value: packed bitmap}}) may come prebuilt, e.g. from shared_data
+        if bitmaps is None:
+            bitmaps = {}
+            for column in INDEXED_COLUMNS.values():
+                if column not in df:
+                    continue
+                codes, uniques = pd.factorize(df[column].to_numpy(), use_na_sentinel=True)
+                bitmaps[column] = {
+                    value: np.packbits(codes == code)
+                    for code, value in enumerate(_python_values(uniques))
+                }
+        self.bitmaps = bitmaps
+        self._empty = np.zeros((self.n_rows + 7) // 8, dtype=np.uint8)
+
+    def mask(self, column, values):
+        # Packed bitmap of rows whose column value is one of values
+        bitmaps = self.bitmaps.get(column, {})
+        selected = [bitmaps[v] for v in values if v in bitmaps]
+        if not selected:
+            return self._empty
+        if len(selected) == 1:
+            return selected[0]
+        return np.bitwise_or.reduce(selected)
+
+    @timed_phase('filter')
+    def rows(self, years=None, tourist_types=None, sentiments=None, ratings=None, keyword=None, emotions=None,
+             duplicates=None):
+        # Row positions (ascending, read-only) matching all filters; an empty or None filter selects everything
+        state = normalize_state(years, tourist_types, sentiments, ratings, keyword, emotions, duplicates)
+        return self.cache.get(state, lambda: self._compute_rows(*state))
+
+    def warm(self, years=None, tourist_types=None, sentiments=None, ratings=None, keyword=None, emotions=None,
+             duplicates=None):
+        self.rows(years, tourist_types, sentiments, ratings, keyword, emotions, duplicates)
+
+    def _compute_rows(self, years, tourist_types, sentiments, ratings, keyword, emotions, duplicates):
+        selections = {'years': years, 'tourist_types': tourist_types, 'sentiments': sentiments,
+                      'ratings': ratings, 'emotions': emotions, 'duplicates': duplicates}
+        bits = None
+        for arg, values in selections.items():
+            if not values:
+                continue
+            column_bits = self.mask(INDEXED_COLUMNS[arg], values)
+            bits = column_bits if bits is None else np.bitwise_and(bits, column_bits)
+        postings = self.text_index.search(keyword) if keyword and self.text_index is not None else None
+        if postings is not None:
+            # Keyword lookups start from the posting list and test each hit against the
+            # categorical bitmap, so the cost follows the number of matches, not the corpus
+            rows = postings.astype(self.row_dtype)
+            if bits is not None:
+                rows = rows[_test_bits(bits, rows)]
+            return rows
+        if bits is None:
+            rows = np.arange(self.n_rows, dtype=self.row_dtype)
+        else:
+            rows = np.flatnonzero(np.unpackbits(bits, count=self.n_rows)).astype(self.row_dtype)
+        if keyword and self.text_index is None:
+            texts = self.df['ReviewText'].take(rows)
+            rows = rows[texts.str.contains(keyword, case=False, na=False).to_numpy()]
+        return rows
+
+    @timed_phase('filter')
+    def frame(self, rows, columns):
+        # Only the requested columns of the matching rows are materialised. Categorical
+        # columns keep just the labels present, so value_counts() reports no zero rows
+        columns = {col: self.df[col].take(rows) for col in columns}
+        for col, values in columns.items():
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                columns[col] = values.cat.remove_unused_categories()
+        return pd.DataFrame(columns)
+
+    @timed_phase('filter')
+    def filter_df(self, years=None, tourist_types=None, sentiments=None, ratings=None, keyword=None,
+                  columns=None, emotions=None, duplicates=None):
+        rows = self.rows(years, tourist_types, sentiments, ratings, keyword, emotions, duplicates)
+        return self.frame(rows, columns if columns is not None else list(self.df.columns))
+
+
+def _test_bits(bits, rows):
+    # Bit test of a packbits (big-endian) bitmap at the given row positions
+    return ((bits[rows >> 3] >> (7 - (rows & 7))) & 1).astype(bool)
+
+
+def _python_values(values):
+    # Dash sends filter values as plain Python ints/strings, so key the bitmaps the same way
+    return [v.item() if isinstance(v, np.generic) else v for v in values]
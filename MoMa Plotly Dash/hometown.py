@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+US_STATES = frozenset([
+    'Alabama', 'Alaska', 'Arizona', 'Arkansas', 'California', 'Colorado',
+    'Connecticut', 'Delaware', 'Florida', 'Georgia', 'Hawaii', 'Idaho',
+    'Illinois', 'Indiana', 'Iowa', 'Kansas', 'Kentucky', 'Louisiana',
+    'Maine', 'Maryland', 'Massachusetts', 'Michigan', 'Minnesota',
+    'Mississippi', 'Missouri', 'Montana', 'Nebraska', 'Nevada',
+    'New Hampshire', 'New Jersey', 'New Mexico', 'New York',
+    'North Carolina', 'North Dakota', 'Ohio', 'Oklahoma', 'Oregon',
+    'Pennsylvania', 'Rhode Island', 'South Carolina', 'South Dakota',
+    'Tennessee', 'Texas', 'Utah', 'Vermont', 'Virginia', 'Washington',
+    'West Virginia', 'Wisconsin', 'Wyoming'
+])
+
+# Cities counted as Local (NYC area) when the hometown is in the USA
+LOCAL_KEYWORDS = ['new york', 'nyc', 'brooklyn', 'manhattan', 'queens', 'bronx']
+
+
+def resolve_hometown(hometown):
+    # (City, Country, TouristType) for one Hometown value, e.g. 'Austin, Texas' ->
+    # ('Austin', 'USA', 'Domestic'); missing values resolve to Unknown / Not Specified
+    if not isinstance(hometown, str):
+        return 'Unknown', 'Unknown', 'Not Specified'
+    parts = hometown.split(',')
+    city = parts[0].strip()
+    country = parts[-1].strip()
+    if country in US_STATES:
+        country = 'USA'
+    if city == 'Unknown' or country == 'Unknown':
+        return city, country, 'Not Specified'
+    if country == 'USA':
+        city_lower = city.lower()
+        if any(kw in city_lower for kw in LOCAL_KEYWORDS):
+            return city, country, 'Local'
+        return city, country, 'Domestic'
+    return city, country, 'Foreign'
+
+
+def resolve_hometowns(hometowns):
+    # Hometown strings repeat heavily, so each distinct value is resolved once and the
+    # results are broadcast back to the rows through its factorized code
+    codes, uniques = pd.factorize(hometowns, use_na_sentinel=True)
+    # Code -1 (missing Hometown) indexes the trailing entry
+    table = [resolve_hometown(value) for value in uniques] + [resolve_hometown(None)]
+    columns = {}
+    for i, name in enumerate(['City', 'Country', 'TouristType']):
+        lookup = np.array([entry[i] for entry in table], dtype=object)
+        columns[name] = pd.Series(lookup[codes], index=hometowns.index)
+    return pd.DataFrame(columns)
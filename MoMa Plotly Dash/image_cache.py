@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from flask import Response, abort, request
+
+import snapshot
+
+IMAGE_CACHE_DIR = os.environ.get('MOMA_IMAGE_CACHE_DIR', os.path.join(snapshot.SNAPSHOT_DIR, 'images'))
+IMAGE_CACHE_MEMORY_BYTES = int(os.environ.get('MOMA_IMAGE_CACHE_MEMORY_BYTES', 64 * 1024 * 1024))
+IMAGE_CACHE_DISK_BYTES = int(os.environ.get('MOMA_IMAGE_CACHE_DISK_BYTES', 512 * 1024 * 1024))
+
+
+def image_key(*parts):
+    # Content key for an image: anything that changes the pixels must be one of the parts
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+class ImageCache:
+    # Rendered PNGs keyed by image_key(), held in a size-bounded in-memory LRU and written
+    # to a size-bounded directory so every worker process can serve any cached image.
+    # Images are immutable per key, so the route lets browsers cache them indefinitely.
+
+    def __init__(self, directory=IMAGE_CACHE_DIR, max_memory_bytes=IMAGE_CACHE_MEMORY_BYTES,
+                 max_disk_bytes=IMAGE_CACHE_DISK_BYTES, url_prefix='/wordclouds', fallback=None):
+        self.directory = directory
+        # fallback(key) -> PNG bytes or None, consulted when neither memory nor disk has the key
+        self.fallback = fallback
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.url_prefix = url_prefix
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        # Background jobs are forked from a threaded server; a child must not inherit a held lock
+        os.register_at_fork(after_in_child=self._reset_lock)
+        self.hits = 0
+        self.misses = 0
+
+    def _reset_lock(self):
+        self._lock = threading.Lock()
+
+    def path(self, key):
+        return os.path.join(self.directory, f'{key}.png')
+
+    def url(self, key):
+        return f'{self.url_prefix}/{key}.png'
+
+    def get(self, key):
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return data
+        try:
+            with open(self.path(key), 'rb') as f:
+                data = f.read()
+        except OSError:
+            data = self.fallback(key) if self.fallback is not None else None
+            if data is None:
+                with self._lock:
+                    self.misses += 1
+                return None
+        with self._lock:
+            self.hits += 1
+        self._remember(key, data)
+        return data
+
+    def __contains__(self, key):
+        with self._lock:
+            if key in self._memory:
+                return True
+        return os.path.exists(self.path(key))
+
+    def put(self, key, data):
+        self._remember(key, data)
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f'{self.path(key)}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, self.path(key))
+        self._trim_disk()
+
+    def _remember(self, key, data):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return
+            self._memory[key] = data
+            self._memory_bytes += len(data)
+            while self._memory and self._memory_bytes > self.max_memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+
+    def _trim_disk(self):
+        # Oldest files go first once the directory grows past its budget
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.png'):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+            total -= size
+
+    def register_route(self, server):
+        cache = self
+
+        @server.route(f'{self.url_prefix}/<key>.png', endpoint=f'image_cache{self.url_prefix.replace("/", "_")}')
+        def serve_cached_image(key):
+            if not all(c in '0123456789abcdef' for c in key):
+                abort(404)
+            data = cache.get(key)
+            if data is None:
+                abort(404)
+            response = Response(data, mimetype='image/png')
+            response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+            response.set_etag(key)
+            return response.make_conditional(request)
@@ -0,0 +1,204 @@
+# Streaming ingest for review dumps too large to score in one pass. The CSV is read in
+# bounded chunks; each chunk goes through prepare (data_processing.prepare_reviews: near-
+# duplicates, hometown, sentiment, emotions, compaction) and is written straight to its own
+# Arrow IPC part file, next to the chunk's cube aggregates (review count and score sums per
+# Year x Month x TouristType x Sentiment x Rating x Emotion x Duplicate cell). Scoring memory
+# (raw text, intermediate frames, score lists, duplicate signatures) is bounded by the chunk
+# size, not the file size, and so is the duplicate search: near-duplicates are only matched
+# within a chunk. The cube is combined from the per-part aggregates (read_aggregates); the
+# text index, term matrices and topic model still need every review, which read_parts maps
+# from the part files with the strings left in their Arrow buffers.
+# Part files are named by the content hash of their raw chunk, in one directory per scorer
+# version, so a rerun only prepares chunks it has not seen: after a crash, or after reviews
+# are appended to the CSV (only the last, grown chunk and the new ones). Rows inserted or
+# deleted mid-file shift every later chunk boundary; those chunks are prepared again, with
+# scores taken from the score store when the dump was once small enough for a single pass.
+#   python "MoMa Plotly Dash/ingest.py" reviews-1.csv [out_dir] [--chunk-rows N]
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+import cube
+import schema
+import score_store
+import snapshot
+
+# Rows per streamed chunk, and the CSV size above which load_data streams instead of
+# reading the whole file
+STREAM_CHUNK_ROWS = int(os.environ.get('MOMA_STREAM_CHUNK_ROWS', 100_000))
+STREAMING_BYTES = int(os.environ.get('MOMA_STREAMING_BYTES', 512 * 1024 * 1024))
+
+MANIFEST = 'manifest.json'
+
+
+def use_streaming(csv_path, threshold=STREAMING_BYTES):
+    return threshold > 0 and os.path.getsize(csv_path) > threshold
+
+
+def parts_dir(csv_path):
+    # Next to the snapshots, one directory per scorer version (parts are keyed by content)
+    return os.path.join(snapshot.SNAPSHOT_DIR, f'{snapshot._stem(csv_path)}.parts-{snapshot.versions_tag()}')
+
+
+def stream_reviews(csv_path, out_dir, prepare, chunk_rows=None, progress=None):
+    # Ingest csv_path into out_dir (part-<digest>.arrow and part-<digest>.cube.feather files,
+    # manifest.json) and return the manifest. prepare(chunk) returns a raw CSV chunk's scored
+    # frame; progress(rows_done, None) is called after every chunk.
+    chunk_rows = chunk_rows or STREAM_CHUNK_ROWS
+    csv_digest = snapshot.file_digest(csv_path)
+    manifest = read_manifest(out_dir)
+    if (manifest is not None and manifest.get('complete') and manifest.get('csv_digest') == csv_digest
+            and manifest.get('chunk_rows') == chunk_rows):
+        return dict(manifest, prepared=0)
+    os.makedirs(out_dir, exist_ok=True)
+
+    parts = []
+    arrow_schema = None
+    rows = 0
+    prepared = 0
+    start = time.perf_counter()
+    for chunk in pd.read_csv(csv_path, chunksize=chunk_rows):
+        digest = chunk_digest(chunk)
+        name = f'part-{digest}.arrow'
+        cube_name = f'part-{digest}.cube.feather'
+        path = os.path.join(out_dir, name)
+        cube_path = os.path.join(out_dir, cube_name)
+        if os.path.exists(path) and os.path.exists(cube_path):
+            # Already ingested: only its schema is read back (memory-mapped, no rows copied)
+            arrow_schema = arrow_schema or part_schema(feather.read_table(path, memory_map=True).schema)
+        else:
+            scored = prepare(chunk)
+            table = pa.Table.from_pandas(scored.reset_index(drop=True), preserve_index=False)
+            arrow_schema = arrow_schema or part_schema(table.schema)
+            # The aggregates go in first: a part file is only taken as done with its aggregates
+            _write_feather(cube.aggregate(scored), cube_path)
+            _write_feather(table.cast(arrow_schema), path)
+            prepared += 1
+            del scored, table
+        rows += len(chunk)
+        parts.append({'file': name, 'cube': cube_name, 'rows': len(chunk), 'digest': digest})
+        del chunk
+        if progress:
+            progress(rows, None)
+
+    # Parts of chunks the CSV no longer has (edited rows, an interrupted run's partial files)
+    current = {part['file'] for part in parts} | {part['cube'] for part in parts}
+    for name in os.listdir(out_dir):
+        if name.startswith('part-') and name not in current:
+            os.remove(os.path.join(out_dir, name))
+    manifest = {'csv': os.path.abspath(csv_path), 'csv_digest': csv_digest, 'chunk_rows': chunk_rows,
+                'parts': parts, 'rows': rows, 'prepared': prepared, 'complete': True,
+                'seconds': round(time.perf_counter() - start, 3)}
+    _write_manifest(out_dir, manifest)
+    return manifest
+
+
+def chunk_digest(chunk):
+    # Content hash of a raw CSV chunk, to tell whether an existing part still matches
+    hashed = pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+    return hashlib.sha1(hashed.tobytes()).hexdigest()[:16]
+
+
+def part_schema(schema):
+    # Every part is written with the first part's schema, with categoricals as int32-indexed
+    # string dictionaries, so parts whose chunks saw different categories read back as one table
+    fields = []
+    for field in schema:
+        if pa.types.is_dictionary(field.type):
+            field = pa.field(field.name, pa.dictionary(pa.int32(), pa.string()))
+        fields.append(field)
+    return pa.schema(fields)
+
+
+def read_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def read_parts(out_dir, columns=None):
+    # The ingested reviews as one frame (in CSV order), optionally only some columns. The part
+    # files are memory-mapped, and string columns stay in their Arrow buffers (as
+    # StringDtype('pyarrow'), which schema.compact gives them anyway) instead of being copied
+    # into a Python object per row.
+    manifest = read_manifest(out_dir)
+    if manifest is None or not manifest.get('complete'):
+        return None
+    tables = [feather.read_table(os.path.join(out_dir, part['file']), columns=columns, memory_map=True)
+              for part in manifest['parts']]
+    if not tables:
+        return None
+    return pa.concat_tables(tables).to_pandas(types_mapper=_string_type)
+
+
+def read_aggregates(out_dir):
+    # The per-part aggregates combined into one cube.aggregate() frame; ReviewCube.from_aggregates()
+    # turns it into a cube without loading any review
+    manifest = read_manifest(out_dir)
+    if manifest is None or not manifest.get('complete'):
+        return None
+    return cube.combine_aggregates(*[feather.read_feather(os.path.join(out_dir, part['cube']))
+                                     for part in manifest['parts']])
+
+
+def remove_stale(csv_path, keep):
+    # Part directories of earlier scorer versions
+    prefix = f'{snapshot._stem(csv_path)}.parts-'
+    if not os.path.isdir(snapshot.SNAPSHOT_DIR):
+        return
+    for name in os.listdir(snapshot.SNAPSHOT_DIR):
+        path = os.path.join(snapshot.SNAPSHOT_DIR, name)
+        if name.startswith(prefix) and path != keep:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _string_type(arrow_type):
+    if arrow_type in (pa.string(), pa.large_string()):
+        return schema.STRING
+    return None
+
+
+def _write_feather(df_or_table, path):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    feather.write_feather(df_or_table, tmp_path, compression='uncompressed')
+    os.replace(tmp_path, path)
+
+
+def _write_manifest(out_dir, manifest):
+    path = os.path.join(out_dir, MANIFEST)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Stream a review CSV into partitioned Arrow files.')
+    parser.add_argument('csv_path')
+    parser.add_argument('out_dir', nargs='?', help='output directory (default: next to the snapshots)')
+    parser.add_argument('--chunk-rows', type=int, default=STREAM_CHUNK_ROWS)
+    parser.add_argument('--workers', type=int)
+    args = parser.parse_args(argv)
+    out_dir = args.out_dir or parts_dir(args.csv_path)
+    # Only the command line needs the scoring pipeline; data_processing itself imports this module
+    import data_processing
+    store = score_store.load_store(args.csv_path)
+    manifest = stream_reviews(args.csv_path, out_dir,
+                              lambda chunk: data_processing.prepare_reviews(chunk, store=store, workers=args.workers),
+                              chunk_rows=args.chunk_rows,
+                              progress=lambda done, total: print(f"  {done} reviews", flush=True))
+    print(f"{manifest['rows']} reviews in {len(manifest['parts'])} parts ({manifest.get('prepared', 0)} prepared) under {out_dir}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,300 @@
+import fcntl
+import multiprocessing
+import os
+import pickle
+import signal
+import threading
+import time
+import traceback
+
+from dash.background_callback.managers import BaseBackgroundCallbackManager
+from dash.exceptions import PreventUpdate
+
+import snapshot
+from metrics import callback_metrics
+
+JOB_DIR = os.environ.get('MOMA_JOB_DIR', os.path.join(snapshot.SNAPSHOT_DIR, 'jobs'))
+# Results nobody collected (closed tabs, cancelled jobs) are swept after this many seconds
+JOB_RESULT_TTL = float(os.environ.get('MOMA_JOB_RESULT_TTL', 3600))
+# A cancelled job gets SIGTERM, then SIGKILL if it is still running this many seconds later
+JOB_KILL_GRACE = float(os.environ.get('MOMA_JOB_KILL_GRACE', 2))
+# Signals the server worker handles itself (gunicorn's worker handlers); a job resets them
+WORKER_SIGNALS = ['SIGINT', 'SIGQUIT', 'SIGHUP', 'SIGUSR1', 'SIGUSR2', 'SIGWINCH', 'SIGCHLD']
+
+
+class JobStore:
+    # Pickled values in one directory, shared by every server worker: the job writes its
+    # result there and whichever worker the browser's next poll lands on reads it back.
+    # The directory is created by the first write, not when the app is imported.
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, key):
+        return os.path.join(self.directory, f'{key}.pkl')
+
+    def set(self, key, value):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f'{self.path(key)}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path(key))
+        except BaseException:
+            # Including a job stopped by SIGTERM halfway through the write
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def get(self, key, default=None):
+        try:
+            with open(self.path(key), 'rb') as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return default
+
+    def add(self, key, value):
+        # Set only if absent; the first writer wins
+        os.makedirs(self.directory, exist_ok=True)
+        try:
+            fd = os.open(self.path(key), os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        return True
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except OSError:
+            pass
+
+    def sweep(self, max_age):
+        cutoff = time.time() - max_age
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                if name.endswith(('.pkl', '.tmp')) and os.stat(path).st_mtime < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+class JobManager(BaseBackgroundCallbackManager):
+    # Dash background-callback manager without an outside broker. Every job is a forked
+    # child of the server worker, so it starts with the loaded dataset without reading or
+    # attaching anything; results go through a JobStore directory. Job ids are request
+    # sequence numbers, increasing across all workers, and a job whose id the browser
+    # reports as superseded (a newer request for the same callback, or a change to one of
+    # its cancel inputs) is stopped, so a burst of filter changes leaves only the latest one
+    # running.
+    # The worker has other threads (dataset loader, segment checks), and only the forking
+    # thread exists in the child. Locks another thread may have held at the fork are
+    # replaced in the child by os.register_at_fork handlers next to them (FilterCache,
+    # PresetStore, ImageCache, Histogram, Dataset, nlp_resources, this manager), and the job
+    # resets the worker's signal handlers before running the callback (_run_job).
+
+    def __init__(self, directory=JOB_DIR, result_ttl=JOB_RESULT_TTL, kill_grace=JOB_KILL_GRACE):
+        self.store = JobStore(directory)
+        self.result_ttl = result_ttl
+        self.kill_grace = kill_grace
+        self._context = multiprocessing.get_context('fork')
+        self._children = {}
+        self._lock = threading.Lock()
+        os.register_at_fork(after_in_child=self._reset_lock)
+        super().__init__(None)
+
+    def _reset_lock(self):
+        # The worker's children are not the job's
+        self._lock = threading.Lock()
+        self._children = {}
+
+    def next_request_id(self):
+        # Shared counter file, incremented under an exclusive lock
+        os.makedirs(self.store.directory, exist_ok=True)
+        with open(os.path.join(self.store.directory, 'sequence'), 'a+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            request_id = int(f.read() or 0) + 1
+            f.seek(0)
+            f.truncate()
+            f.write(str(request_id))
+        return request_id
+
+    def make_job_fn(self, fn, progress, key=None):
+        store = self.store
+
+        def job_fn(result_key, progress_key, args, context):
+            # Runs in the job's process. Writes what Dash's own managers write: progress
+            # updates as lists, then the callback's return value, a no-update marker or the
+            # error, with the callback's timings (for /metrics) stored just before it. The
+            # callback gets no Dash callback context (dash.ctx, set_props); the page
+            # callbacks run as jobs use neither.
+            def set_progress(value):
+                store.set(progress_key, list(value) if isinstance(value, (list, tuple)) else [value])
+
+            maybe_progress = [set_progress] if progress else []
+            with callback_metrics.job_timing() as timing:
+                try:
+                    if isinstance(args, dict):
+                        output = fn(*maybe_progress, **args)
+                    elif isinstance(args, (list, tuple)):
+                        output = fn(*maybe_progress, *args)
+                    else:
+                        output = fn(*maybe_progress, args)
+                except PreventUpdate:
+                    output = {'_dash_no_update': '_dash_no_update'}
+                except Exception as err:
+                    output = {'background_callback_error': {'msg': str(err), 'tb': traceback.format_exc()}}
+            store.set(_timing_key(result_key), timing)
+            store.set(result_key, output)
+        return job_fn
+
+    def call_job_fn(self, key, job_fn, args, context):
+        self._reap()
+        self.store.sweep(self.result_ttl)
+        request_id = self.next_request_id()
+        submitted = time.time()
+        process = self._context.Process(target=_run_job,
+                                        args=(job_fn, key, self._make_progress_key(key), args, context), daemon=True)
+        process.start()
+        with self._lock:
+            self._children[process.pid] = process
+        self.store.set(_job_key(request_id), {'pid': process.pid, 'parent': os.getpid(), 'key': key,
+                                              'started': submitted})
+        return request_id
+
+    def terminate_job(self, job):
+        if job is None:
+            return
+        record = self.store.get(_job_key(job))
+        if record is None:
+            return
+        self.store.delete(_job_key(job))
+        # SIGTERM lets the job stop between Python steps and remove a result it was writing;
+        # one still running after kill_grace (stuck in native code) gets SIGKILL
+        if _kill(record, signal.SIGTERM):
+            timer = threading.Timer(self.kill_grace, self._kill_stuck, args=(record,))
+            timer.daemon = True
+            timer.start()
+        self._reap()
+
+    def _kill_stuck(self, record):
+        _kill(record, signal.SIGKILL)
+        self._reap()
+
+    def terminate_unhealthy_job(self, job):
+        if job and not self.job_running(job):
+            self.terminate_job(job)
+            return True
+        return False
+
+    def job_running(self, job):
+        record = self.store.get(_job_key(job)) if job else None
+        if record is None:
+            return False
+        self._reap()
+        return _job_alive(record)
+
+    def clear_cache_entry(self, key):
+        self.store.delete(key)
+
+    def get_or_create_signing_secret(self, generate):
+        self.store.add(self.SIGNING_SECRET_KEY, generate())
+        return self.store.get(self.SIGNING_SECRET_KEY)
+
+    def get_progress(self, key):
+        progress_key = self._make_progress_key(key)
+        progress = self.store.get(progress_key)
+        if progress:
+            self.store.delete(progress_key)
+        return progress
+
+    def result_ready(self, key):
+        return os.path.exists(self.store.path(key))
+
+    def get_result(self, key, job):
+        result = self.store.get(key, self.UNDEFINED)
+        if result is self.UNDEFINED:
+            return self.UNDEFINED
+        record = self.store.get(_job_key(job)) if job else None
+        callback_metrics.job_collected(self.store.get(_timing_key(key)), record and record['started'])
+        self.clear_cache_entry(key)
+        self.clear_cache_entry(_timing_key(key))
+        self.clear_cache_entry(self._make_progress_key(key))
+        if job:
+            self.terminate_job(job)
+        return result
+
+    def get_updated_props(self, key):
+        set_props_key = self._make_set_props_key(key)
+        result = self.store.get(set_props_key, self.UNDEFINED)
+        if result is self.UNDEFINED:
+            return {}
+        self.clear_cache_entry(set_props_key)
+        return result
+
+    def _reap(self):
+        # Collect finished children of this worker so they do not linger as zombies
+        with self._lock:
+            for pid, process in list(self._children.items()):
+                if not process.is_alive():
+                    process.join(0)
+                    del self._children[pid]
+
+
+def _job_key(job):
+    return f'job-{job}'
+
+
+def _timing_key(key):
+    return f'{key}-timing'
+
+
+def _run_job(job_fn, *args):
+    # First thing in a job's process. The worker's handlers would treat a signal for the job
+    # as one for the worker (and write to its wakeup pipe); SIGTERM raises SystemExit instead,
+    # so the job unwinds, skips storing a result and removes any half-written store file.
+    signal.set_wakeup_fd(-1)
+    for name in WORKER_SIGNALS:
+        signal.signal(getattr(signal, name), signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, _stop_job)
+    job_fn(*args)
+
+
+def _stop_job(signum, frame):
+    raise SystemExit(128 + signum)
+
+
+def _kill(record, sig):
+    # Signals the job if it is still running; a finished job's pid may already belong to
+    # another process
+    if not _job_alive(record):
+        return False
+    try:
+        os.kill(record['pid'], sig)
+    except OSError:
+        return False
+    return True
+
+
+def _job_alive(record):
+    # Still running and still the child of the worker that started it (pids get reused)
+    try:
+        with open(f"/proc/{record['pid']}/stat") as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+    except OSError:
+        return False
+    # State Z: exited, not yet reaped
+    return fields[0] != 'Z' and int(fields[1]) == record['parent']
+
+
+# Shared by the heavy page callbacks (word clouds, negative keywords)
+job_manager = JobManager()
@@ -0,0 +1,169 @@
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# How often a serving worker looks for a newer shared segment (see shared_data.py)
+SEGMENT_CHECK_SECONDS = float(os.environ.get('MOMA_SEGMENT_CHECK_SECONDS', 10))
+
+# What data_processing.build_dataset() produces; pages read these off `dataset` at call time
+DATASET_FIELDS = ['reviews_df', 'data_version', 'text_index', 'filter_index', 'review_cube',
+                  'unigram_matrix', 'bigram_matrix', 'topic_terms']
+
+
+class Dataset:
+    # The scored reviews and everything derived from them, loaded on a background thread so
+    # the server answers (placeholder page, /healthz, /readyz) while scoring and indexing run.
+    # data_processing and the libraries it pulls in (sklearn, scipy, nltk, TextBlob) are
+    # first imported by that thread. State goes loading -> ready, or loading -> failed.
+    # With shared_data enabled the fields are views of a segment shared by every worker on
+    # the host. They live in one dict, so switching to a newer segment is a single assignment.
+
+    def __init__(self, csv_path='reviews-1.csv'):
+        self.csv_path = csv_path
+        self.state = 'idle'
+        self.status = 'waiting to start'
+        self.error = None
+        self.started_at = None
+        self.load_seconds = None
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        # Background jobs are forked from a threaded server; a child must not inherit a held lock
+        os.register_at_fork(after_in_child=self._reset_lock)
+        self._thread = None
+        self._on_ready = []
+        self.fields = {}
+        self.segment = None
+        self._checked_at = 0
+        self._swapping = False
+
+    def _reset_lock(self):
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self.state == 'ready'
+
+    def on_ready(self, func):
+        # Run func(dataset) on the loader thread once the data is in place (before the
+        # dataset reports ready), e.g. to warm caches
+        self._on_ready.append(func)
+        return func
+
+    def start(self):
+        # Idempotent: the first call spawns the loader thread, later calls return it
+        with self._lock:
+            if self._thread is None:
+                self.state = 'loading'
+                self.started_at = time.time()
+                self._thread = threading.Thread(target=self._load, name='dataset-loader', daemon=True)
+                self._thread.start()
+        return self
+
+    def wait(self, timeout=None):
+        # Block until loaded (starting the loader if needed); re-raises a failed load
+        self.start()
+        self._done.wait(timeout)
+        if self.error is not None:
+            raise RuntimeError(f"loading {self.csv_path} failed: {self.error}")
+        return self
+
+    def __getattr__(self, name):
+        if name in DATASET_FIELDS:
+            fields = self.__dict__.get('fields', {})
+            if name in fields:
+                return fields[name]
+            raise AttributeError(f"dataset not loaded yet ({self.state}): {name}")
+        raise AttributeError(name)
+
+    def describe(self):
+        info = {'state': self.state, 'status': self.status}
+        if self.started_at is not None:
+            info['elapsed_seconds'] = round(self.load_seconds or time.time() - self.started_at, 1)
+        if self.ready:
+            info['rows'] = len(self.reviews_df)
+            info['data_version'] = self.data_version
+        if self.segment is not None:
+            info['segment'] = os.path.basename(self.segment)
+        if self.error is not None:
+            info['error'] = self.error
+        return info
+
+    def _progress(self, done, total):
+        # total is None while streaming a large dump (see ingest.py)
+        self.status = f"scoring reviews ({done}/{total})" if total else f"scoring reviews ({done} so far)"
+
+    def _load(self):
+        try:
+            self.status = 'importing libraries'
+            import data_processing
+            import shared_data
+            self.status = f"loading {self.csv_path}"
+            if shared_data.SHARED_DATA:
+                self.segment, parts = shared_data.load_shared(self.csv_path, self._build, on_status=self._set_status)
+            else:
+                parts = self._build()
+            self.fields = {name: parts[name] for name in DATASET_FIELDS}
+            self._run_hooks()
+            self.state = 'ready'
+            self.status = 'ready'
+        except Exception as exc:
+            logger.exception("loading %s failed", self.csv_path)
+            self.state = 'failed'
+            self.status = 'failed'
+            self.error = f"{type(exc).__name__}: {exc}"
+        finally:
+            self.load_seconds = time.time() - self.started_at
+            self._done.set()
+
+    def check_for_update(self):
+        # Cheap enough to call on every request: at most every SEGMENT_CHECK_SECONDS it reads
+        # the live-segment symlink, and when another worker (or `shared_data.py publish`) has
+        # published a newer segment, attaches to it on a background thread and swaps
+        if self.segment is None or not self.ready or time.time() - self._checked_at < SEGMENT_CHECK_SECONDS:
+            return False
+        self._checked_at = time.time()
+        import shared_data
+        path = shared_data.current_segment(self.csv_path)
+        with self._lock:
+            if path is None or path == self.segment or self._swapping:
+                return False
+            self._swapping = True
+        threading.Thread(target=self._swap, args=(path,), name='dataset-swap', daemon=True).start()
+        return True
+
+    def _swap(self, path):
+        import shared_data
+        try:
+            parts = shared_data.attach(path)
+            # The old segment stays mapped until requests still holding its fields finish
+            self.fields = {name: parts[name] for name in DATASET_FIELDS}
+            self.segment = path
+            logger.info("switched to shared segment %s", path)
+            self._run_hooks()
+            self.status = 'ready'
+        except Exception:
+            # Keep serving the segment already attached; the next check retries
+            logger.exception("attaching %s failed", path)
+        finally:
+            self._swapping = False
+
+    def _build(self):
+        import data_processing
+        return data_processing.build_dataset(self.csv_path, progress=self._progress, on_status=self._set_status)
+
+    def _run_hooks(self):
+        for func in self._on_ready:
+            self.status = f"warming up ({func.__name__})"
+            func(self)
+
+    def _set_status(self, status):
+        self.status = status
+
+
+# Process-wide instance, started when the app module is imported (gunicorn without
+# --preload), so the port is bound before any data is read. The first worker builds the
+# shared segment; the others attach to it.
+dataset = Dataset()
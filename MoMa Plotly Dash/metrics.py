@@ -0,0 +1,234 @@
+import contextlib
+import functools
+import logging
+import os
+import threading
+import time
+
+from flask import Response, g, has_request_context, request
+
+# Histogram buckets: seconds for latencies, bytes for response bodies
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Callbacks slower than this are logged with their phase breakdown; 0 disables the log
+SLOW_CALLBACK_MS = float(os.environ.get('MOMA_SLOW_CALLBACK_MS', 0))
+
+# queue is only recorded for background callbacks
+PHASES = ['filter', 'aggregate', 'render', 'queue']
+
+logger = logging.getLogger(__name__)
+
+# Timings of the background job running in this process; a job has no request of its own
+_job = threading.local()
+
+
+class Histogram:
+    # Cumulative Prometheus histogram, one series per label combination
+
+    def __init__(self, name, documentation, buckets, labels):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.labels = labels
+        self._series = {}
+        self._lock = threading.Lock()
+        # Background jobs are forked from a threaded server; a child must not inherit a held lock
+        os.register_at_fork(after_in_child=self._reset_lock)
+
+    def _reset_lock(self):
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['buckets'][i] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for label_values, series in sorted(self._series.items()):
+                labels = ','.join(f'{k}="{_escape(v)}"' for k, v in zip(self.labels, label_values))
+                for bound, count in zip(self.buckets, series['buckets']):
+                    lines.append(f'{self.name}_bucket{{{labels},le="{bound:g}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {series["count"]}')
+                lines.append(f'{self.name}_sum{{{labels}}} {series["sum"]!r}')
+                lines.append(f'{self.name}_count{{{labels}}} {series["count"]}')
+        return lines
+
+
+class CallbackMetrics:
+    # Per-callback latency split into filter / aggregate / render time plus response size.
+    # instrument(app) wraps app.callback, so every callback registered afterwards is timed
+    # without touching its code; timed_phase() marks the shared filter and render helpers.
+    # Each callback request is attributed as:
+    #   filter    time inside timed_phase('filter') helpers (FilterIndex lookups)
+    #   render    time inside timed_phase('render') helpers (word cloud images) plus Dash's
+    #             serialization of the returned figures into the response
+    #   aggregate the rest of the callback body (cube reads, term counts, figure dicts)
+    # A background callback runs in a job process (jobs.JobManager) that times its body the
+    # same way and stores the timings next to its result. The poll request that collects the
+    # result is recorded for the callback: its duration runs from the job's submission to
+    # that poll's response, the poll's own serialization counts as render, and the rest of
+    # the wait (the job starting, the browser's poll interval) as queue.
+
+    def __init__(self, slow_callback_ms=SLOW_CALLBACK_MS):
+        self.slow_callback_ms = slow_callback_ms
+        self.phase_seconds = Histogram('dash_callback_phase_seconds',
+                                       'Callback request time by phase (filter, aggregate, render).',
+                                       LATENCY_BUCKETS, ['callback', 'phase'])
+        self.duration_seconds = Histogram('dash_callback_duration_seconds',
+                                          'Total callback request time.', LATENCY_BUCKETS, ['callback'])
+        self.response_bytes = Histogram('dash_callback_response_bytes',
+                                        'Callback response body size.', BYTES_BUCKETS, ['callback'])
+
+    def instrument(self, app, route='/metrics'):
+        register = app.callback
+        metrics = self
+
+        def callback(*args, **kwargs):
+            decorator = register(*args, **kwargs)
+
+            def wrap(func):
+                return decorator(metrics._timed_callback(func))
+            return wrap
+
+        app.callback = callback
+        app.server.before_request(self._start_request)
+        app.server.after_request(self._finish_request)
+        app.server.add_url_rule(route, 'callback_metrics', self._serve)
+
+    def _timed_callback(self, func):
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            scope = _scope()
+            if scope is None:
+                return func(*args, **kwargs)
+            scope.callback_name = func.__name__
+            scope.callback_phases = {'filter': 0.0, 'render': 0.0}
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                scope.callback_seconds = time.perf_counter() - start
+        return timed
+
+    @contextlib.contextmanager
+    def job_timing(self):
+        # Used by a background job around its callback; yields a dict that holds the
+        # callback's timings once the block exits (empty if no timed callback ran)
+        timing = {}
+        _job.__dict__.clear()
+        _job.active = True
+        try:
+            yield timing
+        finally:
+            _job.active = False
+            if getattr(_job, 'callback_name', None):
+                timing.update(callback=_job.callback_name, seconds=_job.callback_seconds,
+                              phases=dict(_job.callback_phases))
+
+    def job_collected(self, timing, submitted):
+        # Called by the job manager in the poll request that picks up a job's result, with
+        # the job's timings and its submission time (time.time())
+        if timing and submitted is not None and has_request_context():
+            g.callback_job = dict(timing, submitted=submitted, collected=time.perf_counter())
+
+    def _start_request(self):
+        if request.path.endswith('/_dash-update-component'):
+            g.callback_request_start = time.perf_counter()
+
+    def _finish_request(self, response):
+        start = g.get('callback_request_start')
+        job = g.get('callback_job')
+        name = job['callback'] if job else g.get('callback_name')
+        if start is None or name is None:
+            return response
+        if job:
+            total = max(time.time() - job['submitted'], 0.0)
+            body = job['seconds']
+            phases = job['phases']
+            serialize = time.perf_counter() - job['collected']
+            timings = {
+                'filter': phases['filter'],
+                'aggregate': max(body - phases['filter'] - phases['render'], 0.0),
+                'render': phases['render'] + serialize,
+                'queue': max(total - body - serialize, 0.0),
+            }
+        else:
+            total = time.perf_counter() - start
+            body = g.callback_seconds
+            phases = g.callback_phases
+            timings = {
+                'filter': phases['filter'],
+                'aggregate': max(body - phases['filter'] - phases['render'], 0.0),
+                'render': phases['render'] + max(total - body, 0.0),
+            }
+        size = response.calculate_content_length()
+        if size is None:
+            size = len(response.get_data())
+        for phase in PHASES:
+            if phase in timings:
+                self.phase_seconds.observe(timings[phase], name, phase)
+        self.duration_seconds.observe(total, name)
+        self.response_bytes.observe(size, name)
+        if self.slow_callback_ms and total * 1000 >= self.slow_callback_ms:
+            payload = request.get_json(silent=True) or {}
+            inputs = {i.get('id'): i.get('value') for i in payload.get('inputs', []) if isinstance(i, dict)}
+            breakdown = ', '.join(f'{phase} {seconds * 1000:.0f}' for phase, seconds in timings.items())
+            logger.warning("slow callback %s: %.0f ms (%s ms), %d bytes, inputs %s",
+                           name, total * 1000, breakdown, size, inputs)
+        return response
+
+    def expose(self):
+        lines = []
+        for histogram in (self.phase_seconds, self.duration_seconds, self.response_bytes):
+            lines += histogram.expose()
+        return '\n'.join(lines) + '\n'
+
+    def _serve(self):
+        return Response(self.expose(), mimetype='text/plain; version=0.0.4')
+
+
+def timed_phase(phase):
+    # Attribute a helper's time to a phase of the callback (request or background job) it
+    # runs in; nested timed helpers (filter_df calling rows) only count once, outside
+    # callbacks it is a no-op
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            scope = _scope()
+            phases = getattr(scope, 'callback_phases', None)
+            if phases is None or getattr(scope, 'callback_phase_active', False):
+                return func(*args, **kwargs)
+            scope.callback_phase_active = True
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                phases[phase] += time.perf_counter() - start
+                scope.callback_phase_active = False
+        return wrapper
+    return decorator
+
+
+def _scope():
+    # Where the running callback's timings go: the background job's, else the request's g.
+    # A job forked during a request still sees that request's context, so the job comes first.
+    if getattr(_job, 'active', False):
+        return _job
+    return g if has_request_context() else None
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Process-wide instance; with several server workers each reports its own histograms
+callback_metrics = CallbackMetrics()
@@ -0,0 +1,124 @@
+# NLTK / TextBlob data the scorers rely on, resolved from local directories only. The
+# bundled directory (MOMA_NLTK_DATA, default nltk_data/ next to this file) is searched
+# first, then NLTK's usual locations. Availability is checked once per process and
+# remembered, so scripts that re-run on every interaction (the Streamlit dashboard) pay
+# for a dictionary lookup, not a search. Nothing here touches the network except the
+# explicit download command, run once on a connected machine to fill the bundled directory:
+#   python "MoMa Plotly Dash/nlp_resources.py" download [directory]
+#   python "MoMa Plotly Dash/nlp_resources.py" check
+import logging
+import os
+import sys
+import threading
+
+import nltk
+
+logger = logging.getLogger(__name__)
+
+BUNDLED_DATA_DIR = os.environ.get('MOMA_NLTK_DATA',
+                                  os.path.join(os.path.dirname(os.path.abspath(__file__)), 'nltk_data'))
+
+# Resource -> (nltk.data paths, any one of which will do; packages that provide them).
+# Newer NLTK releases renamed punkt and the tagger, so both spellings are accepted.
+RESOURCES = {
+    'vader_lexicon': (['sentiment/vader_lexicon.zip'], ['vader_lexicon']),
+    'punkt': (['tokenizers/punkt_tab/english/', 'tokenizers/punkt'], ['punkt_tab', 'punkt']),
+    'stopwords': (['corpora/stopwords'], ['stopwords']),
+    'wordnet': (['corpora/wordnet'], ['wordnet']),
+    'averaged_perceptron_tagger': (['taggers/averaged_perceptron_tagger_eng/', 'taggers/averaged_perceptron_tagger'],
+                                   ['averaged_perceptron_tagger_eng', 'averaged_perceptron_tagger']),
+    # The rest of textblob.download_corpora
+    'brown': (['corpora/brown'], ['brown']),
+    'conll2000': (['corpora/conll2000'], ['conll2000']),
+    'movie_reviews': (['corpora/movie_reviews'], ['movie_reviews']),
+}
+
+_found = {}
+_lock = threading.Lock()
+
+
+def _reset_lock():
+    global _lock
+    _lock = threading.Lock()
+
+
+# Background jobs are forked from a threaded server; a child must not inherit a held lock
+os.register_at_fork(after_in_child=_reset_lock)
+
+
+class MissingResources(LookupError):
+    def __init__(self, missing):
+        self.missing = list(missing)
+        super().__init__(
+            f"NLTK data not installed: {', '.join(self.missing)}. Copy it into {BUNDLED_DATA_DIR} "
+            f"(python \"MoMa Plotly Dash/nlp_resources.py\" download on a connected machine) or point "
+            f"MOMA_NLTK_DATA / NLTK_DATA at a directory that has it.")
+
+
+def use_bundled_data(directory=None):
+    # Put the bundled directory first on NLTK's search path (idempotent)
+    directory = directory or BUNDLED_DATA_DIR
+    if os.path.isdir(directory) and directory not in nltk.data.path:
+        nltk.data.path.insert(0, directory)
+
+
+def check_resources(names=None, refresh=False):
+    # {name: path or None}; each resource is looked up at most once per process
+    names = list(RESOURCES) if names is None else list(names)
+    with _lock:
+        if refresh:
+            _found.clear()
+        todo = [name for name in names if name not in _found]
+        if todo:
+            use_bundled_data()
+            for name in todo:
+                _found[name] = _find(RESOURCES[name][0])
+                if _found[name] is None:
+                    logger.info("NLTK resource %s not found locally", name)
+        return {name: _found[name] for name in names}
+
+
+def available(name):
+    return check_resources([name])[name] is not None
+
+
+def require_resources(names):
+    # Raises MissingResources naming everything that is absent
+    missing = [name for name, path in check_resources(names).items() if path is None]
+    if missing:
+        raise MissingResources(missing)
+
+
+def download_resources(names=None, directory=None):
+    # The only networked step: fetch resources into the bundled directory for offline hosts
+    directory = directory or BUNDLED_DATA_DIR
+    os.makedirs(directory, exist_ok=True)
+    for name in (list(RESOURCES) if names is None else names):
+        for package in RESOURCES[name][1]:
+            nltk.download(package, download_dir=directory, quiet=True)
+    use_bundled_data(directory)
+    return check_resources(names, refresh=True)
+
+
+def _find(paths):
+    for path in paths:
+        try:
+            return str(nltk.data.find(path))
+        except LookupError:
+            continue
+    return None
+
+
+def main(argv):
+    command = argv[0] if argv else 'check'
+    if command == 'download':
+        found = download_resources(directory=argv[1] if len(argv) > 1 else None)
+    else:
+        found = check_resources()
+    for name, path in found.items():
+        print(f"  {name:<28}{path or 'missing'}")
+    return 0 if all(found.values()) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -1,43 +1,49 @@
-    from dash import dcc, html
+from dash import dcc, html
 from dash.dependencies import Input, Output
-from data_processing import reviews_df
+from loader import dataset
+from emotions import EMOTIONS, EMOTION_COLUMNS
+from presets import preset
 
 layout = html.Div([
     html.H2("Emotion Analysis"),
-    dcc.Graph(id='emotion-dist-graph')
+    dcc.Graph(id='emotion-dist-graph'),
+    dcc.Graph(id='emotion-profile-graph')
 ])
 
 def register_callbacks(app):
-    # Data filtering helper
-    def filter_df(years, tourist_types, sentiments, ratings, keyword):
-        df = reviews_df.copy()
-        if years:
-            df = df[df['Year'].isin(years)]
-        if tourist_types:
-            df = df[df['TouristType'].isin(tourist_types)]
-        if sentiments:
-            df = df[df['Sentiment'].isin(sentiments)]
-        if ratings:
-            df = df[df['Rating'].isin(ratings)]
-        if keyword:
-            df = df[df['ReviewText'].str.contains(keyword, case=False, na=False)]
-        return df
-
     @app.callback(
-        Output('emotion-dist-graph', 'figure'),
+        [Output('emotion-dist-graph', 'figure'),
+         Output('emotion-profile-graph', 'figure')],
         [Input('year-filter', 'value'),
          Input('tourist-filter', 'value'),
          Input('sentiment-filter', 'value'),
          Input('rating-filter', 'value'),
-         Input('keyword-filter', 'value')]
+         Input('keyword-filter', 'value'),
+         Input('duplicate-filter', 'value')]
     )
-    def update_emotion_dist(years, tourist_types, sentiments, ratings, keyword):
-        dff = filter_df(years, tourist_types, sentiments, ratings, keyword)
-        if 'Emotion' not in dff or dff['Emotion'] is None:
-            return {'data': [], 'layout': {'title': 'Dominant Emotions'}}
+    def update_emotion_dist(years, tourist_types, sentiments, ratings, keyword, duplicates):
+        return compute_emotion(years, tourist_types, sentiments, ratings, keyword, duplicates)
+
+@preset('emotion')
+def compute_emotion(years, tourist_types, sentiments, ratings, keyword, duplicates=None):
+    if not keyword:
+        cube = dataset.review_cube.select(years, tourist_types, sentiments, ratings, duplicates=duplicates)
+        x, y = cube.counts_by('Emotion', sort_by_count=True)
+        # Average number of words per review for each NRC category
+        profile = [cube.mean(col) for col in EMOTION_COLUMNS]
+    else:
+        dff = dataset.filter_index.filter_df(years, tourist_types, sentiments, ratings, keyword,
+                                     duplicates=duplicates, columns=['Emotion'] + EMOTION_COLUMNS)
         counts = dff['Emotion'].value_counts()
-        fig = {
-            'data': [{'x': counts.index.tolist(), 'y': counts.values.tolist(), 'type': 'bar'}],
-            'layout': {'title': 'Dominant Emotions', 'xaxis': {'title': 'Emotion'}, 'yaxis': {'title': 'Count'}}
-        }
-        return fig
+        x, y = counts.index.tolist(), counts.values.tolist()
+        profile = [float(dff[col].mean()) if len(dff) else 0 for col in EMOTION_COLUMNS]
+    dist_fig = {
+        'data': [{'x': x, 'y': y, 'type': 'bar'}],
+        'layout': {'title': 'Dominant Emotions', 'xaxis': {'title': 'Emotion'}, 'yaxis': {'title': 'Count'}}
+    }
+    profile_fig = {
+        'data': [{'x': [e.capitalize() for e in EMOTIONS], 'y': profile, 'type': 'bar'}],
+        'layout': {'title': 'Average Emotion Profile', 'xaxis': {'title': 'Emotion'},
+                   'yaxis': {'title': 'Emotion words per review'}}
+    }
+    return dist_fig, profile_fig
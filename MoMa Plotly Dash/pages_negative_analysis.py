@@ -1,7 +1,8 @@
 from dash import dcc, html
 from dash.dependencies import Input, Output
-from data_processing import reviews_df
-from sklearn.feature_extraction.text import CountVectorizer
+from loader import dataset
+from emotions import EMOTIONS, EMOTION_COLUMNS
+from presets import preset
 
 layout = html.Div([
     html.H2("Negative Review Analysis"),
@@ -9,8 +10,7 @@ layout = html.Div([
     dcc.Dropdown(
         id='negative-emotion-filter',
         options=[
-            {'label': emo.capitalize(), 'value': emo} for emo in 
-            ['fear','anger','anticipation','trust','surprise','positive','negative','sadness','joy','disgust']
+            {'label': emo.capitalize(), 'value': emo} for emo in EMOTIONS
         ],
         placeholder='Select emotion',
         multi=False
@@ -18,44 +18,46 @@ layout = html.Div([
     dcc.Graph(id='negative-keywords-graph')
 ])
 
-def register_callbacks(app):
-    # Data filtering helper (always filter for negative sentiment)
-    def filter_df(emotion, years, tourist_types, ratings, keyword):
-        df = reviews_df.copy()
-        df = df[df['Sentiment'] == 'Negative']
-        if years:
-            df = df[df['Year'].isin(years)]
-        if tourist_types:
-            df = df[df['TouristType'].isin(tourist_types)]
-        if ratings:
-            df = df[df['Rating'].isin(ratings)]
-        if keyword:
-            df = df[df['ReviewText'].str.contains(keyword, case=False, na=False)]
-        if emotion:
-            df = df[df['Emotion'] == emotion]
-        return df
+# NRC word count column for each emotion in the dropdown
+EMOTION_COUNT_COLUMNS = dict(zip(EMOTIONS, EMOTION_COLUMNS))
 
+def register_callbacks(app):
     @app.callback(
         Output('negative-keywords-graph', 'figure'),
         [Input('negative-emotion-filter', 'value'),
          Input('year-filter', 'value'),
          Input('tourist-filter', 'value'),
          Input('rating-filter', 'value'),
-         Input('keyword-filter', 'value')]
+         Input('keyword-filter', 'value'),
+         Input('duplicate-filter', 'value')],
+        # Runs as a background job (jobs.JobManager); a newer request supersedes it, and
+        # leaving the page cancels it
+        background=True,
+        cancel=[Input('url', 'pathname')]
     )
-    def update_negative_keywords(emotion, years, tourist_types, ratings, keyword):
-        dff = filter_df(emotion, years, tourist_types, ratings, keyword)
-        texts = dff['ReviewText'].dropna().tolist()
-        if not texts:
-            return {'data': [], 'layout': {'title': 'Top Keywords in Negative Reviews'}}
-        vectorizer = CountVectorizer(stop_words='english')
-        X = vectorizer.fit_transform(texts)
-        freqs = dict(zip(vectorizer.get_feature_names_out(), X.toarray().sum(axis=0)))
-        top_words = sorted(freqs.items(), key=lambda x: x[1], reverse=True)[:10]
-        words = [w for w, _ in top_words]
-        counts = [cnt for _, cnt in top_words]
-        fig = {
-            'data': [{'x': words, 'y': counts, 'type': 'bar'}],
-            'layout': {'title': 'Top Keywords in Negative Reviews', 'xaxis': {'title': 'Word'}, 'yaxis': {'title': 'Count'}}
-        }
-        return fig
+    def update_negative_keywords(emotion, years, tourist_types, ratings, keyword, duplicates):
+        if emotion:
+            return compute_negative_keywords(emotion, years, tourist_types, ratings, keyword, duplicates)
+        # The sentiment filter does not apply here, so presets are looked up without it
+        return compute_negative_keywords_all(years, tourist_types, None, ratings, keyword, duplicates)
+
+def compute_negative_keywords(emotion, years, tourist_types, ratings, keyword, duplicates=None):
+    # Always restricted to negative sentiment
+    rows = dataset.filter_index.rows(years, tourist_types, ['Negative'], ratings, keyword, duplicates=duplicates)
+    if emotion:
+        # Reviews containing any word of the chosen emotion, not only those where it dominates
+        counts = dataset.reviews_df[EMOTION_COUNT_COLUMNS[emotion]].to_numpy()
+        rows = rows[counts[rows] > 0]
+    if not len(rows):
+        return {'data': [], 'layout': {'title': 'Top Keywords in Negative Reviews'}}
+    words, counts = dataset.unigram_matrix.top_terms(rows, n=10)
+    fig = {
+        'data': [{'x': words, 'y': counts, 'type': 'bar'}],
+        'layout': {'title': 'Top Keywords in Negative Reviews', 'xaxis': {'title': 'Word'}, 'yaxis': {'title': 'Count'}}
+    }
+    return fig
+
+@preset('negative_keywords')
+def compute_negative_keywords_all(years, tourist_types, sentiments, ratings, keyword, duplicates=None):
+    # No emotion selected; sentiments is ignored, as on the page
+    return compute_negative_keywords(None, years, tourist_types, ratings, keyword, duplicates)
@@ -1,6 +1,11 @@
 from dash import dcc, html
 from dash.dependencies import Input, Output
-from data_processing import reviews_df
+import logging
+import time
+from loader import dataset
+from presets import preset
+
+logger = logging.getLogger(__name__)
 
 layout = html.Div([
     html.H2("Overview"),
@@ -24,174 +29,107 @@ layout = html.Div([
     dcc.Graph(id='monthly-avg-rating-graph')
 ])
 
-def register_callbacks(app):
-    # Data filtering helper (applies all global filters)
-    def filter_df(years, tourist_types, sentiments, ratings, keyword):
-        df = reviews_df.copy()
-        if years:
-            df = df[df['Year'].isin(years)]
-        if tourist_types:
-            df = df[df['TouristType'].isin(tourist_types)]
-        if sentiments:
-            df = df[df['Sentiment'].isin(sentiments)]
-        if ratings:
-            df = df[df['Rating'].isin(ratings)]
-        if keyword:
-            df = df[df['ReviewText'].str.contains(keyword, case=False, na=False)]
-        return df
+# Outputs of the Overview page, all filled by one callback from one filtered row set
+OUTPUTS = [
+    Output('stats-container', 'children'),
+    Output('rating-dist-graph', 'figure'),
+    Output('tourist-dist-graph', 'figure'),
+    Output('yearly-reviews-graph', 'figure'),
+    Output('monthly-reviews-graph', 'figure'),
+    Output('top-cities-graph', 'figure'),
+    Output('top-countries-graph', 'figure'),
+    Output('monthly-avg-rating-graph', 'figure'),
+]
 
-    # Update descriptive stats (total, mean, median)
+def register_callbacks(app):
     @app.callback(
-        Output('stats-container', 'children'),
+        OUTPUTS,
         [Input('year-filter', 'value'),
          Input('tourist-filter', 'value'),
          Input('sentiment-filter', 'value'),
          Input('rating-filter', 'value'),
-         Input('keyword-filter', 'value')]
+         Input('keyword-filter', 'value'),
+         Input('duplicate-filter', 'value')]
     )
-    def update_stats(years, tourist_types, sentiments, ratings, keyword):
-        dff = filter_df(years, tourist_types, sentiments, ratings, keyword)
+    def update_overview(years, tourist_types, sentiments, ratings, keyword, duplicates):
+        start = time.perf_counter()
+        outputs = compute_overview(years, tourist_types, sentiments, ratings, keyword, duplicates)
+        logger.debug("overview computed in %.1f ms", (time.perf_counter() - start) * 1000)
+        return outputs
+
+@preset('overview')
+def compute_overview(years, tourist_types, sentiments, ratings, keyword, duplicates=None):
+    # Everything on the page from a single filter pass: grouped counts and means come from
+    # the cube slice (no keyword) or one narrow frame (keyword); cities/countries from rows
+    rows = dataset.filter_index.rows(years, tourist_types, sentiments, ratings, keyword, duplicates=duplicates)
+    if not keyword:
+        sub = dataset.review_cube.select(years, tourist_types, sentiments, ratings, duplicates=duplicates)
+        total_reviews = sub.total()
+        mean_rating = sub.mean('Rating')
+        median_rating = sub.median('Rating')
+        rating_x, rating_y = sub.counts_by('Rating')
+        tourist_x, tourist_y = sub.counts_by('TouristType', sort_by_count=True)
+        year_x, year_y = sub.counts_by('Year')
+        month_x, month_y = sub.counts_by('Month')
+        if total_reviews == 0:
+            avg_months, avg_vals = [], []
+        else:
+            by_month = dict(zip(*sub.means_by('Month', 'Rating')))
+            avg_months = list(range(1, 13))
+            avg_vals = [by_month.get(m, 0.0) for m in avg_months]
+    else:
+        dff = dataset.filter_index.frame(rows, ['Rating', 'TouristType', 'Year', 'Month'])
         total_reviews = dff.shape[0]
         mean_rating = dff['Rating'].mean() if total_reviews > 0 else 0
         median_rating = dff['Rating'].median() if total_reviews > 0 else 0
-        return [
-            html.P(f"Total Reviews: {total_reviews}"),
-            html.P(f"Mean Rating: {mean_rating:.2f}"),
-            html.P(f"Median Rating: {median_rating:.2f}")
-        ]
-
-    # Ratings distribution bar chart
-    @app.callback(
-        Output('rating-dist-graph', 'figure'),
-        [Input('year-filter', 'value'),
-         Input('tourist-filter', 'value'),
-         Input('sentiment-filter', 'value'),
-         Input('rating-filter', 'value'),
-         Input('keyword-filter', 'value')]
-    )
-    def update_rating_dist(years, tourist_types, sentiments, ratings, keyword):
-        dff = filter_df(years, tourist_types, sentiments, ratings, keyword)
         counts = dff['Rating'].value_counts().sort_index()
-        fig = {
-            'data': [{'x': counts.index.tolist(), 'y': counts.values.tolist(), 'type': 'bar'}],
-            'layout': {'title': 'Rating Distribution', 'xaxis': {'title': 'Rating'}, 'yaxis': {'title': 'Count'}}
-        }
-        return fig
-
-    # Tourist type distribution bar chart
-    @app.callback(
-        Output('tourist-dist-graph', 'figure'),
-        [Input('year-filter', 'value'),
-         Input('tourist-filter', 'value'),
-         Input('sentiment-filter', 'value'),
-         Input('rating-filter', 'value'),
-         Input('keyword-filter', 'value')]
-    )
-    def update_tourist_dist(years, tourist_types, sentiments, ratings, keyword):
-        dff = filter_df(years, tourist_types, sentiments, ratings, keyword)
+        rating_x, rating_y = counts.index.tolist(), counts.values.tolist()
         counts = dff['TouristType'].value_counts()
-        fig = {
-            'data': [{'x': counts.index.tolist(), 'y': counts.values.tolist(), 'type': 'bar'}],
-            'layout': {'title': 'Tourist Type Distribution', 'xaxis': {'title': 'Type'}, 'yaxis': {'title': 'Count'}}
-        }
-        return fig
-
-    # Reviews per year line chart
-    @app.callback(
-        Output('yearly-reviews-graph', 'figure'),
-        [Input('year-filter', 'value'),
-         Input('tourist-filter', 'value'),
-         Input('sentiment-filter', 'value'),
-         Input('rating-filter', 'value'),
-         Input('keyword-filter', 'value')]
-    )
-    def update_yearly_reviews(years, tourist_types, sentiments, ratings, keyword):
-        dff = filter_df(years, tourist_types, sentiments, ratings, keyword)
-        yearly_counts = dff.groupby('Year').size()
-        fig = {
-            'data': [{'x': yearly_counts.index.tolist(), 'y': yearly_counts.values.tolist(), 'type': 'line'}],
-            'layout': {'title': 'Reviews per Year', 'xaxis': {'title': 'Year'}, 'yaxis': {'title': 'Count'}}
-        }
-        return fig
-
-    # Reviews by month line chart (all years aggregated)
-    @app.callback(
-        Output('monthly-reviews-graph', 'figure'),
-        [Input('year-filter', 'value'),
-         Input('tourist-filter', 'value'),
-         Input('sentiment-filter', 'value'),
-         Input('rating-filter', 'value'),
-         Input('keyword-filter', 'value')]
-    )
-    def update_monthly_reviews(years, tourist_types, sentiments, ratings, keyword):
-        dff = filter_df(years, tourist_types, sentiments, ratings, keyword)
+        tourist_x, tourist_y = counts.index.tolist(), counts.values.tolist()
+        counts = dff.groupby('Year').size()
+        year_x, year_y = counts.index.tolist(), counts.values.tolist()
         if dff.empty:
-            months, counts = [], []
+            month_x, month_y, avg_months, avg_vals = [], [], [], []
         else:
-            monthly_counts = dff.groupby('Month').size().sort_index()
-            months = monthly_counts.index.tolist()
-            counts = monthly_counts.values.tolist()
-        fig = {
-            'data': [{'x': months, 'y': counts, 'type': 'line'}],
-            'layout': {'title': 'Reviews by Month (All Years)', 'xaxis': {'title': 'Month'}, 'yaxis': {'title': 'Count'}}
-        }
-        return fig
-
-    # Top cities bar chart
-    @app.callback(
-        Output('top-cities-graph', 'figure'),
-        [Input('year-filter', 'value'),
-         Input('tourist-filter', 'value'),
-         Input('sentiment-filter', 'value'),
-         Input('rating-filter', 'value'),
-         Input('keyword-filter', 'value')]
-    )
-    def update_top_cities(years, tourist_types, sentiments, ratings, keyword):
-        dff = filter_df(years, tourist_types, sentiments, ratings, keyword)
-        city_counts = dff['City'].value_counts().nlargest(10)
-        fig = {
-            'data': [{'x': city_counts.index.tolist(), 'y': city_counts.values.tolist(), 'type': 'bar'}],
-            'layout': {'title': 'Top Cities', 'xaxis': {'title': 'City'}, 'yaxis': {'title': 'Count'}}
-        }
-        return fig
+            monthly = dff.groupby('Month')['Rating'].agg(['size', 'mean']).sort_index()
+            month_x, month_y = monthly.index.tolist(), monthly['size'].tolist()
+            avg_ratings = monthly['mean'].reindex(range(1, 13)).fillna(0)
+            avg_months, avg_vals = avg_ratings.index.tolist(), avg_ratings.values.tolist()
+    places = dataset.filter_index.frame(rows, ['City', 'Country'])
+    city_counts = places['City'].value_counts().nlargest(10)
+    country_counts = places['Country'].value_counts().nlargest(10)
 
-    # Top countries bar chart
-    @app.callback(
-        Output('top-countries-graph', 'figure'),
-        [Input('year-filter', 'value'),
-         Input('tourist-filter', 'value'),
-         Input('sentiment-filter', 'value'),
-         Input('rating-filter', 'value'),
-         Input('keyword-filter', 'value')]
-    )
-    def update_top_countries(years, tourist_types, sentiments, ratings, keyword):
-        dff = filter_df(years, tourist_types, sentiments, ratings, keyword)
-        country_counts = dff['Country'].value_counts().nlargest(10)
-        fig = {
-            'data': [{'x': country_counts.index.tolist(), 'y': country_counts.values.tolist(), 'type': 'bar'}],
-            'layout': {'title': 'Top Countries', 'xaxis': {'title': 'Country'}, 'yaxis': {'title': 'Count'}}
-        }
-        return fig
-
-    # Average rating by month line chart
-    @app.callback(
-        Output('monthly-avg-rating-graph', 'figure'),
-        [Input('year-filter', 'value'),
-         Input('tourist-filter', 'value'),
-         Input('sentiment-filter', 'value'),
-         Input('rating-filter', 'value'),
-         Input('keyword-filter', 'value')]
-    )
-    def update_monthly_avg_rating(years, tourist_types, sentiments, ratings, keyword):
-        dff = filter_df(years, tourist_types, sentiments, ratings, keyword)
-        if dff.empty:
-            months, avg_vals = [], []
-        else:
-            avg_ratings = dff.groupby('Month')['Rating'].mean().reindex(range(1,13)).fillna(0)
-            months = avg_ratings.index.tolist()
-            avg_vals = avg_ratings.values.tolist()
-        fig = {
-            'data': [{'x': months, 'y': avg_vals, 'type': 'line'}],
-            'layout': {'title': 'Average Rating by Month', 'xaxis': {'title': 'Month'}, 'yaxis': {'title': 'Avg Rating'}}
-        }
-        return fig
+    stats = [
+        html.P(f"Total Reviews: {total_reviews}"),
+        html.P(f"Mean Rating: {mean_rating:.2f}"),
+        html.P(f"Median Rating: {median_rating:.2f}")
+    ]
+    rating_fig = {
+        'data': [{'x': rating_x, 'y': rating_y, 'type': 'bar'}],
+        'layout': {'title': 'Rating Distribution', 'xaxis': {'title': 'Rating'}, 'yaxis': {'title': 'Count'}}
+    }
+    tourist_fig = {
+        'data': [{'x': tourist_x, 'y': tourist_y, 'type': 'bar'}],
+        'layout': {'title': 'Tourist Type Distribution', 'xaxis': {'title': 'Type'}, 'yaxis': {'title': 'Count'}}
+    }
+    yearly_fig = {
+        'data': [{'x': year_x, 'y': year_y, 'type': 'line'}],
+        'layout': {'title': 'Reviews per Year', 'xaxis': {'title': 'Year'}, 'yaxis': {'title': 'Count'}}
+    }
+    monthly_fig = {
+        'data': [{'x': month_x, 'y': month_y, 'type': 'line'}],
+        'layout': {'title': 'Reviews by Month (All Years)', 'xaxis': {'title': 'Month'}, 'yaxis': {'title': 'Count'}}
+    }
+    cities_fig = {
+        'data': [{'x': city_counts.index.tolist(), 'y': city_counts.values.tolist(), 'type': 'bar'}],
+        'layout': {'title': 'Top Cities', 'xaxis': {'title': 'City'}, 'yaxis': {'title': 'Count'}}
+    }
+    countries_fig = {
+        'data': [{'x': country_counts.index.tolist(), 'y': country_counts.values.tolist(), 'type': 'bar'}],
+        'layout': {'title': 'Top Countries', 'xaxis': {'title': 'Country'}, 'yaxis': {'title': 'Count'}}
+    }
+    avg_rating_fig = {
+        'data': [{'x': avg_months, 'y': avg_vals, 'type': 'line'}],
+        'layout': {'title': 'Average Rating by Month', 'xaxis': {'title': 'Month'}, 'yaxis': {'title': 'Avg Rating'}}
+    }
+    return [stats, rating_fig, tourist_fig, yearly_fig, monthly_fig, cities_fig, countries_fig, avg_rating_fig]
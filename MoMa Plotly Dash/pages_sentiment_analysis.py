@@ -1,6 +1,8 @@
+import pandas as pd
 from dash import dcc, html
 from dash.dependencies import Input, Output
-from data_processing import reviews_df
+from loader import dataset
+from presets import preset
 
 layout = html.Div([
     html.H2("Sentiment Analysis"),
@@ -11,85 +13,80 @@ layout = html.Div([
     dcc.Graph(id='sentiment-line-graph')
 ])
 
+FILTER_INPUTS = [Input('year-filter', 'value'),
+                 Input('tourist-filter', 'value'),
+                 Input('sentiment-filter', 'value'),
+                 Input('rating-filter', 'value'),
+                 Input('keyword-filter', 'value'),
+                 Input('duplicate-filter', 'value')]
+
 def register_callbacks(app):
-    # Data filtering helper
-    def filter_df(years, tourist_types, sentiments, ratings, keyword):
-        df = reviews_df.copy()
-        if years:
-            df = df[df['Year'].isin(years)]
-        if tourist_types:
-            df = df[df['TouristType'].isin(tourist_types)]
-        if sentiments:
-            df = df[df['Sentiment'].isin(sentiments)]
-        if ratings:
-            df = df[df['Rating'].isin(ratings)]
-        if keyword:
-            df = df[df['ReviewText'].str.contains(keyword, case=False, na=False)]
-        return df
+    @app.callback(Output('sentiment-dist-overall', 'figure'), FILTER_INPUTS)
+    def update_sentiment_dist_overall(years, tourist_types, sentiments, ratings, keyword, duplicates):
+        return compute_sentiment_dist_overall(years, tourist_types, sentiments, ratings, keyword, duplicates)
+
+    @app.callback(Output('sentiment-dist-yearly', 'figure'), FILTER_INPUTS)
+    def update_sentiment_dist_yearly(years, tourist_types, sentiments, ratings, keyword, duplicates):
+        return compute_sentiment_dist_yearly(years, tourist_types, sentiments, ratings, keyword, duplicates)
+
+    @app.callback(Output('sentiment-line-graph', 'figure'), FILTER_INPUTS)
+    def update_sentiment_line(years, tourist_types, sentiments, ratings, keyword, duplicates):
+        return compute_sentiment_line(years, tourist_types, sentiments, ratings, keyword, duplicates)
 
-    @app.callback(
-        Output('sentiment-dist-overall', 'figure'),
-        [Input('year-filter', 'value'),
-         Input('tourist-filter', 'value'),
-         Input('sentiment-filter', 'value'),
-         Input('rating-filter', 'value'),
-         Input('keyword-filter', 'value')]
-    )
-    def update_sentiment_dist_overall(years, tourist_types, sentiments, ratings, keyword):
-        dff = filter_df(years, tourist_types, sentiments, ratings, keyword)
+@preset('sentiment_dist_overall')
+def compute_sentiment_dist_overall(years, tourist_types, sentiments, ratings, keyword, duplicates=None):
+    if not keyword:
+        x, y = dataset.review_cube.select(years, tourist_types, sentiments, ratings, duplicates=duplicates).counts_by('Sentiment', sort_by_count=True)
+    else:
+        dff = dataset.filter_index.filter_df(years, tourist_types, sentiments, ratings, keyword, duplicates=duplicates, columns=['Sentiment'])
         counts = dff['Sentiment'].value_counts()
-        fig = {
-            'data': [{'x': counts.index.tolist(), 'y': counts.values.tolist(), 'type': 'bar'}],
-            'layout': {'title': 'Sentiment Distribution (Overall)', 'xaxis': {'title': 'Sentiment'}, 'yaxis': {'title': 'Count'}}
-        }
-        return fig
+        x, y = counts.index.tolist(), counts.values.tolist()
+    fig = {
+        'data': [{'x': x, 'y': y, 'type': 'bar'}],
+        'layout': {'title': 'Sentiment Distribution (Overall)', 'xaxis': {'title': 'Sentiment'}, 'yaxis': {'title': 'Count'}}
+    }
+    return fig
 
-    @app.callback(
-        Output('sentiment-dist-yearly', 'figure'),
-        [Input('year-filter', 'value'),
-         Input('tourist-filter', 'value'),
-         Input('sentiment-filter', 'value'),
-         Input('rating-filter', 'value'),
-         Input('keyword-filter', 'value')]
-    )
-    def update_sentiment_dist_yearly(years, tourist_types, sentiments, ratings, keyword):
-        dff = filter_df(years, tourist_types, sentiments, ratings, keyword)
-        fig_data = []
-        if not dff.empty:
-            years_sorted = sorted(dff['Year'].unique())
-            sentiments_order = ['Positive', 'Neutral', 'Negative']
-            for s in sentiments_order:
-                counts = []
-                for y in years_sorted:
-                    count = dff[(dff['Year'] == y) & (dff['Sentiment'] == s)].shape[0]
-                    counts.append(count)
-                fig_data.append({'x': years_sorted, 'y': counts, 'name': s, 'type': 'bar'})
-        fig = {
-            'data': fig_data,
-            'layout': {'barmode': 'stack', 'title': 'Sentiment by Year', 'xaxis': {'title': 'Year'}, 'yaxis': {'title': 'Count'}}
-        }
-        return fig
+@preset('sentiment_dist_yearly')
+def compute_sentiment_dist_yearly(years, tourist_types, sentiments, ratings, keyword, duplicates=None):
+    sentiments_order = ['Positive', 'Neutral', 'Negative']
+    if not keyword:
+        years_sorted, levels, table = dataset.review_cube.select(years, tourist_types, sentiments, ratings, duplicates=duplicates).counts_by2('Year', 'Sentiment')
+        table = pd.DataFrame(table, index=years_sorted, columns=levels)
+    else:
+        dff = dataset.filter_index.filter_df(years, tourist_types, sentiments, ratings, keyword, duplicates=duplicates, columns=['Year', 'Sentiment'])
+        table = dff.groupby(['Year', 'Sentiment']).size().unstack(fill_value=0)
+        years_sorted = table.index.tolist()
+    # One pass over the Year x Sentiment table instead of a scan per (sentiment, year) pair
+    table = table.reindex(columns=sentiments_order, fill_value=0)
+    fig_data = []
+    if years_sorted:
+        for s in sentiments_order:
+            fig_data.append({'x': years_sorted, 'y': table[s].astype(int).tolist(), 'name': s, 'type': 'bar'})
+    fig = {
+        'data': fig_data,
+        'layout': {'barmode': 'stack', 'title': 'Sentiment by Year', 'xaxis': {'title': 'Year'}, 'yaxis': {'title': 'Count'}}
+    }
+    return fig
 
-    @app.callback(
-        Output('sentiment-line-graph', 'figure'),
-        [Input('year-filter', 'value'),
-         Input('tourist-filter', 'value'),
-         Input('sentiment-filter', 'value'),
-         Input('rating-filter', 'value'),
-         Input('keyword-filter', 'value')]
-    )
-    def update_sentiment_line(years, tourist_types, sentiments, ratings, keyword):
-        dff = filter_df(years, tourist_types, sentiments, ratings, keyword)
-        fig_data = []
-        if not dff.empty:
-            yearly = dff.groupby('Year').agg({
-                'TextBlob': 'mean', 'VADER': 'mean', 'Composite': 'mean'
-            }).reset_index()
-            fig_data.append({'x': yearly['Year'].tolist(), 'y': yearly['TextBlob'].tolist(), 'name': 'TextBlob', 'mode': 'lines+markers'})
-            fig_data.append({'x': yearly['Year'].tolist(), 'y': yearly['VADER'].tolist(), 'name': 'VADER', 'mode': 'lines+markers'})
-            fig_data.append({'x': yearly['Year'].tolist(), 'y': yearly['Composite'].tolist(), 'name': 'Composite', 'mode': 'lines+markers'})
-        fig = {
-            'data': fig_data,
-            'layout': {'title': 'Average Sentiment Scores by Year', 'xaxis': {'title': 'Year'}, 'yaxis': {'title': 'Average Score'}}
-        }
-        return fig
+@preset('sentiment_line')
+def compute_sentiment_line(years, tourist_types, sentiments, ratings, keyword, duplicates=None):
+    if not keyword:
+        sub = dataset.review_cube.select(years, tourist_types, sentiments, ratings, duplicates=duplicates)
+        yearly = pd.DataFrame({m: dict(zip(*sub.means_by('Year', m))) for m in ['TextBlob', 'VADER', 'Composite']})
+        yearly = yearly.rename_axis('Year').reset_index()
+    else:
+        dff = dataset.filter_index.filter_df(years, tourist_types, sentiments, ratings, keyword, duplicates=duplicates, columns=['Year', 'TextBlob', 'VADER', 'Composite'])
+        yearly = dff.groupby('Year').agg({
+            'TextBlob': 'mean', 'VADER': 'mean', 'Composite': 'mean'
+        }).reset_index()
+    fig_data = []
+    if not yearly.empty:
+        fig_data.append({'x': yearly['Year'].tolist(), 'y': yearly['TextBlob'].tolist(), 'name': 'TextBlob', 'mode': 'lines+markers'})
+        fig_data.append({'x': yearly['Year'].tolist(), 'y': yearly['VADER'].tolist(), 'name': 'VADER', 'mode': 'lines+markers'})
+        fig_data.append({'x': yearly['Year'].tolist(), 'y': yearly['Composite'].tolist(), 'name': 'Composite', 'mode': 'lines+markers'})
+    fig = {
+        'data': fig_data,
+        'layout': {'title': 'Average Sentiment Scores by Year', 'xaxis': {'title': 'Year'}, 'yaxis': {'title': 'Average Score'}}
+    }
+    return fig
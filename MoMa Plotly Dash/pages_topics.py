@@ -0,0 +1,96 @@
+from dash import dcc, html
+from dash.dependencies import Input, Output
+import numpy as np
+from loader import dataset
+from presets import preset
+
+def layout():
+    # Built per visit: the topics come with the loaded dataset
+    return html.Div([
+        html.H2("Topic Analysis"),
+        html.Label("Filter by Topic:"),
+        dcc.Dropdown(
+            id='topic-filter',
+            options=[{'label': label, 'value': i} for i, label in enumerate(topic_labels())],
+            placeholder='All topics',
+            multi=True
+        ),
+        dcc.Graph(id='topic-share-graph'),
+        dcc.Graph(id='topic-trend-graph'),
+        dcc.Graph(id='topic-rating-graph')
+    ])
+
+def topic_labels():
+    # "3: garden, sculpture, outdoor" for each topic, in TopicId order
+    return [f"{i}: {', '.join(terms[:3])}" for i, terms in enumerate(dataset.topic_terms)]
+
+def register_callbacks(app):
+    @app.callback(
+        [Output('topic-share-graph', 'figure'),
+         Output('topic-trend-graph', 'figure'),
+         Output('topic-rating-graph', 'figure')],
+        [Input('topic-filter', 'value'),
+         Input('year-filter', 'value'),
+         Input('tourist-filter', 'value'),
+         Input('sentiment-filter', 'value'),
+         Input('rating-filter', 'value'),
+         Input('keyword-filter', 'value'),
+         Input('duplicate-filter', 'value')]
+    )
+    def update_topics(topic_ids, years, tourist_types, sentiments, ratings, keyword, duplicates):
+        if topic_ids:
+            return compute_topics(topic_ids, years, tourist_types, sentiments, ratings, keyword, duplicates)
+        return compute_topics_all(years, tourist_types, sentiments, ratings, keyword, duplicates)
+
+def compute_topics(topic_ids, years, tourist_types, sentiments, ratings, keyword, duplicates=None):
+    # Topic shares and per-year trends come from the cube's topic weight sums when only the
+    # sidebar filters apply; with a keyword or a topic selection, from the filtered rows
+    labels = topic_labels()
+    columns = [f'Topic{i}' for i in range(len(labels))]
+    rows = dataset.filter_index.rows(years, tourist_types, sentiments, ratings, keyword, duplicates=duplicates)
+    topic_id = dataset.reviews_df['TopicId'].to_numpy()
+    if topic_ids:
+        # Reviews whose dominant topic is one of the selected
+        rows = rows[np.isin(topic_id[rows], topic_ids)]
+    if not keyword and not topic_ids:
+        sub = dataset.review_cube.select(years, tourist_types, sentiments, ratings, duplicates=duplicates)
+        shares = [sub.mean(col) for col in columns]
+        trends = [sub.means_by('Year', col) for col in columns]
+    else:
+        year_codes, year_index = np.unique(dataset.reviews_df['Year'].to_numpy()[rows], return_inverse=True)
+        counts = np.bincount(year_index, minlength=len(year_codes))
+        shares, trends = [], []
+        for col in columns:
+            weights = dataset.reviews_df[col].to_numpy()[rows]
+            shares.append(float(weights.mean()) if len(rows) else 0)
+            sums = np.bincount(year_index, weights=weights, minlength=len(year_codes))
+            trends.append((year_codes.tolist(), (sums / np.maximum(counts, 1)).tolist()))
+
+    # Review count and average rating per dominant topic
+    dominant = topic_id[rows]
+    known = dominant >= 0
+    counts = np.bincount(dominant[known], minlength=len(labels))
+    rating_sums = np.bincount(dominant[known], weights=dataset.reviews_df['Rating'].to_numpy(dtype=float)[rows][known],
+                              minlength=len(labels))
+    present = np.flatnonzero(counts)
+
+    share_fig = {
+        'data': [{'x': labels, 'y': shares, 'type': 'bar'}],
+        'layout': {'title': 'Topic Share of Reviews', 'xaxis': {'title': 'Topic'}, 'yaxis': {'title': 'Average weight'}}
+    }
+    trend_fig = {
+        'data': [{'x': x, 'y': y, 'type': 'line', 'name': label} for label, (x, y) in zip(labels, trends)],
+        'layout': {'title': 'Topic Share by Year', 'xaxis': {'title': 'Year'}, 'yaxis': {'title': 'Average weight'}}
+    }
+    rating_fig = {
+        'data': [{'x': [labels[i] for i in present], 'y': (rating_sums[present] / counts[present]).tolist(),
+                  'text': [f"{int(counts[i])} reviews" for i in present], 'type': 'bar'}],
+        'layout': {'title': 'Average Rating by Dominant Topic', 'xaxis': {'title': 'Topic'},
+                   'yaxis': {'title': 'Avg Rating'}}
+    }
+    return share_fig, trend_fig, rating_fig
+
+@preset('topics')
+def compute_topics_all(years, tourist_types, sentiments, ratings, keyword, duplicates=None):
+    # No topic selected
+    return compute_topics(None, years, tourist_types, sentiments, ratings, keyword, duplicates)
@@ -1,76 +1,111 @@
-from dash import dcc, html
-from dash.dependencies import Input, Output
-from data_processing import reviews_df
-from wordcloud import WordCloud
-from sklearn.feature_extraction.text import CountVectorizer
+from dash import dcc, html, no_update
+from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
+from loader import dataset
+from filter_index import normalize_state
+from image_cache import ImageCache, image_key
+from metrics import timed_phase
+from presets import MISSING, preset, preset_store
 import io
-import base64
+
+WORDCLOUD_PARAMS = {'width': 800, 'height': 400, 'background_color': 'white'}
+# Rendered word clouds, served from a Flask route instead of inline base64; images of a
+# precomputed report (reports.py) are served from the report when not cached yet
+wordcloud_cache = ImageCache(url_prefix='/wordclouds', fallback=preset_store.image)
 
 layout = html.Div([
     html.H2("Word Analysis"),
     html.P("Top Unigrams"),
     html.Img(id='wordcloud-unigram', style={'maxWidth': '100%', 'height': 'auto'}),
     html.P("Top Bigrams"),
-    html.Img(id='wordcloud-bigram', style={'maxWidth': '100%', 'height': 'auto'})
+    html.Img(id='wordcloud-bigram', style={'maxWidth': '100%', 'height': 'auto'}),
+    # Filter state whose clouds still have to be rendered, for the background callback
+    dcc.Store(id='wordcloud-request')
 ])
 
 def register_callbacks(app):
-    # Data filtering helper
-    def filter_df(years, tourist_types, sentiments, ratings, keyword):
-        df = reviews_df.copy()
-        if years:
-            df = df[df['Year'].isin(years)]
-        if tourist_types:
-            df = df[df['TouristType'].isin(tourist_types)]
-        if sentiments:
-            df = df[df['Sentiment'].isin(sentiments)]
-        if ratings:
-            df = df[df['Rating'].isin(ratings)]
-        if keyword:
-            df = df[df['ReviewText'].str.contains(keyword, case=False, na=False)]
-        return df
+    wordcloud_cache.register_route(app.server)
+
+    def image_urls(keys):
+        if keys is None:
+            return "", ""
+        return tuple(app.get_relative_path(wordcloud_cache.url(key)) for key in keys)
 
     @app.callback(
         [Output('wordcloud-unigram', 'src'),
-         Output('wordcloud-bigram', 'src')],
+         Output('wordcloud-bigram', 'src'),
+         Output('wordcloud-request', 'data')],
         [Input('year-filter', 'value'),
          Input('tourist-filter', 'value'),
          Input('sentiment-filter', 'value'),
          Input('rating-filter', 'value'),
-         Input('keyword-filter', 'value')]
+         Input('keyword-filter', 'value'),
+         Input('duplicate-filter', 'value')],
+        State('wordcloud-request', 'data')
     )
-    def update_wordclouds(years, tourist_types, sentiments, ratings, keyword):
-        dff = filter_df(years, tourist_types, sentiments, ratings, keyword)
-        texts = dff['ReviewText'].dropna().tolist()
-        if not texts:
-            return "", ""
-        corpus = " ".join(texts)
+    def show_cached_wordclouds(years, tourist_types, sentiments, ratings, keyword, duplicates, pending):
+        # Already rendered (or in a report): answered here, without starting a job. Otherwise
+        # the state goes to update_wordclouds; a hit clears a pending request, which cancels
+        # the job still rendering an older state
+        keys = cached_wordclouds(years, tourist_types, sentiments, ratings, keyword, duplicates)
+        if keys is not MISSING:
+            return (*image_urls(keys), None if pending is not None else no_update)
+        return no_update, no_update, [years, tourist_types, sentiments, ratings, keyword, duplicates]
 
-        # Unigram frequencies
-        vec1 = CountVectorizer(stop_words='english', ngram_range=(1,1))
-        X1 = vec1.fit_transform(texts)
-        freq1 = dict(zip(vec1.get_feature_names_out(), X1.toarray().sum(axis=0)))
-        wc1 = WordCloud(width=800, height=400, background_color='white')
-        wc1.generate_from_frequencies(freq1)
-        img1 = wc1.to_image()
+    @app.callback(
+        [Output('wordcloud-unigram', 'src', allow_duplicate=True),
+         Output('wordcloud-bigram', 'src', allow_duplicate=True)],
+        Input('wordcloud-request', 'data'),
+        # Runs as a background job (jobs.JobManager); a newer request supersedes it, and
+        # leaving the page cancels it
+        background=True,
+        cancel=[Input('url', 'pathname')],
+        prevent_initial_call=True
+    )
+    def update_wordclouds(request):
+        if request is None:
+            raise PreventUpdate
+        return image_urls(compute_wordclouds(*request))
 
-        # Bigram frequencies
-        vec2 = CountVectorizer(stop_words='english', ngram_range=(2,2))
-        X2 = vec2.fit_transform(texts)
-        freq2 = dict(zip(vec2.get_feature_names_out(), X2.toarray().sum(axis=0)))
-        wc2 = WordCloud(width=800, height=400, background_color='white')
-        wc2.generate_from_frequencies(freq2)
-        img2 = wc2.to_image()
+def wordcloud_keys(years, tourist_types, sentiments, ratings, keyword, duplicates=None):
+    # Image keys of the unigram and bigram clouds for a filter state. Images are cached per
+    # (data, filter state, ngram, WordCloud parameters)
+    state = normalize_state(years, tourist_types, sentiments, ratings, keyword, duplicates=duplicates)
+    return [image_key(ngram, dataset.data_version, state, WORDCLOUD_PARAMS) for ngram in ('unigram', 'bigram')]
 
-        # Convert images to base64 strings for embedding
-        buffer1 = io.BytesIO()
-        img1.save(buffer1, format="PNG")
-        img_str1 = base64.b64encode(buffer1.getvalue()).decode()
-        src1 = "data:image/png;base64," + img_str1
+def cached_wordclouds(years, tourist_types, sentiments, ratings, keyword, duplicates=None, cache=wordcloud_cache):
+    # compute_wordclouds' answer when it needs no rendering: from the report, None when no
+    # review matches, or keys whose images are all cached; MISSING otherwise
+    stored = preset_store.get('wordclouds', years, tourist_types, sentiments, ratings, keyword, duplicates)
+    if stored is not MISSING:
+        return stored
+    if not len(dataset.filter_index.rows(years, tourist_types, sentiments, ratings, keyword, duplicates=duplicates)):
+        return None
+    keys = wordcloud_keys(years, tourist_types, sentiments, ratings, keyword, duplicates)
+    return keys if all(key in cache for key in keys) else MISSING
 
-        buffer2 = io.BytesIO()
-        img2.save(buffer2, format="PNG")
-        img_str2 = base64.b64encode(buffer2.getvalue()).decode()
-        src2 = "data:image/png;base64," + img_str2
+@preset('wordclouds')
+def compute_wordclouds(years, tourist_types, sentiments, ratings, keyword, duplicates=None, cache=wordcloud_cache):
+    # Image keys of the unigram and bigram clouds, or None when no review matches; repeat
+    # states skip frequency counting and rendering
+    keys = wordcloud_keys(years, tourist_types, sentiments, ratings, keyword, duplicates)
+    if not all(key in cache for key in keys):
+        rows = dataset.filter_index.rows(years, tourist_types, sentiments, ratings, keyword, duplicates=duplicates)
+        # Unigram and bigram frequencies from the precomputed term matrices
+        freqs = [dataset.unigram_matrix.frequency_dict(rows), dataset.bigram_matrix.frequency_dict(rows)]
+        if not all(freqs):
+            return None
+        for key, freq in zip(keys, freqs):
+            if key not in cache:
+                cache.put(key, render_wordcloud(freq))
+    return keys
 
-        return src1, src2
+@timed_phase('render')
+def render_wordcloud(frequencies):
+    # wordcloud (and PIL behind it) is only loaded once the page first renders an image
+    from wordcloud import WordCloud
+    wc = WordCloud(**WORDCLOUD_PARAMS)
+    wc.generate_from_frequencies(frequencies)
+    buffer = io.BytesIO()
+    wc.to_image().save(buffer, format="PNG")
+    return buffer.getvalue()
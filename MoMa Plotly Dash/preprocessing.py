@@ -0,0 +1,244 @@
+# Review text preprocessing shared by the analysis notebooks (MoMa_project_analysis) and the
+# dashboards: the notebooks' preprocess() (English-only filter, regex cleaning, stopword and
+# length filter, WordNet lemmas) followed by word_tokenize, run over a whole corpus at once
+# instead of row by row:
+#  - texts the notebooks reject anyway (fewer than two tokens, one token repeated) are
+#    rejected before language detection, the slow step; ASCII-only texts shorter than
+#    LANGDETECT_MIN_CHARS are taken as English without detecting
+#  - cleaning and detection run in chunks on a process pool, each distinct text once
+#  - each distinct word is lemmatized and tokenized once per process
+#  - results are cached on disk by text content (next to the snapshots), so a rerun or another
+#    notebook only processes texts it has not seen
+# The dashboards run their word and emotion analyses on the same output (see
+# data_processing.preprocess_reviews), over ReviewText and in a cache of their own that is
+# pruned to the loaded reviews. Without the WordNet corpus words are kept as written, as
+# emotions.lemmatizer does; the cache tells the two apart.
+# emoji.demojize and the camel-case split in the notebooks are no-ops there (they run after
+# lowercasing and after everything but letters and whitespace is removed), so they are left out.
+# In a notebook:
+#   sys.path.insert(0, '../MoMa Plotly Dash')
+#   import preprocessing
+#   pre = preprocessing.preprocess_texts(df['Text'])
+#   df['cleaned_text'], df['Tokenized_Text'] = pre['CleanText'], pre['Tokens']
+# To fill the cache for a CSV ahead of time:
+#   python "MoMa Plotly Dash/preprocessing.py" reviews-1.csv [column]
+import hashlib
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from importlib import metadata
+
+import pandas as pd
+import pyarrow.feather as feather
+
+import snapshot
+from scoring import DEFAULT_CHUNK_SIZE, DEFAULT_WORKERS
+
+# Bump whenever the output of preprocess_texts changes, so cached results are recomputed
+PREPROCESS_VERSION = 1
+
+# ASCII-only texts shorter than this are not run through langdetect (which is slow and
+# unreliable on a few words) and count as English; 0 detects every text, as the notebooks did
+LANGDETECT_MIN_CHARS = int(os.environ.get('MOMA_LANGDETECT_MIN_CHARS', 60))
+
+CLEAN_RE = re.compile(r'https?://\S+|www\.\S+|@\w+|[^a-zA-Z\s]')
+REPEAT_RE = re.compile(r'(.)\1{2,}')
+
+COLUMNS = ['Language', 'CleanText', 'Tokens']
+
+# Per-process memo of word -> (lemma, word_tokenize pieces of the lemma)
+_words = {}
+_lemmatizer = None
+_tokenizer = None
+
+
+def default_stopwords():
+    # NLTK's English list, as in the notebooks (their extra words are all already in it)
+    import nlp_resources
+    nlp_resources.require_resources(['stopwords'])
+    from nltk.corpus import stopwords
+    return frozenset(stopwords.words('english'))
+
+
+def detect_language(text, min_chars=LANGDETECT_MIN_CHARS):
+    if len(text) < min_chars and text.isascii():
+        return 'en'
+    from langdetect import DetectorFactory, detect
+    from langdetect.lang_detect_exception import LangDetectException
+    # Seeded, so a text always gets the same tag and cached tags stay valid
+    DetectorFactory.seed = 0
+    try:
+        return detect(text)
+    except LangDetectException:
+        return 'unknown'
+
+
+def clean_text(text, stopwords, min_chars=LANGDETECT_MIN_CHARS):
+    # (language, kept words) for one text. words is None where the notebooks' preprocess()
+    # returns ''; language is None where it was not needed to decide that.
+    if not text or not isinstance(text, str):
+        return None, None
+    tokens = REPEAT_RE.sub(r'\1\1', CLEAN_RE.sub(' ', text.lower())).split()
+    if len(tokens) < 2 or len(set(tokens)) == 1:
+        return None, None
+    language = detect_language(text, min_chars)
+    if language != 'en':
+        return language, None
+    return language, [word for word in tokens if 2 < len(word) <= 17 and word not in stopwords]
+
+
+def clean_chunk(texts, stopwords, min_chars=LANGDETECT_MIN_CHARS):
+    return [clean_text(text, stopwords, min_chars) for text in texts]
+
+
+def lemmatize_words(words):
+    # Looks up (lemma, tokens) for every word, lemmatizing the ones not seen before
+    global _lemmatizer, _tokenizer
+    new = [word for word in set(words) if word not in _words]
+    if new:
+        if _tokenizer is None:
+            from nltk.tokenize import NLTKWordTokenizer
+            _lemmatizer = _wordnet_lemmatizer()
+            # word_tokenize without the punkt sentence split: cleaned text has no punctuation,
+            # so it is one sentence, and its words tokenize independently ("cannot" -> can, not)
+            _tokenizer = NLTKWordTokenizer()
+        for word in new:
+            lemma = _lemmatizer.lemmatize(word) if _lemmatizer else word
+            _words[word] = (lemma, _tokenizer.tokenize(lemma))
+    return _words
+
+
+def _wordnet_lemmatizer():
+    import nlp_resources
+    if not nlp_resources.available('wordnet'):
+        return None
+    from nltk.stem import WordNetLemmatizer
+    return WordNetLemmatizer()
+
+
+def text_keys(texts):
+    # Content hash per text; non-strings (NaN, None) all share one key
+    return [hashlib.blake2b(text.encode('utf-8') if isinstance(text, str) else b'\0', digest_size=12).hexdigest()
+            for text in texts]
+
+
+def cache_path(stopwords, min_chars=LANGDETECT_MIN_CHARS, name='preprocess'):
+    # One cache per configuration: a different stopword list, threshold, library version or
+    # WordNet availability starts an empty cache. name keeps apart caches of different users.
+    import nlp_resources
+    payload = json.dumps({'version': PREPROCESS_VERSION, 'stopwords': sorted(stopwords), 'min_chars': min_chars,
+                          'nltk': _version('nltk'), 'langdetect': _version('langdetect'),
+                          'wordnet': nlp_resources.available('wordnet')}, sort_keys=True)
+    tag = hashlib.sha256(payload.encode('utf-8')).hexdigest()[:12]
+    return os.path.join(snapshot.SNAPSHOT_DIR, f'{name}-{tag}.feather')
+
+
+def load_cache(path):
+    if not os.path.exists(path):
+        return None
+    try:
+        return feather.read_feather(path).set_index('TextKey')
+    except Exception:
+        return None
+
+
+def save_cache(cache, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    feather.write_feather(cache.reset_index(), tmp_path)
+    os.replace(tmp_path, path)
+
+
+def preprocess_texts(texts, stopwords=None, workers=None, chunk_size=None, use_cache=True, progress=None,
+                     min_chars=LANGDETECT_MIN_CHARS, name='preprocess', prune=False):
+    # Frame aligned with texts: Language (langdetect code, None where not needed), CleanText
+    # (the notebooks' preprocess() output) and Tokens (word_tokenize of CleanText, as lists).
+    # progress(done, total) is called after every chunk of new texts. With prune, texts is
+    # the whole corpus and cached texts not in it are dropped when the cache is written.
+    texts = pd.Series(texts)
+    stopwords = frozenset(default_stopwords() if stopwords is None else stopwords)
+    path = cache_path(stopwords, min_chars, name)
+    cache = load_cache(path) if use_cache else None
+    keys = text_keys(texts)
+
+    # Each distinct text not in the cache is processed once
+    todo = {}
+    for key, text in zip(keys, texts):
+        if key not in todo and (cache is None or key not in cache.index):
+            todo[key] = text
+    if todo:
+        new = _process(list(todo.values()), stopwords, min_chars, workers, chunk_size, progress)
+        new.index = pd.Index(list(todo), name='TextKey')
+        cache = new if cache is None else pd.concat([cache, new])
+    changed = bool(todo)
+    if prune and cache is not None:
+        current = cache.index.isin(keys)
+        if not current.all():
+            cache = cache[current]
+            changed = True
+    if use_cache and changed:
+        save_cache(cache, path)
+
+    if cache is None:
+        return pd.DataFrame({col: pd.Series(dtype=object) for col in COLUMNS}, index=texts.index)
+    result = cache.loc[keys, COLUMNS]
+    result.index = texts.index
+    # Arrow hands list columns back as arrays
+    result['Tokens'] = [list(tokens) for tokens in result['Tokens']]
+    return result
+
+
+def _process(texts, stopwords, min_chars, workers, chunk_size, progress):
+    workers = workers or DEFAULT_WORKERS
+    chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+    chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    results = [None] * len(chunks)
+    done = 0
+    if workers <= 1 or len(chunks) <= 1:
+        for i, chunk in enumerate(chunks):
+            results[i] = clean_chunk(chunk, stopwords, min_chars)
+            done += len(chunk)
+            if progress:
+                progress(done, len(texts))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+            futures = {pool.submit(clean_chunk, chunk, stopwords, min_chars): i for i, chunk in enumerate(chunks)}
+            for future in as_completed(futures):
+                i = futures[future]
+                results[i] = future.result()
+                done += len(chunks[i])
+                if progress:
+                    progress(done, len(texts))
+    cleaned = [row for chunk in results for row in chunk]
+
+    # Lemmas come from one corpus-wide pass over the distinct words
+    words = lemmatize_words([word for _, kept in cleaned if kept for word in kept])
+    languages, clean_texts, tokens = [], [], []
+    for language, kept in cleaned:
+        languages.append(language)
+        kept = kept or []
+        clean_texts.append(' '.join(words[word][0] for word in kept))
+        tokens.append([piece for word in kept for piece in words[word][1]])
+    return pd.DataFrame({'Language': languages, 'CleanText': clean_texts, 'Tokens': tokens})
+
+
+def _version(name):
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def main(argv):
+    csv_path = argv[0] if argv else 'reviews-1.csv'
+    column = argv[1] if len(argv) > 1 else 'Text'
+    texts = pd.read_csv(csv_path, usecols=[column])[column]
+    result = preprocess_texts(texts, progress=lambda done, total: print(f"  {done}/{total} new texts", flush=True))
+    print(f"{len(result)} texts, {int((result['CleanText'] != '').sum())} kept; languages:")
+    print(result['Language'].value_counts(dropna=False).to_string())
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,163 @@
+# Precomputed page outputs for common filter states (built by reports.py), looked up by the
+# page callbacks before computing anything. A report lives in REPORT_DIR/<data_version>/:
+#   index.json         preset key -> file, written last so a half-built report is never used
+#   <preset key>.json  {'filters': ..., 'sections': {section: callback output}}
+#   images/            word cloud PNGs, named by image_key() as in the live word page
+# Reports are tied to the data version, so a reloaded dataset never serves stale figures;
+# states without a report fall through to the live computation.
+import functools
+import hashlib
+import json
+import os
+import threading
+
+import snapshot
+from filter_index import INDEXED_COLUMNS
+from loader import dataset
+
+REPORT_DIR = os.environ.get('MOMA_REPORT_DIR', os.path.join(snapshot.SNAPSHOT_DIR, 'reports'))
+
+# The filters a preset fixes; presets never have a keyword
+FILTERS = ['years', 'tourist_types', 'sentiments', 'ratings', 'duplicates']
+
+MISSING = object()
+
+
+def canonical_filters(years=None, tourist_types=None, sentiments=None, ratings=None, duplicates=None):
+    # {filter: sorted values or None}. A selection is cut down to the values present in the
+    # data, and one that covers all of them is the same as no selection (None). A selection
+    # of values none of which are in the data matches no review; such a state is not a
+    # preset, and None is returned instead of the filters (the pages read [] as no filter)
+    selections = {'years': years, 'tourist_types': tourist_types, 'sentiments': sentiments, 'ratings': ratings,
+                  'duplicates': duplicates}
+    filters = {}
+    for arg, selection in selections.items():
+        present = set(dataset.filter_index.bitmaps.get(INDEXED_COLUMNS[arg], {}))
+        values = set(selection or [])
+        if not values or values >= present:
+            filters[arg] = None
+        elif values & present:
+            filters[arg] = sorted(values & present, key=repr)
+        else:
+            return None
+    return filters
+
+
+def preset_key(filters):
+    payload = json.dumps([filters.get(arg) for arg in FILTERS], default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:20]
+
+
+class PresetStore:
+    # Reads the report for the loaded data version; the index is re-read when its file changes,
+    # so a report built while the app runs is picked up without a restart
+
+    def __init__(self, directory=REPORT_DIR):
+        self.directory = directory
+        self._version = None
+        self._index_mtime = None
+        self._index = {}
+        self._presets = {}
+        self._lock = threading.Lock()
+        # Background jobs are forked from a threaded server; a child must not inherit a held lock
+        os.register_at_fork(after_in_child=self._reset_lock)
+        self.hits = 0
+        self.misses = 0
+
+    def _reset_lock(self):
+        self._lock = threading.Lock()
+
+    def report_dir(self, data_version):
+        return os.path.join(self.directory, data_version)
+
+    def get(self, section, years=None, tourist_types=None, sentiments=None, ratings=None, keyword=None,
+            duplicates=None):
+        # Stored output of section for this filter state, or MISSING
+        if (keyword and keyword.strip()) or not dataset.ready:
+            return MISSING
+        index = self._load_index(dataset.data_version)
+        if not index:
+            return MISSING
+        filters = canonical_filters(years, tourist_types, sentiments, ratings, duplicates)
+        if filters is None:
+            return MISSING
+        key = preset_key(filters)
+        sections = self._sections(key, index.get(key))
+        with self._lock:
+            if sections is None or section not in sections:
+                self.misses += 1
+                return MISSING
+            self.hits += 1
+        return sections[section]
+
+    def image(self, key):
+        # Word cloud PNG from the current report, for ImageCache misses
+        if not dataset.ready:
+            return None
+        try:
+            with open(os.path.join(self.report_dir(dataset.data_version), 'images', f'{key}.png'), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _load_index(self, data_version):
+        path = os.path.join(self.report_dir(data_version), 'index.json')
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime = None
+        with self._lock:
+            if data_version == self._version and mtime == self._index_mtime:
+                return self._index
+        index = {}
+        if mtime is not None:
+            try:
+                with open(path) as f:
+                    index = json.load(f)['presets']
+            except (OSError, ValueError, KeyError):
+                index = {}
+        with self._lock:
+            self._version = data_version
+            self._index_mtime = mtime
+            self._index = index
+            self._presets = {}
+        return index
+
+    def _sections(self, key, entry):
+        if entry is None:
+            return None
+        with self._lock:
+            sections = self._presets.get(key)
+        if sections is not None:
+            return sections
+        try:
+            with open(os.path.join(self.report_dir(self._version), entry['file'])) as f:
+                sections = json.load(f)['sections']
+        except (OSError, ValueError, KeyError):
+            return None
+        with self._lock:
+            self._presets[key] = sections
+        return sections
+
+    def stats(self):
+        with self._lock:
+            return {'presets': len(self._index), 'loaded': len(self._presets), 'hits': self.hits, 'misses': self.misses}
+
+
+preset_store = PresetStore()
+
+
+def preset(section):
+    # Decorator for a page's compute function taking (years, tourist_types, sentiments,
+    # ratings, keyword, duplicates): answers from the report when one covers the state.
+    # reports.py calls the undecorated function (compute.__wrapped__) to build the report itself.
+    def decorate(compute):
+        @functools.wraps(compute)
+        def wrapper(years, tourist_types, sentiments, ratings, keyword, duplicates=None):
+            stored = preset_store.get(section, years, tourist_types, sentiments, ratings, keyword, duplicates)
+            if stored is not MISSING:
+                return stored
+            return compute(years, tourist_types, sentiments, ratings, keyword, duplicates)
+        wrapper.section = section
+        return wrapper
+    return decorate
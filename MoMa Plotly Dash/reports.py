@@ -0,0 +1,147 @@
+# Headless report builder: computes every page's outputs (Overview, Sentiment, Emotion, Word,
+# Negative, Topics) for a grid of filter presets with the pages' own compute functions, in parallel,
+# and writes them as JSON plus word cloud PNGs under presets.REPORT_DIR/<data_version>/.
+# The running app answers any filter state that matches a preset from these files.
+#   python "MoMa Plotly Dash/reports.py" [--csv reviews-1.csv] [--grid grid.json] [--workers N]
+# A grid is a list of preset specs; each filter in a spec is "all" (the default when left
+# out), "each" (one preset per value in the data) or a list of values, e.g.
+#   [{}, {"years": "each"}, {"tourist_types": "each"}, {"years": [2019], "ratings": [1, 2]}]
+# ("duplicates": [false] is the state with near-duplicate reviews hidden)
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import plotly.utils
+
+import pages_emotion_analysis
+import pages_negative_analysis
+import pages_overview
+import pages_sentiment_analysis
+import pages_topics
+import pages_word_analysis
+import presets
+from filter_index import INDEXED_COLUMNS
+from image_cache import ImageCache
+from loader import dataset
+
+# Most traffic: everything, a single year, or a single tourist type, with no keyword
+DEFAULT_GRID = [{}, {'years': 'each'}, {'tourist_types': 'each'}]
+
+# Decorated page compute functions; each stores its output under its preset section
+SECTIONS = [
+    pages_overview.compute_overview,
+    pages_sentiment_analysis.compute_sentiment_dist_overall,
+    pages_sentiment_analysis.compute_sentiment_dist_yearly,
+    pages_sentiment_analysis.compute_sentiment_line,
+    pages_emotion_analysis.compute_emotion,
+    pages_word_analysis.compute_wordclouds,
+    pages_negative_analysis.compute_negative_keywords_all,
+    pages_topics.compute_topics_all,
+]
+
+
+def expand_grid(grid):
+    # Canonical filters (see presets.canonical_filters) of every preset in the grid, deduplicated
+    expanded = {}
+    for spec in grid:
+        choices = []
+        for arg in presets.FILTERS:
+            value = spec.get(arg, 'all')
+            if value == 'all':
+                choices.append([None])
+            elif value == 'each':
+                values = sorted(dataset.filter_index.bitmaps.get(INDEXED_COLUMNS[arg], {}), key=repr)
+                choices.append([[v] for v in values])
+            else:
+                choices.append([list(value)])
+        for combination in itertools.product(*choices):
+            filters = presets.canonical_filters(*combination)
+            # States that select values missing from the data show nothing live; left to the pages
+            if filters is not None:
+                expanded[presets.preset_key(filters)] = filters
+    return expanded
+
+
+def build_preset(key, filters, out_dir):
+    # All sections for one preset, written to <out_dir>/<key>.json; runs in a pool worker
+    start = time.perf_counter()
+    images = ImageCache(directory=os.path.join(out_dir, 'images'), max_memory_bytes=0, max_disk_bytes=2 ** 62)
+    sections = {}
+    for compute in SECTIONS:
+        # The undecorated function, so the report never reads an earlier report
+        if compute is pages_word_analysis.compute_wordclouds:
+            sections[compute.section] = compute.__wrapped__(keyword=None, cache=images, **filters)
+        else:
+            sections[compute.section] = compute.__wrapped__(keyword=None, **filters)
+    file = f'{key}.json'
+    _write_json(os.path.join(out_dir, file), {'filters': filters, 'sections': sections})
+    return key, file, time.perf_counter() - start
+
+
+def build_reports(grid=None, workers=None, out_dir=None, progress=None):
+    dataset.wait()
+    out_dir = out_dir or presets.preset_store.report_dir(dataset.data_version)
+    os.makedirs(out_dir, exist_ok=True)
+    expanded = expand_grid(grid or DEFAULT_GRID)
+    workers = min(workers or os.cpu_count() or 1, max(len(expanded), 1))
+    index = {}
+    start = time.perf_counter()
+    # Forked workers start with the loaded dataset (shared pages, nothing to reload)
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork')) as pool:
+        futures = [pool.submit(build_preset, key, filters, out_dir) for key, filters in expanded.items()]
+        for future in futures:
+            key, file, seconds = future.result()
+            index[key] = {'file': file, 'filters': expanded[key]}
+            if progress:
+                progress(expanded[key], seconds)
+    # Written last: the app only starts serving a report once every preset file is in place
+    _write_json(os.path.join(out_dir, 'index.json'),
+                {'data_version': dataset.data_version, 'csv': os.path.abspath(dataset.csv_path), 'created': time.time(),
+                 'seconds': round(time.perf_counter() - start, 3), 'presets': index})
+    return out_dir, index
+
+
+def remove_stale(keep):
+    # Reports of other data versions can never be served again
+    parent = os.path.dirname(keep)
+    for name in os.listdir(parent):
+        path = os.path.join(parent, name)
+        if path != keep and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _write_json(path, obj):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(obj, f, cls=plotly.utils.PlotlyJSONEncoder)
+    os.replace(tmp_path, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Precompute dashboard figures for a grid of filter presets.')
+    parser.add_argument('--csv', default=dataset.csv_path)
+    parser.add_argument('--grid', help='JSON file with a list of preset specs (default: all, each year, each tourist type)')
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--out', help='output directory (default: the directory the app reads)')
+    args = parser.parse_args(argv)
+    grid = None
+    if args.grid:
+        with open(args.grid) as f:
+            grid = json.load(f)
+    dataset.csv_path = args.csv
+    out_dir, index = build_reports(
+        grid, workers=args.workers, out_dir=args.out,
+        progress=lambda filters, seconds: print(f"  {json.dumps(filters)}: {seconds:.2f}s", flush=True))
+    if not args.out:
+        remove_stale(out_dir)
+    print(f"{len(index)} presets under {out_dir}")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
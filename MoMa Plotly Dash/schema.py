@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+
+from emotions import EMOTION_COLUMNS
+
+# Arrow-backed string storage: one contiguous buffer per column instead of a Python object per row
+STRING = pd.StringDtype('pyarrow')
+
+# Compact dtype for every column load_data produces; columns not listed are left as they are
+COMPACT_DTYPES = {
+    'Year': np.int16,
+    'Month': np.int8,
+    'Day': np.int8,
+    'Rating': np.int8,
+    'TitleLength': np.int32,
+    'TextBlob': np.float32,
+    'VADER': np.float32,
+    'Composite': np.float32,
+    'Hometown': 'category',
+    'City': 'category',
+    'Country': 'category',
+    'TouristType': 'category',
+    'Sentiment': 'category',
+    'Emotion': 'category',
+    'ReviewText': STRING,
+    'RowKey': STRING,
+    'Duplicate': bool,
+    'DuplicateOf': STRING,
+}
+COMPACT_DTYPES.update({col: np.uint16 for col in EMOTION_COLUMNS})
+
+
+def compact(df):
+    # Title and Text are only kept inside ReviewText ("<Title> <Text>"), with the title's
+    # length so both can be sliced back out (see split_review_text)
+    df = df.copy()
+    if 'Title' in df and 'Text' in df:
+        df['TitleLength'] = df['Title'].fillna('').str.len()
+        df = df.drop(columns=['Title', 'Text'])
+    for col, dtype in COMPACT_DTYPES.items():
+        if col in df:
+            df[col] = df[col].astype(dtype)
+    return df
+
+
+def split_review_text(df):
+    # (Title, Text) Series recovered from a compacted frame
+    title = pd.Series([t[:n] for t, n in zip(df['ReviewText'], df['TitleLength'])], index=df.index, dtype=STRING)
+    text = pd.Series([t[n + 1:] for t, n in zip(df['ReviewText'], df['TitleLength'])], index=df.index, dtype=STRING)
+    return title, text
+
+
+def memory_report(before, after):
+    # Bytes per column (deep, i.e. including string payloads) before and after compaction
+    report = pd.DataFrame({
+        'dtype_before': before.dtypes.astype(str),
+        'bytes_before': before.memory_usage(deep=True, index=False),
+        'dtype_after': after.dtypes.astype(str),
+        'bytes_after': after.memory_usage(deep=True, index=False),
+    })
+    report.loc['total'] = ['', report['bytes_before'].sum(), '', report['bytes_after'].sum()]
+    report[['dtype_before', 'dtype_after']] = report[['dtype_before', 'dtype_after']].fillna('')
+    report['bytes_before'] = report['bytes_before'].fillna(0).astype(np.int64)
+    report['bytes_after'] = report['bytes_after'].fillna(0).astype(np.int64)
+    report['ratio'] = (report['bytes_after'] / report['bytes_before'].replace(0, np.nan)).round(3)
+    return report
@@ -0,0 +1,75 @@
+import hashlib
+import json
+import os
+
+import pandas as pd
+import pyarrow.feather as feather
+
+from emotions import EMOTION_COLUMNS
+import snapshot
+
+# Columns whose values depend only on a row's own content, so they can be carried over
+# from an earlier build for any row whose key is unchanged (the NRC counts as uint16)
+STORED_COLUMNS = ['City', 'Country', 'TouristType', 'TextBlob', 'VADER'] + EMOTION_COLUMNS
+
+KEY_FIELDS = ['Title', 'Text', 'Year', 'Month', 'Day', 'Hometown']
+
+
+def row_keys(df):
+    # Stable per-row content hash of Title + Text + date + Hometown
+    parts = [df[col].astype(object).where(df[col].notna(), None) for col in KEY_FIELDS]
+    keys = []
+    for title, text, year, month, day, hometown in zip(*parts):
+        h = hashlib.blake2b(digest_size=12)
+        h.update(json.dumps([title, text, _int(year), _int(month), _int(day), hometown]).encode('utf-8'))
+        keys.append(h.hexdigest())
+    return pd.Series(keys, index=df.index, name='RowKey')
+
+
+def store_path(csv_path, name='scores'):
+    # The store is tied to the scorer versions; upgrading a scorer starts from an empty store.
+    # name keeps apart stores of different column sets (the Streamlit app keeps its own).
+    return os.path.join(snapshot.SNAPSHOT_DIR, f'{snapshot._stem(csv_path)}.{name}-{snapshot.versions_tag()}.feather')
+
+
+def load_store(csv_path, columns=STORED_COLUMNS, name='scores'):
+    path = store_path(csv_path, name)
+    if not os.path.exists(path):
+        return None
+    try:
+        store = feather.read_feather(path, memory_map=True)
+    except Exception:
+        return None
+    # A store written before a column was added is no use; the next save replaces it
+    if not set(columns) <= set(store.columns):
+        return None
+    return store.set_index('RowKey')
+
+
+def save_store(df, csv_path, columns=STORED_COLUMNS, name='scores'):
+    # Only keys present in the current CSV are written back, so deleted rows drop out
+    os.makedirs(snapshot.SNAPSHOT_DIR, exist_ok=True)
+    path = store_path(csv_path, name)
+    store = df[['RowKey'] + columns].drop_duplicates('RowKey').reset_index(drop=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    feather.write_feather(store, tmp_path, compression='uncompressed')
+    os.replace(tmp_path, path)
+    prefix = f'{snapshot._stem(csv_path)}.{name}-'
+    for entry in os.listdir(snapshot.SNAPSHOT_DIR):
+        stale = os.path.join(snapshot.SNAPSHOT_DIR, entry)
+        if entry.startswith(prefix) and stale != path:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+
+def split_known(row_keys, store):
+    # Boolean mask of rows whose stored results can be reused
+    if store is None or store.empty:
+        return pd.Series(False, index=row_keys.index)
+    return row_keys.isin(store.index)
+
+
+def _int(value):
+    return None if value is None else int(value)
@@ -0,0 +1,103 @@
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+import pyarrow.feather as feather
+from textblob import TextBlob
+
+from vader_batch import BatchVader
+
+SCORE_COLUMNS = ['TextBlob', 'VADER']
+
+DEFAULT_CHUNK_SIZE = int(os.environ.get('MOMA_SCORING_CHUNK_SIZE', 2000))
+DEFAULT_WORKERS = int(os.environ.get('MOMA_SCORING_WORKERS', 0)) or os.cpu_count() or 1
+
+# Analyzers are built once per process (once per pool worker) and reused for every chunk
+_vader = None
+
+
+def _init_analyzers():
+    global _vader
+    if _vader is None:
+        _vader = BatchVader()
+
+
+def score_chunk(texts):
+    # Score one chunk of review texts; this is the only scoring code path, serial or parallel
+    _init_analyzers()
+    return pd.DataFrame({
+        'TextBlob': [TextBlob(txt).sentiment.polarity for txt in texts],
+        'VADER': _vader.compound(texts),
+    })
+
+
+def score_texts(texts, workers=None, chunk_size=None, progress=None, checkpoint_dir=None):
+    # Score texts in chunks on a process pool. progress(done, total) is called after every
+    # chunk; with checkpoint_dir set, finished chunks are kept on disk so a rerun resumes.
+    texts = list(texts)
+    workers = workers or DEFAULT_WORKERS
+    chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+    chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    results = [None] * len(chunks)
+    done = 0
+
+    if checkpoint_dir:
+        os.makedirs(checkpoint_dir, exist_ok=True)
+    paths = [_checkpoint_path(checkpoint_dir, i, chunk) if checkpoint_dir else None
+             for i, chunk in enumerate(chunks)]
+
+    pending = []
+    for i, path in enumerate(paths):
+        if path and os.path.exists(path):
+            results[i] = feather.read_feather(path)
+            done += len(chunks[i])
+        else:
+            pending.append(i)
+    if progress and done:
+        progress(done, len(texts))
+
+    def finish(i, scored):
+        nonlocal done
+        results[i] = scored
+        if paths[i]:
+            tmp_path = f'{paths[i]}.tmp'
+            feather.write_feather(scored, tmp_path)
+            os.replace(tmp_path, paths[i])
+        done += len(chunks[i])
+        if progress:
+            progress(done, len(texts))
+
+    if workers <= 1 or len(pending) <= 1:
+        for i in pending:
+            finish(i, score_chunk(chunks[i]))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending)), initializer=_init_analyzers) as pool:
+            futures = {pool.submit(score_chunk, chunks[i]): i for i in pending}
+            for future in as_completed(futures):
+                finish(futures[future], future.result())
+
+    if not results:
+        return pd.DataFrame({col: pd.Series(dtype=float) for col in SCORE_COLUMNS})
+    return pd.concat(results, ignore_index=True)
+
+
+def clear_checkpoints(checkpoint_dir):
+    if not checkpoint_dir or not os.path.isdir(checkpoint_dir):
+        return
+    for name in os.listdir(checkpoint_dir):
+        if name.startswith('chunk-'):
+            os.remove(os.path.join(checkpoint_dir, name))
+    try:
+        os.rmdir(checkpoint_dir)
+    except OSError:
+        pass
+
+
+def _checkpoint_path(checkpoint_dir, index, chunk):
+    # The chunk contents are part of the name, so a checkpoint is only reused for identical input
+    h = hashlib.sha1()
+    for txt in chunk:
+        h.update(str(txt).encode('utf-8'))
+        h.update(b'\0')
+    return os.path.join(checkpoint_dir, f'chunk-{index:06d}-{h.hexdigest()[:16]}.feather')
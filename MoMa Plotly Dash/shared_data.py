@@ -0,0 +1,248 @@
+# The processed dataset published once per host as a read-only segment of memory-mapped
+# files, so every server worker (and every job forked from one) maps the same pages instead
+# of scoring, indexing and holding its own copy. A segment is a directory under SHARED_DIR
+# named after the snapshot key (CSV digest + scorer versions):
+#   reviews.arrow                      reviews_df, uncompressed Arrow IPC
+#   text-postings.npy, text-offsets.npy, text-terms.arrow      TextIndex
+#   <matrix>-data/indices/indptr.npy, <matrix>-vocabulary.arrow  unigram/bigram TermMatrix
+#   bitmaps.npy                        FilterIndex bitmaps, one row per (column, value)
+#   cube-counts.npy, cube-sums.npy     ReviewCube arrays
+#   meta.json                          data_version, bitmap keys, cube levels, topic terms; written last
+# <stem>.current is a symlink to the live segment and is replaced atomically (rename), so a
+# reader sees either the old segment or the new one. The first worker to take the publish
+# lock builds the segment; the rest wait on the lock and attach. Workers that are already
+# serving notice a newer segment through the symlink (see loader.Dataset.check_for_update).
+# Numeric columns, posting lists and matrices are NumPy views of the mapped files; only the
+# category codes of categorical columns are copied into each worker.
+#   python "MoMa Plotly Dash/shared_data.py" publish [reviews.csv]
+#   python "MoMa Plotly Dash/shared_data.py" status [reviews.csv]
+import fcntl
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.feather as feather
+from scipy import sparse
+
+import snapshot
+
+SHARED_DIR = os.environ.get('MOMA_SHARED_DIR', os.path.join(snapshot.SNAPSHOT_DIR, 'shared'))
+# Set MOMA_SHARED_DATA=0 to build a private copy in every worker instead
+SHARED_DATA = os.environ.get('MOMA_SHARED_DATA', '1') != '0'
+
+# Bump whenever the segment layout changes
+SEGMENT_FORMAT = 2
+
+META = 'meta.json'
+MATRICES = ['unigram_matrix', 'bigram_matrix']
+
+
+def segment_name(csv_path):
+    return f'{snapshot._stem(csv_path)}-{snapshot.snapshot_key(csv_path)}-s{SEGMENT_FORMAT}'
+
+
+def pointer_path(csv_path):
+    return os.path.join(SHARED_DIR, f'{snapshot._stem(csv_path)}.current')
+
+
+def current_segment(csv_path):
+    # Path of the live segment, or None before anything has been published
+    try:
+        return os.path.join(SHARED_DIR, os.readlink(pointer_path(csv_path)))
+    except OSError:
+        return None
+
+
+def load_shared(csv_path, build, on_status=None):
+    # Attach to the segment for the current CSV and scorers, building and publishing it
+    # first (build() -> data_processing.build_dataset() dict) if no worker has yet.
+    # Returns (segment path, dataset fields).
+    report = on_status or (lambda status: None)
+    path = os.path.join(SHARED_DIR, segment_name(csv_path))
+    with _publish_lock(csv_path):
+        if not os.path.exists(os.path.join(path, META)):
+            report('building shared dataset')
+            parts = build()
+            report('publishing shared dataset')
+            write_segment(parts, path)
+            del parts
+        if current_segment(csv_path) != path:
+            swap_pointer(csv_path, path)
+    report('attaching shared dataset')
+    return path, attach(path)
+
+
+def write_segment(parts, path):
+    # Written to a temporary directory and renamed into place, so a segment with a meta.json
+    # is always complete
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    df = parts['reviews_df'].reset_index(drop=True)
+    # One record batch per file: a column split across batches would be concatenated (copied)
+    # when converted to pandas
+    feather.write_feather(df, os.path.join(tmp_path, 'reviews.arrow'), compression='uncompressed',
+                          chunksize=max(len(df), 1))
+
+    text_index = parts['text_index']
+    np.save(os.path.join(tmp_path, 'text-postings.npy'), text_index.postings)
+    np.save(os.path.join(tmp_path, 'text-offsets.npy'), text_index.offsets)
+    _write_strings(os.path.join(tmp_path, 'text-terms.arrow'), text_index.terms)
+
+    for name in MATRICES:
+        matrix = parts[name].matrix
+        for array in ('data', 'indices', 'indptr'):
+            np.save(os.path.join(tmp_path, f'{name}-{array}.npy'), getattr(matrix, array))
+        _write_strings(os.path.join(tmp_path, f'{name}-vocabulary.arrow'), parts[name].vocabulary)
+
+    bitmap_keys = []
+    bitmaps = []
+    for column, values in parts['filter_index'].bitmaps.items():
+        for value, bits in values.items():
+            bitmap_keys.append([column, value])
+            bitmaps.append(bits)
+    n_bytes = (len(df) + 7) // 8
+    np.save(os.path.join(tmp_path, 'bitmaps.npy'),
+            np.vstack(bitmaps) if bitmaps else np.zeros((0, n_bytes), dtype=np.uint8))
+
+    review_cube = parts['review_cube']
+    measures = list(review_cube.sums)
+    np.save(os.path.join(tmp_path, 'cube-counts.npy'), review_cube.counts)
+    np.save(os.path.join(tmp_path, 'cube-sums.npy'), np.stack([review_cube.sums[m] for m in measures]))
+
+    meta = {'format': SEGMENT_FORMAT, 'data_version': parts['data_version'], 'rows': len(df),
+            'shapes': {name: list(parts[name].matrix.shape) for name in MATRICES},
+            'bitmap_keys': bitmap_keys, 'cube_levels': review_cube.levels, 'cube_measures': measures,
+            'topic_terms': parts['topic_terms']}
+    with open(os.path.join(tmp_path, META), 'w') as f:
+        json.dump(meta, f)
+    shutil.rmtree(path, ignore_errors=True)
+    os.rename(tmp_path, path)
+    return path
+
+
+def attach(path):
+    # Dataset fields over the segment's files, mapped read-only
+    from cube import ReviewCube
+    from filter_index import FilterIndex
+    from term_matrix import TermMatrix
+    from text_index import TextIndex
+
+    with open(os.path.join(path, META)) as f:
+        meta = json.load(f)
+    # split_blocks keeps each numeric column a view of the mapped buffer instead of
+    # consolidating columns into a freshly allocated block
+    reviews_df = feather.read_table(os.path.join(path, 'reviews.arrow'), memory_map=True).to_pandas(split_blocks=True)
+
+    text_index = TextIndex.from_arrays(
+        reviews_df['ReviewText'], SortedStrings(_read_strings(os.path.join(path, 'text-terms.arrow'))),
+        _load(path, 'text-postings.npy'), _load(path, 'text-offsets.npy'))
+
+    matrices = {}
+    for name in MATRICES:
+        matrix = sparse.csr_matrix((_load(path, f'{name}-data.npy'), _load(path, f'{name}-indices.npy'),
+                                    _load(path, f'{name}-indptr.npy')), shape=tuple(meta['shapes'][name]), copy=False)
+        matrices[name] = TermMatrix.from_arrays(matrix, _read_strings(os.path.join(path, f'{name}-vocabulary.arrow')))
+
+    bitmap_rows = _load(path, 'bitmaps.npy')
+    bitmaps = {}
+    for (column, value), bits in zip(meta['bitmap_keys'], bitmap_rows):
+        bitmaps.setdefault(column, {})[value] = bits
+
+    cube_sums = _load(path, 'cube-sums.npy')
+    review_cube = ReviewCube.from_arrays(meta['cube_levels'], _load(path, 'cube-counts.npy'),
+                                         dict(zip(meta['cube_measures'], cube_sums)))
+
+    return {
+        'reviews_df': reviews_df,
+        'data_version': meta['data_version'],
+        'text_index': text_index,
+        'filter_index': FilterIndex(reviews_df, text_index=text_index, bitmaps=bitmaps),
+        'review_cube': review_cube,
+        **matrices,
+        'topic_terms': meta['topic_terms'],
+    }
+
+
+def swap_pointer(csv_path, path):
+    # Point <stem>.current at path in one rename, then drop segments older than the one it
+    # replaced (workers still mapping a removed segment keep their pages until they let go)
+    pointer = pointer_path(csv_path)
+    previous = current_segment(csv_path)
+    tmp_pointer = f'{pointer}.{os.getpid()}.tmp'
+    if os.path.lexists(tmp_pointer):
+        os.remove(tmp_pointer)
+    os.symlink(os.path.basename(path), tmp_pointer)
+    os.replace(tmp_pointer, pointer)
+    keep = {path, previous}
+    prefix = f'{snapshot._stem(csv_path)}-'
+    for name in os.listdir(SHARED_DIR):
+        segment = os.path.join(SHARED_DIR, name)
+        if name.startswith(prefix) and os.path.isdir(segment) and segment not in keep and not name.endswith('.tmp'):
+            shutil.rmtree(segment, ignore_errors=True)
+
+
+def publish(csv_path):
+    # Build (or reuse) the segment for the CSV as it is now and make it the live one;
+    # running servers switch to it on their next check
+    import data_processing
+    return load_shared(csv_path, lambda: data_processing.build_dataset(csv_path))[0]
+
+
+class SortedStrings:
+    # Read-only sequence view of a sorted Arrow string array, for bisect
+    def __init__(self, array):
+        self.array = array
+
+    def __len__(self):
+        return len(self.array)
+
+    def __getitem__(self, i):
+        return self.array[i].as_py()
+
+
+class _publish_lock:
+    # Exclusive lock per CSV across all processes on the host
+    def __init__(self, csv_path):
+        self.path = os.path.join(SHARED_DIR, f'{snapshot._stem(csv_path)}.lock')
+
+    def __enter__(self):
+        os.makedirs(SHARED_DIR, exist_ok=True)
+        self.file = open(self.path, 'a')
+        fcntl.flock(self.file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.file.close()
+
+
+def _load(path, name):
+    return np.load(os.path.join(path, name), mmap_mode='r')
+
+
+def _write_strings(path, values):
+    array = pa.array(values, type=pa.string()) if not isinstance(values, pa.Array) else values
+    feather.write_feather(pa.table({'value': array}), path, compression='uncompressed', chunksize=max(len(array), 1))
+
+
+def _read_strings(path):
+    column = feather.read_table(path, memory_map=True).column('value')
+    return column.chunk(0) if column.num_chunks == 1 else column.combine_chunks()
+
+
+def main(argv):
+    command = argv[0] if argv else 'status'
+    csv_path = argv[1] if len(argv) > 1 else 'reviews-1.csv'
+    if command == 'publish':
+        print(f"published {publish(csv_path)}")
+    else:
+        print(f"live segment: {current_segment(csv_path) or 'none'}")
+        print(f"segment for the CSV as it is now: {os.path.join(SHARED_DIR, segment_name(csv_path))}")
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
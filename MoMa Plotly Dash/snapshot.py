@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+from importlib import metadata
+
+import pyarrow.feather as feather
+
+# Bump whenever load_data changes which columns it produces or how they are computed,
+# so snapshots written by an older pipeline are rebuilt instead of served
+PIPELINE_VERSION = 7
+
+# Snapshots live next to the code unless MOMA_SNAPSHOT_DIR points elsewhere
+SNAPSHOT_DIR = os.environ.get('MOMA_SNAPSHOT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.snapshots'))
+
+# Packages whose output ends up in the scored frame
+SCORER_PACKAGES = ['pandas', 'textblob', 'nltk', 'NRCLex']
+
+
+def scorer_versions():
+    versions = {'pipeline': PIPELINE_VERSION}
+    for name in SCORER_PACKAGES:
+        try:
+            versions[name] = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            versions[name] = None
+    return versions
+
+
+def versions_tag():
+    # Short hash of scorer_versions(), for files that outlive a CSV edit but not a scorer upgrade
+    versions = json.dumps(scorer_versions(), sort_keys=True)
+    return hashlib.sha256(versions.encode('utf-8')).hexdigest()[:12]
+
+
+def file_digest(path, block_size=1 << 20):
+    # Hashing a large dump takes a while, so remember the digest for an unchanged (size, mtime)
+    stat = os.stat(path)
+    memo_path = _memo_path(path)
+    try:
+        with open(memo_path) as f:
+            memo = json.load(f)
+        if (memo['path'] == os.path.abspath(path) and memo['size'] == stat.st_size
+                and memo['mtime_ns'] == stat.st_mtime_ns):
+            return memo['sha256']
+    except (OSError, ValueError, KeyError):
+        pass
+
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            h.update(block)
+    digest = h.hexdigest()
+
+    _write_json(memo_path, {'path': os.path.abspath(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest})
+    return digest
+
+
+def snapshot_key(csv_path):
+    payload = json.dumps({'csv': file_digest(csv_path), 'versions': scorer_versions()}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:20]
+
+
+def snapshot_path(csv_path, key=None):
+    key = key or snapshot_key(csv_path)
+    return os.path.join(SNAPSHOT_DIR, f'{_stem(csv_path)}-{key}.feather')
+
+
+def read_snapshot(csv_path):
+    # Returns the scored frame, or None when there is no snapshot for the current CSV and scorers
+    path = snapshot_path(csv_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        # Uncompressed Feather (Arrow IPC) is memory-mapped rather than read into a buffer
+        table = feather.read_table(path, memory_map=True)
+    except Exception:
+        return None
+    return table.to_pandas()
+
+
+def write_snapshot(df, csv_path):
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    path = snapshot_path(csv_path)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    feather.write_feather(df.reset_index(drop=True), tmp_path, compression='uncompressed')
+    os.replace(tmp_path, path)
+    _remove_stale(csv_path, keep=path)
+    return path
+
+
+def _remove_stale(csv_path, keep):
+    prefix = f'{_stem(csv_path)}-'
+    for name in os.listdir(SNAPSHOT_DIR):
+        path = os.path.join(SNAPSHOT_DIR, name)
+        if name.startswith(prefix) and name.endswith('.feather') and path != keep:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _stem(csv_path):
+    return os.path.splitext(os.path.basename(csv_path))[0]
+
+
+def _memo_path(csv_path):
+    return os.path.join(SNAPSHOT_DIR, f'{_stem(csv_path)}.digest.json')
+
+
+def _write_json(path, obj):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(obj, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
@@ -0,0 +1,44 @@
+import numpy as np
+from sklearn.feature_extraction.text import CountVectorizer
+
+
+class TermMatrix:
+    # Document-term counts for every review, fitted once on the whole corpus. Rows follow
+    # reviews_df order, so the term frequencies of any filtered row set are a sparse row
+    # subset summed down the columns; nothing dense of size docs x vocabulary is built.
+
+    def __init__(self, texts, ngram_range=(1, 1), stop_words='english'):
+        self.vectorizer = CountVectorizer(stop_words=stop_words, ngram_range=ngram_range, dtype=np.int32)
+        self.matrix = self.vectorizer.fit_transform(texts.fillna('')).tocsr()
+        self.vocabulary = self.vectorizer.get_feature_names_out()
+
+    @classmethod
+    def from_arrays(cls, matrix, vocabulary):
+        # Counts already fitted elsewhere (e.g. memory-mapped by shared_data); vocabulary is a
+        # NumPy or Arrow array of terms in column order
+        term_matrix = cls.__new__(cls)
+        term_matrix.vectorizer = None
+        term_matrix.matrix = matrix
+        term_matrix.vocabulary = vocabulary
+        return term_matrix
+
+    def frequencies(self, rows):
+        # Total count of every vocabulary term over the given row positions
+        if len(rows) == self.matrix.shape[0]:
+            counts = self.matrix.sum(axis=0)
+        else:
+            counts = self.matrix[rows].sum(axis=0)
+        return np.asarray(counts).ravel()
+
+    def frequency_dict(self, rows):
+        # {term: count} for terms that occur in rows, as fed to WordCloud.generate_from_frequencies
+        counts = self.frequencies(rows)
+        present = np.flatnonzero(counts)
+        return dict(zip(self.vocabulary.take(present).tolist(), counts[present].tolist()))
+
+    def top_terms(self, rows, n=10):
+        # n most frequent terms over rows, ties broken by vocabulary order
+        counts = self.frequencies(rows)
+        present = np.flatnonzero(counts)
+        order = present[np.argsort(-counts[present], kind='stable')][:n]
+        return self.vocabulary.take(order).tolist(), counts[order].tolist()
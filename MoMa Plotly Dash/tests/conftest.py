@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+# The app's modules are flat files next to this directory; the benchmarks hold the
+# synthetic corpus and the VADER edge cases
+CODE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, CODE_DIR)
+sys.path.insert(0, os.path.join(CODE_DIR, 'benchmarks'))
+
+import snapshot  # noqa: E402
+from synthetic_reviews import synthetic_reviews  # noqa: E402
+
+
+@pytest.fixture
+def snapshot_dir(tmp_path, monkeypatch):
+    # Snapshots, score stores, topic models and caches go to a fresh directory per test
+    path = str(tmp_path / 'snapshots')
+    monkeypatch.setattr(snapshot, 'SNAPSHOT_DIR', path)
+    return path
+
+
+@pytest.fixture
+def reviews():
+    return synthetic_reviews(300, seed=7)
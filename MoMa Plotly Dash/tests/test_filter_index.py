@@ -0,0 +1,70 @@
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from filter_index import INDEXED_COLUMNS, FilterIndex
+from text_index import TextIndex
+
+STATES = [
+    {},
+    {'years': [2016, 2019]},
+    {'tourist_types': ['Local', 'Foreign'], 'ratings': [1, 2, 5]},
+    {'sentiments': ['Negative'], 'emotions': ['joy', 'fear']},
+    {'duplicates': [False]},
+    {'years': [2014], 'tourist_types': ['Domestic'], 'sentiments': ['Positive', 'Neutral'], 'ratings': [4]},
+    {'keyword': 'art'},
+    {'keyword': 'MONET', 'ratings': [4, 5]},
+    {'keyword': 'art', 'duplicates': [False], 'years': [2020, 2021, 2022]},
+    {'keyword': 'nosuchword'},
+    {'years': [1999]},
+    {'years': [2016], 'ratings': []},
+]
+
+
+@pytest.fixture
+def frame(reviews):
+    rng = np.random.default_rng(3)
+    n = len(reviews)
+    emotion = rng.choice(np.array(['joy', 'fear', 'anger', None], dtype=object), n)
+    return pd.DataFrame({
+        'ReviewText': reviews['Title'] + ' ' + reviews['Text'],
+        'Year': reviews['Year'].astype(np.int16),
+        'Rating': reviews['Rating'].astype(np.int8),
+        'TouristType': pd.Categorical(rng.choice(['Local', 'Domestic', 'Foreign', 'Not Specified'], n)),
+        'Sentiment': pd.Categorical(rng.choice(['Positive', 'Neutral', 'Negative'], n)),
+        'Emotion': pd.Categorical(emotion),
+        'Duplicate': rng.random(n) < 0.1,
+    })
+
+
+def expected_rows(df, state):
+    # The pandas boolean masks the pages used before the index
+    mask = pd.Series(True, index=df.index)
+    for arg, values in state.items():
+        if arg == 'keyword':
+            mask &= df['ReviewText'].str.contains(rf'\b{re.escape(values)}\b', case=False, regex=True)
+        elif values:
+            mask &= df[INDEXED_COLUMNS[arg]].isin(values)
+    return np.flatnonzero(mask.to_numpy())
+
+
+@pytest.mark.parametrize('state', STATES)
+def test_rows_match_pandas_masks(frame, state):
+    index = FilterIndex(frame, text_index=TextIndex(frame['ReviewText']))
+    rows = index.rows(**state)
+    np.testing.assert_array_equal(rows, expected_rows(frame, state))
+    # A second lookup is served from the cache and is the same read-only array
+    assert index.rows(**state) is rows
+    assert not rows.flags.writeable
+
+
+def test_filter_df_matches_pandas(frame):
+    index = FilterIndex(frame, text_index=TextIndex(frame['ReviewText']))
+    state = {'years': [2016, 2019], 'sentiments': ['Positive']}
+    result = index.filter_df(**state, columns=['Year', 'Sentiment', 'Rating'])
+    expected = frame.iloc[expected_rows(frame, state)][['Year', 'Sentiment', 'Rating']]
+    assert result['Year'].tolist() == expected['Year'].tolist()
+    assert result['Rating'].tolist() == expected['Rating'].tolist()
+    assert list(result['Sentiment'].cat.categories) == ['Positive']
@@ -0,0 +1,70 @@
+import os
+
+import pandas as pd
+import pytest
+
+import data_processing
+import nlp_resources
+import scoring
+import snapshot
+
+pytestmark = pytest.mark.skipif(not nlp_resources.available('vader_lexicon'), reason='VADER lexicon not installed')
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    return str(tmp_path / 'reviews-1.csv')
+
+
+@pytest.fixture
+def scored_texts(monkeypatch):
+    # Number of texts sent to the scorers
+    counts = []
+    score_texts = scoring.score_texts
+
+    def counting(texts, **kwargs):
+        texts = list(texts)
+        counts.append(len(texts))
+        return score_texts(texts, **kwargs)
+
+    monkeypatch.setattr(scoring, 'score_texts', counting)
+    return counts
+
+
+def test_snapshot_reload_matches_build(snapshot_dir, reviews, csv_path, scored_texts):
+    reviews.to_csv(csv_path, index=False)
+    built = data_processing.load_data(csv_path, workers=1)
+    assert os.path.exists(snapshot.snapshot_path(csv_path))
+    scored = sum(scored_texts)
+    reloaded = data_processing.load_data(csv_path, workers=1)
+    assert sum(scored_texts) == scored
+    pd.testing.assert_frame_equal(reloaded, built)
+
+
+def test_incremental_rebuild_matches_fresh_build(snapshot_dir, reviews, csv_path, scored_texts):
+    reviews.iloc[:200].to_csv(csv_path, index=False)
+    data_processing.load_data(csv_path, workers=1)
+
+    # Two reviews deleted, one edited, a hundred appended
+    changed = reviews.drop(index=[5, 6]).copy()
+    changed.loc[10, 'Text'] = 'An edited review: the new wing was wonderful but the queue was awful.'
+    changed.to_csv(csv_path, index=False)
+    scored_texts.clear()
+    incremental = data_processing.load_data(csv_path, workers=1)
+    assert 0 < sum(scored_texts) <= 101
+
+    fresh = data_processing.build_reviews(csv_path, workers=1)
+    pd.testing.assert_frame_equal(incremental, fresh)
+    # The rebuilt snapshot serves the same frame
+    pd.testing.assert_frame_equal(snapshot.read_snapshot(csv_path), fresh)
+
+
+def test_scorer_upgrade_starts_a_new_snapshot(snapshot_dir, reviews, csv_path, monkeypatch):
+    reviews.iloc[:50].to_csv(csv_path, index=False)
+    data_processing.load_data(csv_path, workers=1)
+    old_path = snapshot.snapshot_path(csv_path)
+    monkeypatch.setattr(snapshot, 'PIPELINE_VERSION', snapshot.PIPELINE_VERSION + 1)
+    assert snapshot.read_snapshot(csv_path) is None
+    data_processing.load_data(csv_path, workers=1)
+    assert os.path.exists(snapshot.snapshot_path(csv_path))
+    assert not os.path.exists(old_path)
@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+import nlp_resources
+from check_vader_conformance import EDGE_CASES, TOLERANCE
+
+pytestmark = pytest.mark.skipif(not nlp_resources.available('vader_lexicon'), reason='VADER lexicon not installed')
+
+
+def test_compound_matches_nltk(reviews):
+    from nltk.sentiment import SentimentIntensityAnalyzer
+    from vader_batch import BatchVader
+
+    texts = list(EDGE_CASES) + (reviews['Title'] + ' ' + reviews['Text']).tolist() + reviews['Text'].tolist()
+    analyzer = SentimentIntensityAnalyzer()
+    expected = np.array([analyzer.polarity_scores(str(t))['compound'] for t in texts])
+    actual = BatchVader(analyzer).compound(texts)
+    assert len(actual) == len(texts)
+    assert np.abs(actual - expected).max() <= TOLERANCE
+
+
+def test_compound_of_no_texts():
+    from vader_batch import BatchVader
+
+    assert len(BatchVader().compound([])) == 0
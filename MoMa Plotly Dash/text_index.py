@@ -0,0 +1,114 @@
+import re
+from bisect import bisect_left
+
+import numpy as np
+
+TOKEN_RE = re.compile(r'\w+')
+# A query is a mix of "quoted phrases" and bare terms; a bare term ending in * is a prefix
+QUERY_RE = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower()) if isinstance(text, str) else []
+
+
+class TextIndex:
+    # Inverted index over normalized (lower-cased, \w+) ReviewText tokens. Terms are kept
+    # sorted so prefix lookups are a bisect, and each term maps to a sorted array of row
+    # positions stored contiguously (CSR style) in one int32 array.
+
+    def __init__(self, texts):
+        # texts is the ReviewText Series; phrase checks read candidate rows from it by position
+        self.texts = texts
+        self.n_rows = len(texts)
+        term_ids = {}
+        term_col = []
+        doc_col = []
+        for doc, text in enumerate(texts):
+            for term in set(tokenize(text)):
+                term_col.append(term_ids.setdefault(term, len(term_ids)))
+                doc_col.append(doc)
+
+        # Renumber terms in sorted order so a prefix maps to a contiguous id range
+        self.terms = sorted(term_ids)
+        remap = np.empty(len(term_ids), dtype=np.int32)
+        remap[[term_ids[t] for t in self.terms]] = np.arange(len(self.terms), dtype=np.int32)
+        term_col = remap[np.asarray(term_col, dtype=np.int32)]
+        doc_col = np.asarray(doc_col, dtype=np.int32)
+
+        order = np.lexsort((doc_col, term_col))
+        self.postings = doc_col[order]
+        self.offsets = np.zeros(len(self.terms) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_col, minlength=len(self.terms)), out=self.offsets[1:])
+        self.term_index = {term: i for i, term in enumerate(self.terms)}
+
+    @classmethod
+    def from_arrays(cls, texts, terms, postings, offsets):
+        # Index over already built arrays (e.g. memory-mapped by shared_data); terms is any
+        # sorted sequence of str, and exact lookups bisect it instead of keeping a dict
+        index = cls.__new__(cls)
+        index.texts = texts
+        index.n_rows = len(texts)
+        index.terms = terms
+        index.postings = postings
+        index.offsets = offsets
+        index.term_index = None
+        return index
+
+    def term(self, term):
+        # Rows containing the exact token
+        i = self._term_id(term.lower())
+        if i is None:
+            return np.empty(0, dtype=np.int32)
+        return self.postings[self.offsets[i]:self.offsets[i + 1]]
+
+    def _term_id(self, term):
+        if self.term_index is not None:
+            return self.term_index.get(term)
+        i = bisect_left(self.terms, term)
+        return i if i < len(self.terms) and self.terms[i] == term else None
+
+    def prefix(self, prefix):
+        # Rows containing any token starting with prefix
+        prefix = prefix.lower()
+        lo = bisect_left(self.terms, prefix)
+        hi = bisect_left(self.terms, prefix + '\U0010ffff', lo)
+        if hi - lo == 1:
+            return self.term(self.terms[lo])
+        if hi == lo:
+            return np.empty(0, dtype=np.int32)
+        return np.unique(self.postings[self.offsets[lo]:self.offsets[hi]])
+
+    def phrase(self, phrase):
+        # Rows containing the tokens of phrase consecutively. Candidates come from the
+        # posting-list intersection; only those rows are checked against the text.
+        terms = tokenize(phrase)
+        if not terms:
+            return None
+        rows = self.term(terms[0])
+        for term in terms[1:]:
+            if not len(rows):
+                break
+            rows = np.intersect1d(rows, self.term(term), assume_unique=True)
+        if len(terms) == 1 or not len(rows):
+            return rows
+        pattern = re.compile(r'\b' + r'\W+'.join(re.escape(t) for t in terms) + r'\b')
+        matches = [pattern.search(self.texts.iat[i].lower()) is not None for i in rows]
+        return rows[np.asarray(matches, dtype=bool)]
+
+    def search(self, query):
+        # Sorted row positions matching every part of query, or None when the query has
+        # no searchable tokens (so it should not filter anything)
+        result = None
+        for quoted, bare in QUERY_RE.findall(query):
+            if quoted:
+                rows = self.phrase(quoted)
+            elif bare.endswith('*') and tokenize(bare):
+                rows = self.prefix(''.join(tokenize(bare)))
+            else:
+                # Punctuation inside a bare term (e.g. "don't") makes it a short phrase
+                rows = self.phrase(bare)
+            if rows is None:
+                continue
+            result = rows if result is None else np.intersect1d(result, rows, assume_unique=True)
+        return result
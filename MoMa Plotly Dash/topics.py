@@ -0,0 +1,201 @@
+# Topic model over the reviews' unigram counts (the unigram TermMatrix): NMF trained online,
+# one minibatch at a time (sklearn MiniBatchNMF.partial_fit), and saved next to the
+# snapshots. Every dataset build loads the saved model, trains it on the reviews it has not
+# seen yet (by RowKey), saves it again and scores every review, so a grown CSV only costs a
+# pass over its new reviews. The model's vocabulary is fixed when it is first trained; terms
+# that only show up later are ignored until the model is rebuilt (delete the .topics file or
+# change a setting below).
+# Each review gets one float32 column per topic (Topic0, Topic1, ...: the topic's share of
+# the review, summing to 1, or all 0 for a review with none of the model's terms) and its
+# dominant topic (TopicId, -1 for none). ReviewCube sums the weight columns per cell, so
+# topic shares and per-year trends under the sidebar filters are cube reductions.
+import hashlib
+import json
+import os
+import pickle
+import re
+from importlib import metadata
+
+import numpy as np
+from scipy import sparse
+
+import snapshot
+
+TOPIC_COUNT = int(os.environ.get('MOMA_TOPICS', 10))
+# Terms the model knows: the ones in the most reviews, leaving out terms in more than
+# MAX_DOC_SHARE of them (museum, art, ...), which would be part of every topic
+TOPIC_VOCABULARY = int(os.environ.get('MOMA_TOPIC_VOCABULARY', 5000))
+MAX_DOC_SHARE = 0.5
+MIN_DOCS = 2
+TOPIC_BATCH_ROWS = int(os.environ.get('MOMA_TOPIC_BATCH_ROWS', 2048))
+# Passes over the reviews when a model is first trained; updates make one pass over new reviews
+TOPIC_EPOCHS = int(os.environ.get('MOMA_TOPIC_EPOCHS', 3))
+# Share of what earlier minibatches taught the model that is kept at each step, so the
+# topics drift with newer reviews instead of being fixed by the first ones
+FORGET_FACTOR = 0.9
+
+# Bump whenever the model or its features change, so saved models are retrained
+MODEL_VERSION = 2
+
+TOPIC_COLUMN_RE = re.compile(r'^Topic(\d+)$')
+
+
+def topic_columns(columns):
+    # Weight columns among columns, in topic order
+    found = [(int(m.group(1)), c) for c in columns for m in [TOPIC_COLUMN_RE.match(str(c))] if m]
+    return [c for _, c in sorted(found)]
+
+
+def key_hashes(row_keys):
+    # First 8 bytes of each RowKey (a hex blake2b digest) as uint64
+    keys = list(row_keys)
+    if not keys:
+        return np.empty(0, dtype=np.uint64)
+    raw = np.frombuffer(bytes.fromhex(''.join(keys)), dtype=np.uint8).reshape(len(keys), -1)
+    return np.ascontiguousarray(raw[:, :8]).view(np.uint64).ravel()
+
+
+class TopicModel:
+
+    def __init__(self, vocabulary, n_topics=TOPIC_COUNT, batch_rows=TOPIC_BATCH_ROWS):
+        from sklearn.decomposition import MiniBatchNMF
+        self.vocabulary = np.asarray(vocabulary, dtype=object)
+        self.n_topics = n_topics
+        self.batch_rows = batch_rows
+        self.nmf = MiniBatchNMF(n_components=n_topics, batch_size=batch_rows, init='nndsvda',
+                                forget_factor=FORGET_FACTOR, random_state=0)
+        # Sorted key_hashes() of the reviews trained on
+        self.seen = np.empty(0, dtype=np.uint64)
+
+    @classmethod
+    def for_matrix(cls, term_matrix, n_topics=TOPIC_COUNT, size=TOPIC_VOCABULARY):
+        # New, untrained model over the most widespread terms of term_matrix
+        matrix = term_matrix.matrix
+        docs = np.bincount(matrix.indices, minlength=matrix.shape[1])
+        eligible = np.flatnonzero((docs >= MIN_DOCS) & (docs <= MAX_DOC_SHARE * max(matrix.shape[0], 1)))
+        chosen = eligible[np.argsort(-docs[eligible], kind='stable')][:size]
+        return cls(np.asarray(term_matrix.vocabulary.take(np.sort(chosen)).tolist(), dtype=object), n_topics)
+
+    @property
+    def trained(self):
+        return hasattr(self.nmf, 'components_')
+
+    def features(self, term_matrix, rows=None):
+        # float32 rows over the model's vocabulary: sublinear term frequency, L2-normalised
+        from sklearn.preprocessing import normalize
+        matrix = term_matrix.matrix if rows is None else term_matrix.matrix[rows]
+        positions = {term: i for i, term in enumerate(self.vocabulary)}
+        source, target = [], []
+        for i, term in enumerate(term_matrix.vocabulary.tolist()):
+            j = positions.get(term)
+            if j is not None:
+                source.append(i)
+                target.append(j)
+        projection = sparse.csr_matrix((np.ones(len(source), dtype=np.float32), (source, target)),
+                                       shape=(matrix.shape[1], len(self.vocabulary)))
+        features = (matrix.astype(np.float32) @ projection).tocsr()
+        features.data = 1 + np.log(features.data)
+        return normalize(features, copy=False)
+
+    def update(self, term_matrix, keys, epochs=1):
+        # Trains on the rows whose keys the model has not seen; returns how many it trained on
+        if len(self.vocabulary) < self.n_topics:
+            return 0
+        new = np.flatnonzero(~np.isin(keys, self.seen))
+        if not len(new):
+            return 0
+        features = self.features(term_matrix, new)
+        # Reviews without any of the model's terms teach it nothing
+        usable = np.flatnonzero(np.diff(features.indptr) > 0)
+        # The first minibatch initialises the topics and needs at least one review per topic
+        if not len(usable) or (not self.trained and min(len(usable), self.batch_rows) < self.n_topics):
+            return 0
+        rng = np.random.default_rng(len(self.seen))
+        for _ in range(epochs):
+            order = rng.permutation(usable)
+            for start in range(0, len(order), self.batch_rows):
+                batch = order[start:start + self.batch_rows]
+                if not self.trained and len(batch) < self.n_topics:
+                    continue
+                self.nmf.partial_fit(features[batch])
+        self.seen = np.union1d(self.seen, keys[new])
+        return len(new)
+
+    def transform(self, term_matrix):
+        # (reviews x topics) float32 topic shares of every review
+        weights = np.zeros((term_matrix.matrix.shape[0], self.n_topics), dtype=np.float32)
+        if not self.trained or not len(weights):
+            return weights
+        weights[:] = self.nmf.transform(self.features(term_matrix))
+        totals = weights.sum(axis=1, keepdims=True)
+        np.divide(weights, totals, out=weights, where=totals > 0)
+        return weights
+
+    def top_terms(self, n=10):
+        # The n heaviest terms of every topic
+        if not self.trained:
+            return []
+        order = np.argsort(-self.nmf.components_, axis=1, kind='stable')[:, :n]
+        return [self.vocabulary.take(row).tolist() for row in order]
+
+
+def model_path(csv_path):
+    # One model per configuration; a different setting or sklearn version starts a new one
+    payload = json.dumps({'version': MODEL_VERSION, 'topics': TOPIC_COUNT, 'vocabulary': TOPIC_VOCABULARY,
+                          'batch_rows': TOPIC_BATCH_ROWS, 'sklearn': _version('scikit-learn')}, sort_keys=True)
+    tag = hashlib.sha256(payload.encode('utf-8')).hexdigest()[:12]
+    return os.path.join(snapshot.SNAPSHOT_DIR, f'{snapshot._stem(csv_path)}.topics-{tag}.pkl')
+
+
+def load_model(csv_path):
+    path = model_path(csv_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except Exception:
+        return None
+
+
+def save_model(model, csv_path):
+    os.makedirs(snapshot.SNAPSHOT_DIR, exist_ok=True)
+    path = model_path(csv_path)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    prefix = f'{snapshot._stem(csv_path)}.topics-'
+    for name in os.listdir(snapshot.SNAPSHOT_DIR):
+        stale = os.path.join(snapshot.SNAPSHOT_DIR, name)
+        if name.startswith(prefix) and stale != path and not name.endswith('.tmp'):
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+
+def update_model(csv_path, term_matrix, row_keys):
+    # The saved model for csv_path, trained on any reviews it has not seen yet
+    model = load_model(csv_path)
+    if model is None:
+        model = TopicModel.for_matrix(term_matrix)
+    epochs = 1 if model.trained else TOPIC_EPOCHS
+    if model.update(term_matrix, key_hashes(row_keys), epochs=epochs):
+        save_model(model, csv_path)
+    return model
+
+
+def add_topic_columns(df, weights):
+    # df with a Topic<i> column per topic and TopicId (dominant topic, -1 for none)
+    columns = {f'Topic{i}': weights[:, i] for i in range(weights.shape[1])}
+    dominant = np.where(weights.any(axis=1), weights.argmax(axis=1), -1) if weights.shape[1] else -1
+    columns['TopicId'] = np.broadcast_to(dominant, len(df)).astype(np.int8)
+    return df.assign(**columns)
+
+
+def _version(name):
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return None
@@ -0,0 +1,230 @@
+import string
+
+import numpy as np
+from nltk.sentiment import SentimentIntensityAnalyzer
+
+from nlp_resources import require_resources
+
+PUNCTUATION = frozenset(string.punctuation)
+
+
+class BatchVader:
+    # Batch port of nltk's SentimentIntensityAnalyzer.polarity_scores()['compound'].
+    # The corpus is tokenized once into flat token-id arrays (VADER's own whitespace and
+    # punctuation rules), per-token properties are looked up from vocabulary arrays, and
+    # the caps, booster, negation, idiom, "least" and "but" rules are applied to all tokens
+    # of all reviews at once. Every arithmetic step mirrors the reference in the same order,
+    # so the compound scores are identical, not just close.
+
+    def __init__(self, analyzer=None):
+        if analyzer is None:
+            require_resources(['vader_lexicon'])
+            analyzer = SentimentIntensityAnalyzer()
+        self.lexicon = analyzer.lexicon
+        self.constants = analyzer.constants
+        self.punc_list = set(self.constants.PUNC_LIST)
+
+    def compound(self, texts):
+        texts = [t if isinstance(t, str) else str(t) for t in texts]
+        tokens = self._tokenize(texts)
+        sentiments = self._sentiments(tokens)
+        return self._compound(texts, tokens, sentiments)
+
+    def _tokenize(self, texts):
+        # Mirrors SentiText: split on whitespace, drop single characters, and strip a
+        # leading/trailing PUNC_LIST entry when what remains is a word of the same text
+        remove_punctuation = self.constants.REGEX_REMOVE_PUNCTUATION
+        vocab = {}
+        tids, firsts, lengths = [], [], []
+        offset = 0
+        for text in texts:
+            words_only = {w for w in remove_punctuation.sub('', text).split() if len(w) > 1}
+            first = {}
+            n = 0
+            for token in text.split():
+                if len(token) <= 1:
+                    continue
+                if token[0] in PUNCTUATION or token[-1] in PUNCTUATION:
+                    token = self._strip_punctuation(token, words_only)
+                tids.append(vocab.setdefault(token, len(vocab)))
+                # polarity_scores evaluates every occurrence of a token at its first position
+                firsts.append(offset + first.setdefault(token, n))
+                n += 1
+            lengths.append(n)
+            offset += n
+
+        lengths = np.asarray(lengths, dtype=np.int64)
+        starts = np.zeros(len(texts), dtype=np.int64)
+        np.cumsum(lengths[:-1], out=starts[1:])
+        doc = np.repeat(np.arange(len(texts)), lengths)
+        return {
+            'vocab': list(vocab),
+            'tid': np.asarray(tids, dtype=np.int64),
+            'first': np.asarray(firsts, dtype=np.int64),
+            'doc': doc,
+            'pos': np.arange(len(doc)) - starts[doc],
+            'lengths': lengths,
+        }
+
+    def _strip_punctuation(self, token, words_only):
+        lead = 0
+        while lead < len(token) and token[lead] in PUNCTUATION:
+            lead += 1
+        if lead and token[:lead] in self.punc_list and token[lead:] in words_only:
+            return token[lead:]
+        trail = len(token)
+        while trail > 0 and token[trail - 1] in PUNCTUATION:
+            trail -= 1
+        if trail < len(token) and token[trail:] in self.punc_list and token[:trail] in words_only:
+            return token[:trail]
+        return token
+
+    def _vocab_features(self, vocab):
+        # One entry per distinct token plus a trailing sentinel for "no token here"
+        c = self.constants
+        lower = [w.lower() for w in vocab]
+        features = {
+            'in_lex': [w in self.lexicon for w in lower],
+            'lex': [self.lexicon.get(w, 0.0) for w in lower],
+            'upper': [w.isupper() for w in vocab],
+            'is_booster': [w in c.BOOSTER_DICT for w in lower],
+            'booster': [c.BOOSTER_DICT.get(w, 0.0) for w in lower],
+            'negated': [w in c.NEGATE or "n't" in w for w in lower],
+            'never': [w == 'never' for w in vocab],
+            'so_this': [w in ('so', 'this') for w in vocab],
+            'least': [w == 'least' for w in lower],
+            'at_very': [w in ('at', 'very') for w in lower],
+            'kind': [w == 'kind' for w in lower],
+            'of': [w == 'of' for w in lower],
+            'but': [w == 'but' for w in lower],
+        }
+        arrays = {}
+        for name, values in features.items():
+            dtype = float if name in ('lex', 'booster') else bool
+            arrays[name] = np.asarray(values + [0.0 if dtype is float else False], dtype=dtype)
+        return arrays
+
+    def _sentiments(self, tokens):
+        c = self.constants
+        vocab, tid, doc, pos, lengths = (tokens[k] for k in ('vocab', 'tid', 'doc', 'pos', 'lengths'))
+        f = self._vocab_features(vocab)
+        sentinel = len(vocab)
+        n = len(tid)
+        index = np.arange(n)
+
+        def prev(k):
+            return np.where(pos >= k, tid[np.maximum(index - k, 0)], sentinel)
+
+        def following(k):
+            return np.where(pos + k < lengths[doc], tid[np.minimum(index + k, max(n - 1, 0))], sentinel)
+
+        p1, p2, p3 = prev(1), prev(2), prev(3)
+        n1, n2 = following(1), following(2)
+
+        # Some but not all tokens of the review are ALL CAPS
+        allcaps = np.bincount(doc, weights=f['upper'][tid], minlength=len(lengths))
+        cap_diff = ((lengths - allcaps) > 0) & ((lengths - allcaps) < lengths)
+        cd = cap_diff[doc]
+
+        v = f['lex'][tid].copy()
+        caps = f['upper'][tid] & cd
+        v = np.where(caps, np.where(v > 0, v + c.C_INCR, v - c.C_INCR), v)
+
+        for start_i, pw in enumerate((p1, p2, p3)):
+            cond = (pos > start_i) & ~f['in_lex'][pw]
+            # scalar_inc_dec of the preceding word, evaluated against the current valence
+            is_booster = f['is_booster'][pw]
+            s = f['booster'][pw]
+            s = np.where(is_booster & (v < 0), s * -1, s)
+            boost_caps = is_booster & f['upper'][pw] & cd
+            s = np.where(boost_caps, np.where(v > 0, s + c.C_INCR, s - c.C_INCR), s)
+            if start_i == 1:
+                s = np.where(s != 0, s * 0.95, s)
+            if start_i == 2:
+                s = np.where(s != 0, s * 0.9, s)
+            new = v + s
+            # _never_check
+            if start_i == 0:
+                new = np.where(f['negated'][p1], new * c.N_SCALAR, new)
+            elif start_i == 1:
+                emphasis = f['never'][p2] & f['so_this'][p1]
+                new = np.where(emphasis, new * 1.5, np.where(f['negated'][p2], new * c.N_SCALAR, new))
+            else:
+                emphasis = (f['never'][p3] & f['so_this'][p2]) | f['so_this'][p1]
+                new = np.where(emphasis, new * 1.25, np.where(f['negated'][p3], new * c.N_SCALAR, new))
+                new = self._idioms(new, vocab, tid, p1, p2, p3, n1, n2)
+            v = np.where(cond, new, v)
+
+        # _least_check
+        least1 = ~f['in_lex'][p1] & f['least'][p1]
+        v = np.where((pos > 1) & least1 & ~f['at_very'][p2], v * c.N_SCALAR, v)
+        v = np.where((pos == 1) & least1, v * c.N_SCALAR, v)
+
+        # Boosters (and "kind" in "kind of") carry no valence of their own
+        skip = f['is_booster'][tid] | (f['kind'][tid] & f['of'][n1])
+        raw = np.where(skip | ~f['in_lex'][tid], 0.0, v)
+        sentiments = raw[tokens['first']]
+
+        # _but_check: halve before the first "but", scale by 1.5 after it
+        is_but = f['but'][tid]
+        but_pos = np.full(len(lengths), np.iinfo(np.int64).max)
+        np.minimum.at(but_pos, doc[is_but], pos[is_but])
+        has_but = but_pos[doc] != np.iinfo(np.int64).max
+        sentiments = np.where(has_but & (pos < but_pos[doc]), sentiments * 0.5,
+                              np.where(has_but & (pos > but_pos[doc]), sentiments * 1.5, sentiments))
+        return sentiments
+
+    def _idioms(self, valence, vocab, tid, p1, p2, p3, n1, n2):
+        c = self.constants
+        ids = {w: i for i, w in enumerate(vocab)}
+
+        def matches(phrase, *positions):
+            words = phrase.split(' ')
+            if len(words) != len(positions) or any(w not in ids for w in words):
+                return None
+            mask = positions[0] == ids[words[0]]
+            for w, p in zip(words[1:], positions[1:]):
+                mask &= p == ids[w]
+            return mask
+
+        def apply(valence, *positions):
+            for phrase, value in c.SPECIAL_CASE_IDIOMS.items():
+                mask = matches(phrase, *positions)
+                if mask is not None:
+                    valence = np.where(mask, value, valence)
+            return valence
+
+        # The first matching sequence wins, so apply them last-to-first
+        idiom = np.full(len(tid), np.nan)
+        for positions in [(p3, p2), (p3, p2, p1), (p2, p1), (p2, p1, tid), (p1, tid)]:
+            idiom = apply(idiom, *positions)
+        valence = np.where(np.isnan(idiom), valence, idiom)
+        valence = apply(valence, tid, n1)
+        valence = apply(valence, tid, n1, n2)
+
+        # Booster/dampener bigrams such as "sort of" or "kind of"
+        bigram = np.zeros(len(tid), dtype=bool)
+        for phrase in c.BOOSTER_DICT:
+            if ' ' in phrase:
+                for positions in [(p3, p2), (p2, p1)]:
+                    mask = matches(phrase, *positions)
+                    if mask is not None:
+                        bigram |= mask
+        return np.where(bigram, valence + c.B_DECR, valence)
+
+    def _compound(self, texts, tokens, sentiments):
+        lengths = tokens['lengths']
+        # Per-review sums use the builtin sum over the same left-to-right sequence as the
+        # reference, so the result stays bit-identical on every Python version
+        bounds = np.concatenate([[0], np.cumsum(lengths)]).tolist()
+        values = sentiments.tolist()
+        sums = np.array([float(sum(values[a:b])) for a, b in zip(bounds[:-1], bounds[1:])])
+
+        ep = np.minimum([t.count('!') for t in texts], 4) * 0.292
+        qm_count = np.array([t.count('?') for t in texts])
+        qm = np.where(qm_count > 1, np.where(qm_count <= 3, qm_count * 0.18, 0.96), 0)
+        amplifier = ep + qm
+        sums = np.where(sums > 0, sums + amplifier, np.where(sums < 0, sums - amplifier, sums))
+        compound = sums / np.sqrt(sums * sums + 15)
+        compound = np.where(lengths > 0, compound, 0.0)
+        return np.array([round(x, 4) for x in compound.tolist()])
@@ -1,32 +1,47 @@
 import streamlit as st
+import os
+import sys
 import pandas as pd
 import numpy as np
-import nltk
 import plotly.express as px
 from textblob import TextBlob
 from nrclex import NRCLex
 from nltk.sentiment.vader import SentimentIntensityAnalyzer
 from wordcloud import WordCloud, STOPWORDS
 from sklearn.feature_extraction.text import CountVectorizer
-# make sure the VADER lexicon is available
-nltk.download('vader_lexicon')
-from nltk.sentiment.vader import SentimentIntensityAnalyzer
-nltk.download('punkt')
-nltk.download('stopwords')
-nltk.download('averaged_perceptron_tagger')  # part-of-speech tagger
-nltk.download('wordnet')               # lemmatizer
-nltk.download('brown')                 # required by TextBlob’s default corpora
-from textblob import download_corpora
-download_corpora.download_all()
-
+# Shared scoring helpers live next to the Dash app
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'MoMa Plotly Dash'))
+from vader_batch import BatchVader
+from nlp_resources import MissingResources, require_resources
+import score_store
 
+# NLTK data used below: the VADER lexicon, and punkt + WordNet for NRCLex's tokenizing and
+# lemmatizing. It is read from the bundled nltk_data directory (or NLTK_DATA), never
+# downloaded here, and checked once per process rather than on every rerun.
+# Install it with: python "MoMa Plotly Dash/nlp_resources.py" download
+NLTK_RESOURCES = ['vader_lexicon', 'punkt', 'wordnet']
 
 # Configure page layout
 st.set_page_config(page_title="MoMA Reviews Dashboard", layout="wide")
 
+try:
+    require_resources(NLTK_RESOURCES)
+except MissingResources as exc:
+    st.error(str(exc))
+    st.stop()
+
+REVIEWS_CSV = 'reviews-1.csv'
+# Per-review results from earlier runs, keyed by review content, so a refresh only scores new
+# rows. Kept by score_store next to the Dash app's store, under the same scorer-version key,
+# in a store of its own (this app classifies and scores differently)
+SCORE_STORE = 'streamlit-scores'
+SCORED_COLUMNS = ['Tourist Type', 'TextBlob', 'VADER', 'Emotion']
+
 @st.cache_data
-def load_and_preprocess_data():
-    df = pd.read_csv('reviews-1.csv')
+def load_and_preprocess_data(csv_mtime):
+    # csv_mtime is only part of the cache key, so appending to the CSV triggers a refresh
+    df = pd.read_csv(REVIEWS_CSV)
+    df['RowKey'] = score_store.row_keys(df)
     # Parse date parts and combine into a datetime
     df['Year'] = df['Year']
     df['Month'] = df['Month']
@@ -62,12 +77,30 @@ def load_and_preprocess_data():
             else:
                 return "Domestic"
         return "Foreign"
-    df['Tourist Type'] = df['Hometown'].apply(classify_tourist)
+    df['Text'] = df['Text'].fillna('')
+    # Reuse stored results for reviews seen before; classify and score only new or edited ones
+    store = score_store.load_store(REVIEWS_CSV, columns=SCORED_COLUMNS, name=SCORE_STORE)
+    known = score_store.split_known(df['RowKey'], store)
+    new = df.loc[~known].copy()
+    # Hometowns repeat heavily: classify each distinct value once and broadcast by code
+    codes, hometowns = pd.factorize(new['Hometown'])
+    tourist_types = np.array([classify_tourist(h) for h in hometowns] + [classify_tourist(None)], dtype=object)
+    new['Tourist Type'] = tourist_types[codes]
     # Sentiment analysis
     sid = SentimentIntensityAnalyzer()
-    df['Text'] = df['Text'].fillna('')
-    df['TextBlob'] = df['Text'].apply(lambda x: TextBlob(x).sentiment.polarity)
-    df['VADER'] = df['Text'].apply(lambda x: sid.polarity_scores(x)['compound'])
+    new['TextBlob'] = new['Text'].apply(lambda x: TextBlob(x).sentiment.polarity)
+    new['VADER'] = BatchVader(sid).compound(new['Text'].tolist())
+    # Emotion classification (dominant emotion)
+    new['Emotion'] = new['Text'].apply(lambda x: NRCLex(x).top_emotions[0][0] if x else None)
+    parts = [new[SCORED_COLUMNS]]
+    if known.any():
+        reused = store.loc[df.loc[known, 'RowKey'], SCORED_COLUMNS]
+        reused.index = df.index[known]
+        parts.append(reused)
+    scored = pd.concat(parts).reindex(df.index)
+    for col in SCORED_COLUMNS:
+        df[col] = scored[col]
+    score_store.save_store(df, REVIEWS_CSV, columns=SCORED_COLUMNS, name=SCORE_STORE)
     df['Composite'] = (df['TextBlob'] + df['VADER']) / 2
     # Classify sentiment label
     def get_sentiment_label(c):
@@ -78,11 +111,10 @@ def load_and_preprocess_data():
         else:
             return "Neutral"
     df['Sentiment'] = df['VADER'].apply(get_sentiment_label)
-    # Emotion classification (dominant emotion)
-    df['Emotion'] = df['Text'].apply(lambda x: NRCLex(x).top_emotions[0][0] if x else None)
+    df['Emotion'] = df.pop('Emotion')
     return df
 
-data = load_and_preprocess_data()
+data = load_and_preprocess_data(os.path.getmtime(REVIEWS_CSV))
 
 st.sidebar.header("Filter Reviews")
 